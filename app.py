@@ -1,8 +1,13 @@
 import streamlit as st
-import re
-import random
-from collections import defaultdict, Counter
-import os
+import time
+from collections import deque
+
+from caracteres import construir_corpus_caracteres
+from frases import gerar_frases, pontuar
+from memoria import CATEGORIAS, curva, medir_modelo, memoria_residente, prever, registros
+from mistura import Mistura, ModeloMistura, documentos, modelos_por_documento
+from modelo import ModeloMarkov, ler_arquivos, listar_corpora, preprocessar_texto, tokenizar
+from registro import RegistroModelos
 
 # Configuração da página
 st.set_page_config(
@@ -12,207 +17,253 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-@st.cache_data
-def ler_arquivos():
-    """Lê os dois arquivos de texto e retorna o conteúdo combinado."""
-    maravilha = ""
-    espelho = ""
-    
-    if os.path.exists('data/maravilha-limpo.txt'):
-        try:
-            with open('data/maravilha-limpo.txt', 'r', encoding='utf-8') as f:
-                maravilha = f.read()
-        except Exception as e:
-            st.error(f"Erro ao ler maravilha-limpo.txt: {e}")
-    else:
-        st.error("Arquivo 'data/maravilha-limpo.txt' não encontrado!")
-    
-    if os.path.exists('data/espelho-limpo.txt'):
-        try:
-            with open('data/espelho-limpo.txt', 'r', encoding='utf-8') as f:
-                espelho = f.read()
-        except Exception as e:
-            st.error(f"Erro ao ler espelho-limpo.txt: {e}")
-    else:
-        st.error("Arquivo 'data/espelho-limpo.txt' não encontrado!")
-    
-    return maravilha + " " + espelho
+# Segundos entre as atualizações do painel do registro de modelos
+INTERVALO_PAINEL_REGISTRO = 10
 
-@st.cache_data
-def preprocessar_texto(texto):
-    """Preprocessa o texto removendo caracteres especiais e convertendo para minúsculas."""
-    if not texto:
-        return ""
-    
-    # Remove quebras de linha excessivas e caracteres especiais
-    texto = re.sub(r'\n+', ' ', texto)
-    texto = re.sub(r'[^\w\s\.\!\?\,\;\:]', '', texto)
-    
-    # Converte para minúsculas
-    texto = texto.lower()
-    
-    # Remove espaços múltiplos
-    texto = re.sub(r'\s+', ' ', texto)
-    
-    return texto.strip()
+# Valor inicial do slider de n; só as ordens até ele são carregadas na abertura
+N_PADRAO = 3
+
+@st.cache_resource
+def obter_registro():
+    """Registro de modelos compartilhado entre as sessões, recarregado quando os textos mudam."""
+    registro = RegistroModelos()
+    registro.vigiar()
+    return registro
+
+@st.cache_resource
+def obter_modelo_caracteres(corpus, ordem):
+    """Modelo de caracteres do corpus, compartilhado entre as sessões."""
+    return construir_corpus_caracteres(corpus, ordem)
+
+@st.cache_resource
+def misturas_ativas():
+    """Mistura atual de cada corpus, compartilhada entre as sessões: corpus -> (versões, Mistura)."""
+    return {}
 
-@st.cache_data
-def tokenizar(texto):
-    """Tokeniza o texto em palavras."""
-    tokens = [token for token in texto.split() if token]
-    return tokens
+def obter_mistura(corpus):
+    """Modelos por livro do corpus, combinados na hora do sorteio.
+    
+    Os livros servidos pelo registro são pedidos a ele a cada execução: um
+    livro despejado é recarregado e um livro recarregado ganha versão nova.
+    Se alguma versão mudou, a mistura é remontada com os modelos atuais e a
+    anterior é descartada, em vez de prender modelos que o registro já soltou;
+    pelo mesmo motivo, saem as misturas de outros corpora com livros despejados."""
+    registro = obter_registro()
+    versoes = []
+    for rotulo, _, do_registro in documentos(corpus):
+        if do_registro:
+            registro.obter(rotulo)  # Recarrega o livro se ele foi despejado
+            versoes.append((rotulo, registro.versoes.get(rotulo)))
+    versoes = tuple(versoes)
+    
+    ativas = misturas_ativas()
+    residentes = set(registro.residentes())
+    for outro, (versoes_outro, _) in list(ativas.items()):
+        if outro != corpus and any(rotulo not in residentes for rotulo, _ in versoes_outro):
+            ativas.pop(outro, None)
+    atual = ativas.get(corpus)
+    if atual is None or atual[0] != versoes:
+        atual = ativas[corpus] = (versoes, Mistura(modelos_por_documento(corpus, registro)))
+    return atual[1]
 
-@st.cache_data
-def criar_ngramas(tokens, n):
-    """Cria um dicionário de n-gramas a partir dos tokens."""
-    ngramas = defaultdict(list)
-    
-    for i in range(len(tokens) - n + 1):
-        # Chave: n-1 palavras anteriores
-        chave = tuple(tokens[i:i+n-1])
-        # Valor: próxima palavra
-        proxima_palavra = tokens[i+n-1]
-        ngramas[chave].append(proxima_palavra)
-    
-    return dict(ngramas)
+@st.cache_data(show_spinner=False, max_entries=8)
+def relatorio_memoria(_modelo, corpus, versao, ordens):
+    """Memória do modelo por estrutura e categoria (ver memoria.py), por versão e ordens residentes."""
+    linhas, conjunto = medir_modelo(_modelo)
+    return registros(linhas, conjunto), conjunto.total
 
-@st.cache_data
-def encontrar_palavras_interessantes(tokens):
-    """Encontra palavras interessantes e relevantes para começar o texto."""
-    palavras_alice = [
-        'alice', 'coelho', 'chapeleiro', 'gato', 'rainha', 'rei', 'carta', 'cartas',
-        'chá', 'mesa', 'jardim', 'buraco', 'toca', 'relógio', 'tempo', 'mundo',
-        'país', 'maravilhas', 'espelho', 'sonho', 'dormindo', 'acordar',
-        'pequena', 'grande', 'crescer', 'diminuir', 'poção', 'beber', 'comer',
-        'porta', 'chave', 'curiosa', 'estranha', 'estranho', 'medo', 'coragem'
-    ]
-    
-    contador = Counter(tokens)
-    
-    palavras_disponiveis = []
-    for palavra in palavras_alice:
-        if palavra in contador and contador[palavra] > 3:
-            palavras_disponiveis.append(palavra)
-    
-    palavras_frequentes = [palavra for palavra, freq in contador.most_common(30) 
-                          if len(palavra) > 3 and palavra.isalpha()]
-    
-    todas_palavras = list(set(palavras_disponiveis + palavras_frequentes[:15]))
-    
-    return sorted(todas_palavras)
+@st.cache_data(show_spinner="Medindo prefixos do corpus...", max_entries=4)
+def curva_memoria(corpus, ordens):
+    """Bytes das representações em prefixos do corpus, para a previsão de memória."""
+    tokens = tokenizar(preprocessar_texto(ler_arquivos(listar_corpora()[corpus])))
+    return curva(tokens, ordens)
 
-def gerar_texto(ngramas_dict, palavra_inicial, n, tamanho=51):
-    """Gera texto usando cadeias de Markov com n-gramas progressivos."""
-    resultado = [palavra_inicial]
+def gerar_palavras(modelo, palavra_inicial, n, tamanho=51, temperatura=1.0, top_k=0, top_p=1.0):
+    """Gera o texto palavra a palavra (gerador), usando n-gramas progressivos.
+    
+    Só a janela das últimas n-1 palavras fica em memória, então o tempo até
+    a primeira palavra e a memória não dependem do tamanho pedido.
+    Temperatura, top-k e top-p controlam o sorteio de cada palavra."""
+    amostragem = {'temperatura': temperatura, 'top_k': top_k, 'top_p': top_p}
+    janela = deque([palavra_inicial], maxlen=max(n - 1, 1))
+    gerados = 1
+    yield palavra_inicial
     
     for tamanho_atual in range(2, n + 1):
-        if len(resultado) >= tamanho:
+        if gerados >= tamanho:
             break
             
-        ngramas_atuais = ngramas_dict[tamanho_atual]
         contexto_size = tamanho_atual - 1
         
         tentativas = 0
         max_tentativas = 100
         
-        while len(resultado) < tamanho and tentativas < max_tentativas:
+        while gerados < tamanho and tentativas < max_tentativas:
             tentativas += 1
             
-            if len(resultado) < contexto_size:
+            if len(janela) < contexto_size:
                 break
                 
-            contexto = tuple(resultado[-contexto_size:])
+            contexto = tuple(janela)[-contexto_size:]
+            proxima = modelo.escolher(tamanho_atual, contexto, **amostragem)
             
-            if contexto in ngramas_atuais and ngramas_atuais[contexto]:
-                proxima = random.choice(ngramas_atuais[contexto])
-                resultado.append(proxima)
-                tentativas = 0  # Reset tentativas quando encontra uma palavra
-            else:
-                if contexto_size > 1:
-                    contexto_menor = contexto[1:]
-                    if contexto_menor in ngramas_atuais and ngramas_atuais[contexto_menor]:
-                        proxima = random.choice(ngramas_atuais[contexto_menor])
-                        resultado.append(proxima)
-                        tentativas = 0
-                    else:
-                        break
-                else:
-                    break
-    
-    return resultado[:tamanho]
+            if proxima is None and contexto_size > 1:
+                contexto_menor = contexto[1:]
+                proxima = modelo.escolher(tamanho_atual, contexto_menor, **amostragem)
+            
+            if proxima is None:
+                break
+            
+            janela.append(proxima)
+            gerados += 1
+            tentativas = 0  # Reset tentativas quando encontra uma palavra
+            yield proxima
 
-def adicionar_pontuacao_basica(texto):
-    """Adiciona pontuação básica ao texto gerado."""
-    palavras = texto.split()
-    resultado = []
+def trechos(palavras, palavras_por_trecho=25):
+    """Agrupa as palavras em trechos para exibição progressiva.
     
+    A primeira palavra sai sozinha, para aparecer na tela o quanto antes."""
+    lote = []
     for i, palavra in enumerate(palavras):
-        resultado.append(palavra)
-        
-        # Ponto a cada 10-15 palavras aproximadamente
-        if (i + 1) % random.randint(10, 15) == 0 and i < len(palavras) - 1:
-            resultado[-1] += '.'
-    
-    return ' '.join(resultado)
+        lote.append(palavra)
+        if i == 0 or len(lote) >= palavras_por_trecho:
+            yield ' '.join(lote) + ' '
+            lote = []
+    if lote:
+        yield ' '.join(lote)
 
-def main():
-    # Título principal
-    st.title("Gerador de Lero-lero com Cadeias de Markov")
-    # st.markdown("### *Baseado nos livros de Alice no País das Maravilhas*")
-    
-    # Sidebar para configurações
-    with st.sidebar:
-        st.header("⚙️ Configurações")
-        
-        # Parâmetro N
-        n = st.slider(
-            "Ordem dos N-gramas (n)",
-            min_value=2,
-            max_value=6,
-            value=3,
-            help="Ordem dos n-gramas. Valores maiores geram texto mais coerente mas menos criativo."
+def gerar_texto_frases(modelo, palavra_inicial, n, tamanho, temperatura=1.0, top_k=0, top_p=1.0):
+    """Gera frases completas (gerador de palavras já pontuadas).
+    
+    O texto começa onde uma frase do corpus começa (pela palavra inicial,
+    se alguma frase começa por ela) e termina num fim de frase perto do
+    tamanho pedido; os pontos ficam onde o corpus fecha frases."""
+    ids = gerar_frases(modelo, n, tamanho, temperatura=temperatura, top_k=top_k, top_p=top_p,
+                       primeira=modelo.indice.get(palavra_inicial))
+    return pontuar((modelo.vocabulario[i], fecha) for i, fecha in ids)
+
+@st.fragment
+def controles_geracao():
+    """Parâmetros da geração, guardados no session_state.
+    
+    Como fragmento, mexer neles reexecuta só esta função, e não o app inteiro."""
+    # Parâmetro N
+    st.slider(
+        "Ordem dos N-gramas (n)",
+        key="n",
+        min_value=2,
+        max_value=6,
+        value=N_PADRAO,
+        help="Ordem dos n-gramas. Valores maiores geram texto mais coerente mas menos criativo."
+    )
+    
+    # Tamanho do texto
+    st.number_input(
+        "Tamanho do texto (palavras)",
+        key="tamanho",
+        min_value=10,
+        max_value=20000,
+        value=51,
+        help="Número de palavras a serem geradas."
+    )
+    
+    # Controles do sorteio
+    with st.expander("🎛️ Amostragem"):
+        st.slider(
+            "Temperatura",
+            key="temperatura",
+            min_value=0.1,
+            max_value=2.0,
+            value=1.0,
+            step=0.1,
+            help="Abaixo de 1 favorece as palavras mais prováveis; acima de 1 aproxima do sorteio uniforme."
         )
-        
-        # Tamanho do texto
-        tamanho = st.number_input(
-            "Tamanho do texto (palavras)",
-            min_value=10,
-            max_value=200,
-            value=51,
-            help="Número de palavras a serem geradas."
+        st.slider(
+            "Top-k",
+            key="top_k",
+            min_value=0,
+            max_value=50,
+            value=0,
+            help="Sorteia só entre as k palavras mais prováveis em cada passo (0 = todas)."
+        )
+        st.slider(
+            "Top-p (núcleo)",
+            key="top_p",
+            min_value=0.1,
+            max_value=1.0,
+            value=1.0,
+            step=0.05,
+            help="Sorteia só entre as palavras mais prováveis que somam essa fração da probabilidade."
         )
-        
-        st.divider()
-        
-        # Informações
-        st.markdown("""
-        ### Como funciona?
-        O algoritmo aprende padrões de palavras consecutivas através das estórias de Alice, de Lewis Carrol. 
-        
-        ### Dica:
-        - N baixo = mais criativo, menos coerente
-        - N alto = mais coerente, menos criativo
-        """)
-    
-    # Carrega e processa os dados
-    if 'texto_processado' not in st.session_state:
-        with st.spinner("Carregando e processando os livros da Alice..."):
-            texto_completo = ler_arquivos()
-            
-            if not texto_completo.strip():
-                st.error("Não foi possível carregar os arquivos de texto!")
-                st.stop()
-            
-            texto_limpo = preprocessar_texto(texto_completo)
-            tokens = tokenizar(texto_limpo)
-            
-            st.session_state.texto_processado = True
-            st.session_state.tokens = tokens
-            st.session_state.palavras_interessantes = encontrar_palavras_interessantes(tokens)
-    
-    
     
-    st.divider()
+    st.toggle(
+        "✂️ Frases completas",
+        key="frases",
+        help="Começa no início de uma frase do corpus e termina no fim de uma, perto do tamanho pedido."
+    )
+
+@st.fragment(run_every=INTERVALO_PAINEL_REGISTRO)
+def painel_registro(registro, corpus):
+    """Ocupação do registro e versão do modelo, atualizadas periodicamente."""
+    with st.expander("🗄️ Registro de modelos"):
+        uso = registro.estatisticas()
+        st.write(f"**Residentes**: {', '.join(registro.residentes())}")
+        st.write(f"**Memória**: {uso['memoria_bytes'] / 2**20:.1f} MB "
+                 f"de {uso['limite_bytes'] / 2**20:.0f} MB")
+        st.write(f"**Acertos / falhas / despejos**: {uso['acertos']} / "
+                 f"{uso['falhas']} / {uso['despejos']}")
+        st.write(f"**Versão de '{corpus}'**: {uso['versoes'].get(corpus, 1)}")
+        ordens = uso['ordens'].get(corpus)
+        if ordens:
+            st.write("**Ordens carregadas**: " + ", ".join(
+                f"{ordem} ({segundos * 1000:.0f} ms)" for ordem, segundos in sorted(ordens.items())))
+        recarga = uso['recargas'].get(corpus)
+        if recarga:
+            st.write(f"**Última recarga**: há {time.time() - recarga['quando']:.0f}s, "
+                     f"em {recarga['segundos']:.2f}s ({recarga['motivo']})")
+
+@st.fragment
+def painel_memoria(registro, modelo, corpus):
+    """Memória do modelo servido, por ordem e categoria, e previsão para corpora maiores."""
+    with st.expander("🧮 Memória do modelo"):
+        if not isinstance(modelo, ModeloMarkov):
+            st.caption("O modelo deste corpus é consultado no banco SQLite, fora da memória.")
+            return
+        versao = registro.estatisticas()['versoes'].get(corpus, 1)
+        tabela, total = relatorio_memoria(modelo, corpus, versao, tuple(sorted(modelo.tabelas_residentes())))
+        st.dataframe(
+            tabela,
+            hide_index=True,
+            column_config={coluna: st.column_config.NumberColumn(format="%.2f")
+                           for coluna in CATEGORIAS + ('total',)},
+        )
+        st.caption("MB por categoria; o total conta uma vez os objetos compartilhados entre as estruturas.")
+        rss = memoria_residente()
+        st.write(f"**Modelo**: {total / 2**20:.1f} MB"
+                 + (f"; **RSS do servidor**: {rss / 2**20:.0f} MB" if rss else ""))
+
+        if st.toggle("Prever para outro tamanho de corpus",
+                     help="Mede o corpus em prefixos e ajusta bytes = a · palavras^b (leva alguns segundos)."):
+            palavras = st.number_input("Palavras do corpus", min_value=1_000,
+                                       value=10 * modelo.estatisticas['total_palavras'], step=100_000)
+            previsao = prever(curva_memoria(corpus, tuple(modelo.ordens)), palavras)
+            for chave, rotulo in (('compacto', "Tabelas compactas"), ('dicionarios', "Dicionários de listas")):
+                previsto, expoente = previsao[chave]
+                st.write(f"**{rotulo}**: {previsto / 2**20:,.0f} MB (b = {expoente:.2f})")
+            if rss:
+                st.write(f"**RSS previsto**: {(rss - total + previsao['compacto'][0]) / 2**20:,.0f} MB")
+
+@st.fragment
+def painel_geracao(modelo, corpus, modo, estatisticas):
+    """Escolha da palavra inicial e geração do texto.
+    
+    A palavra e o botão só reexecutam este fragmento; o modelo já vem
+    resolvido pela execução completa do app."""
+    n = st.session_state.n
+    tamanho = st.session_state.tamanho
+    temperatura = st.session_state.temperatura
+    top_k = st.session_state.top_k
+    top_p = st.session_state.top_p
     
     # Seleção da palavra inicial
     st.header(" Escolha da Palavra Inicial")
@@ -223,7 +274,7 @@ def main():
         # Selectbox com palavras interessantes
         palavra_selecionada = st.selectbox(
             "Palavras sugeridas (relacionadas às fábulas):",
-            options=st.session_state.palavras_interessantes,
+            options=estatisticas['palavras_interessantes'],
             help="Palavras extraídas automaticamente dos textos da Alice"
         )
     
@@ -251,80 +302,190 @@ def main():
     if gerar_button:
         if not palavra_inicial:
             st.error("Por favor, selecione ou digite uma palavra inicial!")
-        else:
-            with st.spinner(f"Gerando texto com {n}-gramas..."):
-                # Cria n-gramas
-                ngramas_dict = {}
-                progress_bar = st.progress(0)
+        elif modo == "Caracteres":
+            with st.spinner(f"Gerando texto com {n}-gramas de caracteres..."):
+                try:
+                    modelo_caracteres, vocabulario = obter_modelo_caracteres(corpus, n)
+                except (KeyError, FileNotFoundError) as e:
+                    st.error(f"O corpus '{corpus}' não tem textos de origem: {e}")
+                    st.stop()
                 
-                for i, tamanho_atual in enumerate(range(2, n + 1)):
-                    ngramas_dict[tamanho_atual] = criar_ngramas(st.session_state.tokens, tamanho_atual)
-                    progress_bar.progress((i + 1) / (n - 1))
+                # Cerca de 6 caracteres por palavra pedida
+                texto_final = modelo_caracteres.gerar(tamanho * 6, palavra_inicial + ' ')
+                neologismos = modelo_caracteres.neologismos(15, vocabulario)
                 
-                progress_bar.empty()
-                
-                # Gera o texto
-                texto_gerado = gerar_texto(ngramas_dict, palavra_inicial, n, tamanho)
-                
-                # Exibe o resultado
                 st.success("✨ Texto gerado com sucesso!")
-                
-                # Container para o texto gerado
                 st.header("📖 Texto Gerado")
                 
-                texto_final = ' '.join(texto_gerado)
-                # texto_final = adicionar_pontuacao_basica(texto_final_pre)
-
-                # Caixa de texto com o resultado
                 st.text_area(
                     "Resultado:",
                     value=texto_final,
                     height=200,
-                    help="Texto gerado usando cadeias de Markov"
+                    help="Texto gerado letra a letra com cadeias de Markov"
                 )
                 
-                # Estatísticas da geração
-                col1, col2, col3, col4 = st.columns(4)
+                st.write("**Palavras inventadas:** " + ", ".join(neologismos))
+                
+                col1, col2, col3 = st.columns(3)
                 with col1:
-                    st.metric("📝 Palavras Geradas", len(texto_gerado))
+                    st.metric("📊 Caracteres", len(texto_final))
                 with col2:
                     st.metric("🔧 N-gramas Usados", n)
                 with col3:
                     st.metric("🎯 Palavra Inicial", f'"{palavra_inicial}"')
-                with col4:
-                    st.metric("📊 Caracteres", len(texto_final))
+        else:
+            # Container para o texto gerado
+            st.header("📖 Texto Gerado")
+            
+            frases = st.session_state.frases and getattr(modelo, 'frases', None) is not None
+            if st.session_state.frases and not frases:
+                if isinstance(modelo, ModeloMistura):
+                    motivo = "a mistura de livros não indexa frases"
+                elif not isinstance(modelo, ModeloMarkov):
+                    motivo = "o modelo é consultado no banco SQLite, que não guarda frases"
+                else:
+                    motivo = "as fronteiras de frase dos textos não foram encontradas"
+                st.info(f"Este modelo não tem índice de frases ({motivo}); gerando sem fronteiras de frase.")
+            
+            # Exibe o texto à medida que as palavras são geradas
+            with st.container(height=300):
+                if frases:
+                    palavras = gerar_texto_frases(modelo, palavra_inicial, n, tamanho,
+                                                  temperatura, top_k, top_p)
+                else:
+                    palavras = gerar_palavras(modelo, palavra_inicial, n, tamanho,
+                                              temperatura, top_k, top_p)
+                texto_final = st.write_stream(trechos(palavras)).strip()
+            
+            st.success("✨ Texto gerado com sucesso!")
+            
+            # Estatísticas da geração
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("📝 Palavras Geradas", texto_final.count(' ') + 1)
+            with col2:
+                st.metric("🔧 N-gramas Usados", n)
+            with col3:
+                st.metric("🎯 Palavra Inicial", f'"{palavra_inicial}"')
+            with col4:
+                st.metric("📊 Caracteres", len(texto_final))
+            
+            # Opção de download
+            st.download_button(
+                label="💾 Baixar Texto",
+                data=texto_final,
+                file_name=f"{corpus}_texto_gerado_{n}gramas.txt",
+                mime="text/plain"
+            )
+            
+            # Exibe algumas estatísticas dos n-gramas
+            with st.expander("🔍 Estatísticas Detalhadas"):
+                for i in range(2, n + 1):
+                    st.write(f"**{i}-gramas**: {estatisticas['contextos_por_ordem'][i]:,} combinações únicas")
                 
-                # Opção de download
-                st.download_button(
-                    label="💾 Baixar Texto",
-                    data=texto_final,
-                    file_name=f"alice_texto_gerado_{n}gramas.txt",
-                    mime="text/plain"
-                )
+                # Mostra algumas palavras mais frequentes
+                palavras_freq = estatisticas['mais_frequentes'][:10]
                 
-                # Exibe algumas estatísticas dos n-gramas
-                with st.expander("🔍 Estatísticas Detalhadas"):
-                    for i in range(2, n + 1):
-                        st.write(f"**{i}-gramas**: {len(ngramas_dict[i]):,} combinações únicas")
-                    
-                    # Mostra algumas palavras mais frequentes
-                    contador = Counter(st.session_state.tokens)
-                    palavras_freq = contador.most_common(10)
-                    
-                    st.write("**Palavras mais frequentes no corpus:**")
-                    freq_text = ", ".join([f"{palavra} ({freq})" for palavra, freq in palavras_freq])
-                    st.write(freq_text)
+                st.write("**Palavras mais frequentes no corpus:**")
+                freq_text = ", ".join([f"{palavra} ({freq})" for palavra, freq in palavras_freq])
+                st.write(freq_text)
+
+def main():
+    # Título principal
+    st.title("Gerador de Lero-lero com Cadeias de Markov")
+    # st.markdown("### *Baseado nos livros de Alice no País das Maravilhas*")
+    
+    registro = obter_registro()
+    
+    # Sidebar para configurações
+    with st.sidebar:
+        st.header("⚙️ Configurações")
+        
+        # Corpus usado para treinar o modelo
+        corpora = registro.listar()
+        corpus = st.selectbox(
+            "Corpus",
+            options=corpora,
+            index=corpora.index('alice') if 'alice' in corpora else 0,
+            help="Conjunto de textos usado para treinar o modelo."
+        )
+        
+        # Unidade da cadeia: palavras ou caracteres
+        modo = st.radio(
+            "Modo",
+            options=["Palavras", "Caracteres"],
+            horizontal=True,
+            help="No modo caracteres a cadeia gera letra a letra, inventando palavras novas."
+        )
+        
+        controles_geracao()
+        
+        # Mistura dos livros do corpus com pesos escolhidos
+        mistura = None
+        with st.expander("📚 Mistura por livro"):
+            if len(listar_corpora().get(corpus, ())) < 2:
+                st.caption("Este corpus tem um só documento.")
+            elif st.toggle("Combinar os livros por peso",
+                           help="Cada livro tem seu próprio modelo; mudar os pesos não recompila nada."):
+                mistura = obter_mistura(corpus)
+                pesos_livros = [
+                    st.slider(f"Peso de {rotulo} (%)", min_value=0, max_value=100, value=50, step=5)
+                    for rotulo in mistura.rotulos
+                ]
+        
+        st.divider()
+        
+        # Informações
+        st.markdown("""
+        ### Como funciona?
+        O algoritmo aprende padrões de palavras consecutivas através das estórias de Alice, de Lewis Carrol. 
+        
+        ### Dica:
+        - N baixo = mais criativo, menos coerente
+        - N alto = mais coerente, menos criativo
+        """)
+    
+    # Carrega o modelo do corpus escolhido
+    with st.spinner(f"Carregando o corpus '{corpus}'..."):
+        try:
+            modelo = registro.obter(corpus)
+            # As demais ordens são lidas quando o slider chegar a elas
+            modelo.preparar(range(2, st.session_state.n + 1))
+        except (KeyError, FileNotFoundError) as e:
+            st.error(f"Não foi possível carregar o corpus '{corpus}': {e}")
+            st.stop()
+    modelo_corpus = modelo
+    
+    if mistura is not None:
+        if sum(pesos_livros):
+            modelo = mistura.com_pesos(pesos_livros)
+        else:
+            st.warning("Todos os pesos estão em zero; usando o corpus completo.")
+    
+    estatisticas = modelo.estatisticas
+    
+    if not estatisticas['total_palavras']:
+        st.error("O corpus escolhido não tem texto!")
+        st.stop()
+    
+    with st.sidebar:
+        painel_registro(registro, corpus)
+        painel_memoria(registro, modelo_corpus, corpus)
+    
+    st.divider()
+    
+    painel_geracao(modelo, corpus, modo, estatisticas)
     
     # História de Markov no final da página
     st.divider()
 # Estatísticas do corpus
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("📚 Total de Palavras", f"{len(st.session_state.tokens):,}")
+        st.metric("📚 Total de Palavras", f"{estatisticas['total_palavras']:,}")
     with col2:
-        st.metric("🔤 Palavras Únicas", f"{len(set(st.session_state.tokens)):,}")
+        st.metric("🔤 Palavras Únicas", f"{estatisticas['palavras_unicas']:,}")
     with col3:
-        palavras_alice = len([p for p in st.session_state.palavras_interessantes 
+        palavras_alice = len([p for p in estatisticas['palavras_interessantes'] 
                              if p in ['alice', 'coelho', 'chapeleiro', 'gato', 'rainha']])
         st.metric("🎭 Palavras da Alice", palavras_alice)
 
@@ -0,0 +1,194 @@
+"""
+Cache de artefatos endereçado por conteúdo para o pipeline de construção.
+
+Cada etapa do pipeline (limpeza, tokenização, contagem por ordem, poda,
+exportação) é identificada por uma chave: o SHA-256 do nome e da versão
+da etapa, dos seus parâmetros e dos hashes dos artefatos de entrada. O
+resultado fica em `modelos/artefatos/<etapa>/<chave>.pkl`, com o hash do
+seu conteúdo ao lado (`<chave>.sha256`). Se a chave já está no cache, a
+etapa não é executada e o artefato nem é lido: só o hash é usado para
+montar as chaves das etapas seguintes.
+
+Como as chaves dependem do conteúdo, e não das datas dos arquivos, uma
+mudança que não altera a saída de uma etapa (por exemplo, só pontuação
+que a limpeza remove) não reconstrói nada depois dela. A versão de cada
+etapa deve ser incrementada quando o código da etapa muda.
+
+Uso: python artefatos.py [--limpar]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+
+from modelo import PASTA_MODELOS
+
+PASTA_ARTEFATOS = os.path.join(PASTA_MODELOS, 'artefatos')
+
+# Bytes lidos por vez ao calcular o hash de um arquivo de origem
+BLOCO_LEITURA = 1 << 20
+
+_AUSENTE = object()
+
+
+def hash_bytes(dados):
+    return hashlib.sha256(dados).hexdigest()
+
+
+class Artefato:
+    """
+    Resultado de uma etapa: o hash do conteúdo e o valor, lido do disco só
+    quando alguém precisa dele.
+    """
+
+    __slots__ = ('hash', 'caminho', '_valor')
+
+    def __init__(self, hash, caminho=None, valor=_AUSENTE):
+        self.hash = hash
+        self.caminho = caminho
+        self._valor = valor
+
+    @property
+    def valor(self):
+        if self._valor is _AUSENTE:
+            with open(self.caminho, 'rb') as f:
+                self._valor = pickle.load(f)
+        return self._valor
+
+
+class _Fonte(Artefato):
+    """Arquivo de origem: o valor é o texto, lido quando necessário."""
+
+    __slots__ = ()
+
+    @property
+    def valor(self):
+        if self._valor is _AUSENTE:
+            with open(self.caminho, encoding='utf-8') as f:
+                self._valor = f.read()
+        return self._valor
+
+
+class CacheArtefatos:
+    """
+    Executa etapas do pipeline reaproveitando os resultados já calculados.
+
+    Args:
+        pasta (str): Pasta do cache (padrão: modelos/artefatos)
+        relatorio (callable): Recebe uma mensagem por etapa (padrão: nenhuma)
+    """
+
+    def __init__(self, pasta=PASTA_ARTEFATOS, relatorio=None):
+        self.pasta = pasta
+        self.relatorio = relatorio or (lambda mensagem: None)
+        self.executadas = []
+        self.reaproveitadas = []
+
+    def fonte(self, caminho):
+        """Artefato de um arquivo de origem (o valor é o texto do arquivo)."""
+        sha = hashlib.sha256()
+        with open(caminho, 'rb') as f:
+            for bloco in iter(lambda: f.read(BLOCO_LEITURA), b''):
+                sha.update(bloco)
+        return _Fonte(sha.hexdigest(), caminho)
+
+    def chave(self, etapa, versao, parametros, entradas):
+        """Chave da etapa: hash do nome, versão, parâmetros e hashes das entradas."""
+        descricao = json.dumps([etapa, versao, parametros, [entrada.hash for entrada in entradas]],
+                               sort_keys=True, ensure_ascii=False)
+        return hash_bytes(descricao.encode('utf-8'))
+
+    def etapa(self, nome, versao, parametros, entradas, calcular, rotulo=''):
+        """
+        Resultado da etapa, calculado só se a chave ainda não está no cache.
+
+        Args:
+            nome (str): Nome da etapa (também a subpasta do cache)
+            versao (int): Versão do código da etapa
+            parametros (dict): Parâmetros que mudam o resultado (serializáveis em JSON)
+            entradas (list): Artefatos de entrada
+            calcular (callable): Recebe os valores das entradas e retorna o resultado
+            rotulo (str): Descrição curta para o relatório (livro, ordem...)
+
+        Returns:
+            Artefato: resultado da etapa
+        """
+        chave = self.chave(nome, versao, parametros, entradas)
+        pasta = os.path.join(self.pasta, nome)
+        caminho = os.path.join(pasta, f"{chave}.pkl")
+        caminho_hash = os.path.join(pasta, f"{chave}.sha256")
+        descricao = f"{nome} {rotulo}".strip()
+
+        try:
+            with open(caminho_hash, encoding='ascii') as f:
+                artefato = Artefato(f.read().strip(), caminho)
+            self.reaproveitadas.append(descricao)
+            self.relatorio(f"  = {descricao} (cache)")
+            return artefato
+        except FileNotFoundError:
+            pass
+
+        valor = calcular(*(entrada.valor for entrada in entradas))
+        dados = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+        os.makedirs(pasta, exist_ok=True)
+        # O .sha256 é escrito por último: a presença dele indica artefato completo
+        for destino, conteudo, modo in ((caminho, dados, 'wb'), (caminho_hash, hash_bytes(dados), 'w')):
+            temporario = f"{destino}.tmp"
+            with open(temporario, modo) as f:
+                f.write(conteudo)
+            os.replace(temporario, destino)
+
+        self.executadas.append(descricao)
+        self.relatorio(f"  + {descricao}")
+        return Artefato(hash_bytes(dados), caminho, valor)
+
+    def resumo(self):
+        return (f"{len(self.executadas)} etapas executadas, "
+                f"{len(self.reaproveitadas)} reaproveitadas do cache")
+
+
+def escrever_se_mudou(caminho, texto):
+    """
+    Grava o texto no arquivo só se o conteúdo for diferente do atual.
+
+    Returns:
+        bool: True se o arquivo foi (re)escrito
+    """
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            if f.read() == texto:
+                return False
+    except FileNotFoundError:
+        pass
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write(texto)
+    os.replace(temporario, caminho)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mostra o uso do cache de artefatos do pipeline.")
+    parser.add_argument("--limpar", action="store_true", help="apaga todos os artefatos")
+    args = parser.parse_args()
+
+    if args.limpar:
+        shutil.rmtree(PASTA_ARTEFATOS, ignore_errors=True)
+        print(f"Cache '{PASTA_ARTEFATOS}' apagado.")
+        return
+
+    if not os.path.isdir(PASTA_ARTEFATOS):
+        print(f"Cache '{PASTA_ARTEFATOS}' vazio.")
+        return
+    for etapa in sorted(os.listdir(PASTA_ARTEFATOS)):
+        pasta = os.path.join(PASTA_ARTEFATOS, etapa)
+        arquivos = [os.path.join(pasta, nome) for nome in os.listdir(pasta) if nome.endswith('.pkl')]
+        total = sum(os.path.getsize(arquivo) for arquivo in arquivos)
+        print(f"{etapa:<12} {len(arquivos):>4} artefatos, {total / 2**20:8.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""
+Representação dos contextos como autômato minimizado (DAWG).
+
+Nas tabelas por ordem, cada contexto é guardado separadamente, embora os
+contextos de ordem alta compartilhem sufixos longos com os de ordem menor
+e muitos tenham exatamente o mesmo conjunto de sucessores. Aqui todos os
+contextos de todas as ordens viram caminhos de um único autômato, lido da
+palavra mais recente para a mais antiga: o estado alcançado depois de k
+palavras é o contexto da ordem k+1. Duas reduções tornam a estrutura
+compacta:
+
+- distribuições iguais (mesmos sucessores com as mesmas contagens) são
+  guardadas uma só vez e compartilhadas pelos estados;
+- estados equivalentes (mesma distribuição e mesmas transições) são
+  fundidos, como na minimização de um DAWG, de baixo para cima.
+
+Tudo fica em arrays contíguos; a busca de uma transição é uma busca
+binária nos rótulos ordenados do estado.
+
+Uso: python automato.py [corpus]
+"""
+
+import random
+import sys
+import time
+from array import array
+from bisect import bisect_left
+
+from modelo import ModeloMarkov, acumular, sortear_prefixo
+from registro import RegistroModelos
+
+SEM_DISTRIBUICAO = 0xFFFFFFFF
+
+
+class AutomatoContextos:
+    """
+    Autômato minimizado com os contextos de todas as ordens de um modelo.
+
+    Args:
+        inicio_arestas (array): Arestas do estado s em [inicio[s], inicio[s+1])
+        rotulos (array): Id da palavra de cada aresta, ordenados por estado
+        destinos (array): Estado de destino de cada aresta
+        distribuicoes (array): Distribuição de cada estado (ou SEM_DISTRIBUICAO)
+        inicio_dist (array): Sucessores da distribuição d em [inicio_dist[d], inicio_dist[d+1])
+        sucessores (array): Ids dos sucessores, da maior para a menor contagem
+        contagens (array): Contagens correspondentes
+        contextos_por_ordem (dict): ordem n -> número de contextos
+        raiz (int): Estado do contexto vazio
+    """
+
+    def __init__(self, inicio_arestas, rotulos, destinos, distribuicoes,
+                 inicio_dist, sucessores, contagens, contextos_por_ordem, raiz):
+        self.inicio_arestas = inicio_arestas
+        self.rotulos = rotulos
+        self.destinos = destinos
+        self.distribuicoes = distribuicoes
+        self.inicio_dist = inicio_dist
+        self.sucessores = sucessores
+        self.contagens = contagens
+        self.contextos_por_ordem = contextos_por_ordem
+        self.raiz = raiz
+        self._acumulados = {}
+
+    @classmethod
+    def construir(cls, tabelas):
+        """
+        Constrói o autômato a partir das tabelas de um ModeloMarkov.
+
+        Args:
+            tabelas (dict): ordem n -> TabelaNgramas
+        """
+        # Distribuições distintas, cada uma guardada uma vez
+        indice_dist = {}
+        inicio_dist = array('I', [0])
+        sucessores = array('I')
+        contagens = array('I')
+
+        # Trie dos contextos invertidos: estado -> [distribuição, {palavra: filho}]
+        trie = [[SEM_DISTRIBUICAO, {}]]
+        for ordem in sorted(tabelas):
+            tabela = tabelas[ordem]
+            for contexto in tabela.linhas:
+                dist_sucessores, dist_contagens = tabela.distribuicao(contexto)
+                chave = (dist_sucessores.tobytes(), dist_contagens.tobytes())
+                d = indice_dist.get(chave)
+                if d is None:
+                    d = indice_dist[chave] = len(indice_dist)
+                    sucessores.extend(dist_sucessores)
+                    contagens.extend(dist_contagens)
+                    inicio_dist.append(len(sucessores))
+
+                estado = 0
+                for palavra in reversed(contexto):
+                    filhos = trie[estado][1]
+                    proximo = filhos.get(palavra)
+                    if proximo is None:
+                        proximo = filhos[palavra] = len(trie)
+                        trie.append([SEM_DISTRIBUICAO, {}])
+                    estado = proximo
+                trie[estado][0] = d
+
+        # Minimização: cada estado é identificado pela assinatura
+        # (distribuição, transições para estados já minimizados), de baixo para cima
+        registro = {}
+        canonico = [0] * len(trie)
+        pilha = [(0, False)]
+        while pilha:
+            estado, visitado = pilha.pop()
+            if not visitado:
+                pilha.append((estado, True))
+                pilha.extend((filho, False) for filho in trie[estado][1].values())
+                continue
+            dist, filhos = trie[estado]
+            assinatura = (dist, tuple(sorted((palavra, canonico[filho]) for palavra, filho in filhos.items())))
+            canonico[estado] = registro.setdefault(assinatura, len(registro))
+
+        # Estados minimizados em arrays contíguos
+        inicio_arestas = array('I')
+        rotulos = array('I')
+        destinos = array('I')
+        distribuicoes = array('I')
+        for dist, arestas in registro:
+            inicio_arestas.append(len(rotulos))
+            distribuicoes.append(dist)
+            for palavra, destino in arestas:
+                rotulos.append(palavra)
+                destinos.append(destino)
+        inicio_arestas.append(len(rotulos))
+
+        contextos_por_ordem = {ordem: len(tabela) for ordem, tabela in tabelas.items()}
+        return cls(inicio_arestas, rotulos, destinos, distribuicoes,
+                   inicio_dist, sucessores, contagens, contextos_por_ordem, canonico[0])
+
+    def estado(self, contexto):
+        """Estado alcançado pelo contexto (tupla de ids), ou None se ele não existe."""
+        estado = self.raiz
+        inicio, rotulos, destinos = self.inicio_arestas, self.rotulos, self.destinos
+        for palavra in reversed(contexto):
+            a, b = inicio[estado], inicio[estado + 1]
+            i = bisect_left(rotulos, palavra, a, b)
+            if i == b or rotulos[i] != palavra:
+                return None
+            estado = destinos[i]
+        return estado
+
+    def linha(self, contexto):
+        """Intervalo [a, b) dos sucessores do contexto, ou None se ele não existe."""
+        estado = self.estado(contexto)
+        if estado is None:
+            return None
+        d = self.distribuicoes[estado]
+        if d == SEM_DISTRIBUICAO:
+            return None
+        return self.inicio_dist[d], self.inicio_dist[d + 1]
+
+    def acumulado(self, temperatura=1.0):
+        """Pesos acumulados de cada distribuição sob a temperatura dada (calculados uma vez)."""
+        if temperatura not in self._acumulados:
+            if len(self._acumulados) >= 8:
+                self._acumulados.pop(next(iter(self._acumulados)))
+            self._acumulados[temperatura] = acumular(self.inicio_dist, self.contagens, temperatura)
+        return self._acumulados[temperatura]
+
+    def contextos(self, ordem):
+        """Percorre os contextos da ordem dada, como tuplas de ids."""
+        pilha = [(self.raiz, ())]
+        while pilha:
+            estado, sufixo = pilha.pop()
+            if len(sufixo) == ordem - 1:
+                if self.distribuicoes[estado] != SEM_DISTRIBUICAO:
+                    yield sufixo
+                continue
+            for i in range(self.inicio_arestas[estado], self.inicio_arestas[estado + 1]):
+                pilha.append((self.destinos[i], (self.rotulos[i],) + sufixo))
+
+    def tamanho_bytes(self):
+        """Espaço ocupado pelos arrays do autômato."""
+        return sum(sys.getsizeof(vetor) for vetor in (
+            self.inicio_arestas, self.rotulos, self.destinos, self.distribuicoes,
+            self.inicio_dist, self.sucessores, self.contagens))
+
+    def tabela(self, ordem):
+        """Visão da ordem dada com a interface de TabelaNgramas."""
+        return TabelaAutomato(self, ordem)
+
+
+class TabelaAutomato:
+    """Transições de uma ordem n lidas do autômato, com a interface de TabelaNgramas."""
+
+    __slots__ = ('automato', 'ordem')
+
+    def __init__(self, automato, ordem):
+        self.automato = automato
+        self.ordem = ordem
+
+    def __len__(self):
+        return self.automato.contextos_por_ordem[self.ordem]
+
+    def __contains__(self, contexto):
+        return len(contexto) == self.ordem - 1 and self.automato.linha(contexto) is not None
+
+    def distribuicao(self, contexto):
+        """Retorna (sucessores, contagens) do contexto, ou None se ele não existe."""
+        if len(contexto) != self.ordem - 1:
+            return None
+        linha = self.automato.linha(contexto)
+        if linha is None:
+            return None
+        a, b = linha
+        return self.automato.sucessores[a:b], self.automato.contagens[a:b]
+
+    def escolher(self, contexto, rng=random):
+        """Sorteia um sucessor do contexto proporcionalmente à contagem."""
+        if len(contexto) != self.ordem - 1:
+            return None
+        linha = self.automato.linha(contexto)
+        if linha is None:
+            return None
+        a, b = linha
+        if b - a == 1:
+            return self.automato.sucessores[a]
+        return rng.choices(self.automato.sucessores[a:b], weights=self.automato.contagens[a:b])[0]
+
+    def escolher_controlado(self, contexto, rng=random, temperatura=1.0, top_k=0, top_p=1.0):
+        """Sorteia um sucessor do contexto com temperatura, top-k e núcleo (top-p)."""
+        if len(contexto) != self.ordem - 1:
+            return None
+        linha = self.automato.linha(contexto)
+        if linha is None:
+            return None
+        a, b = linha
+        if b - a == 1:
+            return self.automato.sucessores[a]
+        acumulado = self.automato.acumulado(temperatura)
+        return self.automato.sucessores[sortear_prefixo(acumulado, a, b, rng, top_k, top_p)]
+
+    def tamanho_bytes(self):
+        """O autômato é compartilhado pelas ordens; a conta fica no modelo."""
+        return 0
+
+    def dados(self):
+        """Expande a ordem no formato de TabelaNgramas, para persistência."""
+        linhas = {}
+        inicio = array('I')
+        sucessores = array('I')
+        contagens = array('I')
+        for contexto in sorted(self.automato.contextos(self.ordem)):
+            s, c = self.distribuicao(contexto)
+            linhas[contexto] = len(linhas)
+            inicio.append(len(sucessores))
+            sucessores.extend(s)
+            contagens.extend(c)
+        inicio.append(len(sucessores))
+        return (linhas, inicio, sucessores, contagens)
+
+
+def compactar(modelo):
+    """
+    Retorna um ModeloMarkov equivalente cujas tabelas são lidas do autômato.
+
+    O modelo resultante serve às mesmas funções de geração e sorteia
+    exatamente as mesmas palavras com a mesma semente.
+    """
+    automato = AutomatoContextos.construir(modelo.tabelas)
+    tabelas = {ordem: automato.tabela(ordem) for ordem in modelo.tabelas}
+    compacto = ModeloMarkov(modelo.nome, modelo.vocabulario, modelo.tokens, tabelas,
+                            modelo.fontes, modelo.estatisticas)
+    compacto.automato = automato
+    compacto._tamanho_bytes = modelo.tamanho_bytes() - sum(
+        tabela.tamanho_bytes() for tabela in modelo.tabelas.values()) + automato.tamanho_bytes()
+    return compacto
+
+
+def tamanho_dicionario_listas(modelo, ordem):
+    """
+    Memória do dicionário de listas equivalente à ordem (como em criar_ngramas):
+    uma tupla de palavras por contexto e uma entrada na lista por ocorrência.
+    """
+    tabela = modelo.tabelas[ordem]
+    ponteiro = 8
+    entradas = len(tabela)
+    total = sys.getsizeof({}) + entradas * 3 * ponteiro * 3 // 2  # tabela hash com folga
+    total += entradas * sys.getsizeof(tuple(range(ordem - 1)))
+    for linha in tabela.linhas.values():
+        ocorrencias = sum(tabela.contagens[tabela.inicio[linha]:tabela.inicio[linha + 1]])
+        total += sys.getsizeof([]) + ocorrencias * ponteiro
+    return total
+
+
+def verificar(modelo, compacto, semente=0, amostras=5000):
+    """Compara distribuições e geração do modelo compacto com as do original."""
+    rng = random.Random(semente)
+    divergencias = 0
+    for ordem, tabela in modelo.tabelas.items():
+        visao = compacto.tabelas[ordem]
+        if len(tabela) != len(visao) or sum(1 for _ in compacto.automato.contextos(ordem)) != len(tabela):
+            divergencias += 1
+        for _ in range(amostras):
+            i = rng.randrange(len(modelo.tokens) - ordem + 1)
+            contexto = tuple(modelo.tokens[i:i + ordem - 1])
+            if tabela.distribuicao(contexto) != visao.distribuicao(contexto):
+                divergencias += 1
+        contexto = tuple(modelo.tokens[:ordem - 1])
+        a, b = random.Random(semente), random.Random(semente)
+        for _ in range(500):
+            x, y = tabela.escolher(contexto, a), visao.escolher(contexto, b)
+            if x != y:
+                divergencias += 1
+                break
+            if x is None:
+                break
+            contexto = contexto[1:] + (x,)
+    return divergencias
+
+
+def main():
+    nome = sys.argv[1] if len(sys.argv) > 1 else 'alice'
+    modelo = RegistroModelos().obter(nome)
+
+    inicio = time.perf_counter()
+    compacto = compactar(modelo)
+    automato = compacto.automato
+    print(f"Autômato de '{nome}' construído em {time.perf_counter() - inicio:.2f}s: "
+          f"{len(automato.distribuicoes):,} estados, {len(automato.rotulos):,} arestas, "
+          f"{len(automato.inicio_dist) - 1:,} distribuições distintas")
+
+    contextos = sum(len(tabela) for tabela in modelo.tabelas.values())
+    listas = sum(tamanho_dicionario_listas(modelo, ordem) for ordem in modelo.ordens)
+    tabelas = sum(tabela.tamanho_bytes() for tabela in modelo.tabelas.values())
+    dawg = automato.tamanho_bytes()
+    print(f"\n{contextos:,} contextos nas ordens {modelo.ordens[0]}-{modelo.ordens[-1]}")
+    print(f"  dicionário de listas: {listas / 2**20:7.1f} MB")
+    print(f"  tabelas compiladas:   {tabelas / 2**20:7.1f} MB")
+    print(f"  autômato minimizado:  {dawg / 2**20:7.1f} MB "
+          f"({listas / dawg:.1f}x menor que o dicionário, {tabelas / dawg:.1f}x menor que as tabelas)")
+
+    print(f"\nDivergências em relação ao modelo original: {verificar(modelo, compacto)}")
+
+    rng = random.Random(0)
+    for ordem in modelo.ordens:
+        amostra = [tuple(modelo.tokens[i:i + ordem - 1])
+                   for i in (rng.randrange(len(modelo.tokens) - ordem) for _ in range(20_000))]
+        tempos = []
+        for tabela in (modelo.tabelas[ordem], compacto.tabelas[ordem]):
+            inicio = time.perf_counter()
+            for contexto in amostra:
+                tabela.escolher(contexto, rng)
+            tempos.append(len(amostra) / (time.perf_counter() - inicio))
+        print(f"  {ordem}-gramas: {tempos[0]:,.0f} sorteios/s nas tabelas, {tempos[1]:,.0f} no autômato")
+
+
+if __name__ == "__main__":
+    main()
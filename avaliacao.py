@@ -0,0 +1,267 @@
+"""
+Avaliação dos modelos de n-gramas em texto separado (held-out).
+
+Divide o corpus em treino e teste e, para cada ordem n, mede:
+
+- cobertura: fração das palavras de teste cujo n-grama completo aparece
+  no treino (é onde o modelo exato consegue continuar sem recuar);
+- perplexidade exata: perplexidade do modelo de máxima verossimilhança
+  da ordem n, medida só nas posições cobertas;
+- perplexidade com recuo: perplexidade do modelo interpolado de
+  Witten-Bell (ordem n recuando até unigramas com suavização add-one),
+  medida em todas as posições de teste;
+- taxa de cópia: fração das janelas de `janela_copia` palavras do texto
+  gerado pela ordem n que aparecem literalmente no treino.
+
+As probabilidades são calculadas de forma vetorizada com NumPy: cada
+janela de k palavras recebe uma chave inteira exata (o posto da janela
+entre todas as janelas distintas) e as contagens saem de np.bincount.
+As ordens são avaliadas em paralelo, uma por processo.
+
+Uso: python avaliacao.py [corpus] [--teste 0.1] [--processos N] [--replicar K]
+"""
+
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from modelo import TabelaNgramas
+from registro import RegistroModelos
+
+ORDENS = range(2, 7)
+
+
+def chaves_janelas(seq, ordem_max):
+    """
+    Calcula chaves exatas para todas as janelas de 1 até ordem_max ids.
+
+    A chave da janela de k ids que começa na posição i é o posto do par
+    (chave da janela de k-1 ids em i, id em i+k-1) entre todos os pares
+    distintos, de modo que janelas iguais recebem chaves iguais.
+
+    Args:
+        seq (np.ndarray): Sequência de ids
+        ordem_max (int): Maior tamanho de janela
+
+    Returns:
+        dict: k -> np.ndarray com a chave de cada janela de k ids
+    """
+    base = int(seq.max()) + 1
+    atual = seq.astype(np.int64)
+    chaves = {1: atual}
+    for k in range(2, ordem_max + 1):
+        combinada = atual[:-1] * base + seq[k - 1:]
+        _, atual = np.unique(combinada, return_inverse=True)
+        chaves[k] = atual.astype(np.int64)
+    return chaves
+
+
+def janelas_validas(seq, k, separador):
+    """Máscara das janelas de k ids que não contêm o separador."""
+    acumulado = np.concatenate(([0], np.cumsum(seq == separador)))
+    return acumulado[k:] == acumulado[:-k]
+
+
+def perplexidades(chaves, ordem, limite_treino, alvos, vocabulario):
+    """
+    Calcula cobertura e perplexidades da ordem dada nas posições alvo.
+
+    Args:
+        chaves (dict): Chaves das janelas (ver chaves_janelas) para 1..ordem
+        ordem (int): Ordem n avaliada
+        limite_treino (int): Posições [0, limite_treino) formam o treino
+        alvos (np.ndarray): Posições de teste das palavras a prever
+        vocabulario (int): Número de palavras distintas (treino e teste)
+
+    Returns:
+        tuple: (cobertura, perplexidade exata, perplexidade com recuo)
+    """
+    # Modelo base: unigramas do treino com suavização add-one
+    unigramas = np.bincount(chaves[1][:limite_treino], minlength=chaves[1].max() + 1)
+    prob = (unigramas[chaves[1][alvos]] + 1.0) / (limite_treino + vocabulario)
+
+    cont_ngrama = cont_contexto = None
+    for n in range(2, ordem + 1):
+        ngramas = chaves[n]
+        contextos = chaves[n - 1]
+        treino = limite_treino - n + 1  # janelas de n ids inteiramente no treino
+
+        cont_ngrama = np.bincount(ngramas[:treino], minlength=ngramas.max() + 1)
+        cont_contexto = np.bincount(contextos[:treino], minlength=contextos.max() + 1)
+
+        # Witten-Bell: peso do recuo proporcional aos tipos distintos após o contexto
+        contexto_do_ngrama = np.zeros(ngramas.max() + 1, dtype=np.int64)
+        contexto_do_ngrama[ngramas] = contextos[:len(ngramas)]
+        vistos = np.flatnonzero(cont_ngrama)
+        tipos = np.bincount(contexto_do_ngrama[vistos], minlength=len(cont_contexto))
+
+        inicio = alvos - n + 1
+        c_ngrama = cont_ngrama[ngramas[inicio]]
+        c_contexto = cont_contexto[contextos[inicio]]
+        t_contexto = tipos[contextos[inicio]]
+
+        visto = c_contexto > 0
+        prob = np.where(
+            visto,
+            (c_ngrama + t_contexto * prob) / np.maximum(c_contexto + t_contexto, 1),
+            prob,
+        )
+
+    inicio = alvos - ordem + 1
+    c_ngrama = cont_ngrama[chaves[ordem][inicio]]
+    c_contexto = cont_contexto[chaves[ordem - 1][inicio]]
+    coberto = c_ngrama > 0
+
+    cobertura = float(coberto.mean())
+    if coberto.any():
+        exata = float(np.exp(-np.mean(np.log(c_ngrama[coberto] / c_contexto[coberto]))))
+    else:
+        exata = float('inf')
+    recuo = float(np.exp(-np.mean(np.log(prob))))
+    return cobertura, exata, recuo
+
+
+def gerar_amostra(treino, ordem, palavras, rng, separador):
+    """
+    Gera `palavras` ids com o modelo exato da ordem dada.
+
+    Quando um contexto não tem continuação, recomeça de uma posição
+    aleatória do treino; os trechos ficam separados pelo separador.
+    """
+    tabela = TabelaNgramas.construir(treino.tolist(), ordem)
+    contexto_size = ordem - 1
+    saida = []
+
+    while len(saida) < palavras:
+        inicio = rng.randrange(len(treino) - contexto_size)
+        trecho = treino[inicio:inicio + contexto_size].tolist()
+        while len(trecho) < palavras:
+            proximo = tabela.escolher(tuple(trecho[-contexto_size:]), rng)
+            if proximo is None:
+                break
+            trecho.append(proximo)
+        saida.extend(trecho)
+        saida.append(separador)
+
+    return np.array(saida[:palavras], dtype=np.int64)
+
+
+def taxa_copia(treino, gerado, janela, separador):
+    """Fração das janelas do texto gerado que aparecem literalmente no treino."""
+    seq = np.concatenate((treino, [separador], gerado))
+    chaves = chaves_janelas(seq, janela)[janela]
+    validas = janelas_validas(seq, janela, separador)
+
+    limite = len(treino) - janela + 1
+    do_treino = chaves[:limite]
+    geradas = chaves[len(treino) + 1:][validas[len(treino) + 1:]]
+    if not len(geradas):
+        return 0.0
+    return float(np.isin(geradas, do_treino).mean())
+
+
+def _avaliar_ordem(argumentos):
+    """Avalia uma ordem; executada em um processo separado."""
+    (ordem, chaves, limite_treino, alvos, vocabulario, separador,
+     treino, palavras_geradas, janela_copia, semente) = argumentos
+    inicio = time.perf_counter()
+
+    cobertura, exata, recuo = perplexidades(chaves, ordem, limite_treino, alvos, vocabulario)
+
+    rng = random.Random(semente + ordem)
+    gerado = gerar_amostra(treino, ordem, palavras_geradas, rng, separador)
+    copia = taxa_copia(treino, gerado, janela_copia, separador)
+
+    return {
+        'ordem': ordem,
+        'cobertura': cobertura,
+        'perplexidade_exata': exata,
+        'perplexidade_recuo': recuo,
+        'taxa_copia': copia,
+        'segundos': time.perf_counter() - inicio,
+    }
+
+
+def avaliar(ids, ordens=ORDENS, fracao_teste=0.1, processos=None,
+            palavras_geradas=5000, janela_copia=8, semente=0):
+    """
+    Avalia cada ordem em texto separado do fim do corpus.
+
+    Args:
+        ids (sequence): Corpus como ids (por exemplo, ModeloMarkov.tokens)
+        ordens (iterable): Ordens n a avaliar
+        fracao_teste (float): Fração final do corpus usada como teste
+        processos (int): Processos em paralelo (padrão: um por ordem, até o
+            número de CPUs; 1 avalia no processo atual)
+        palavras_geradas (int): Tamanho da amostra gerada para a taxa de cópia
+        janela_copia (int): Tamanho das janelas comparadas na taxa de cópia
+        semente (int): Semente da geração
+
+    Returns:
+        list: um dicionário de métricas por ordem
+    """
+    ordens = sorted(ordens)
+    ids = np.asarray(ids, dtype=np.int64)
+    limite_treino = int(len(ids) * (1 - fracao_teste))
+    if limite_treino <= ordens[-1] or len(ids) - limite_treino <= ordens[-1]:
+        raise ValueError("Corpus muito pequeno para a divisão treino/teste pedida.")
+
+    # Treino e teste separados por um id que não ocorre no corpus, para que
+    # nenhuma janela atravesse a divisão
+    separador = int(ids.max()) + 1
+    treino, teste = ids[:limite_treino], ids[limite_treino:]
+    seq = np.concatenate((treino, [separador], teste))
+    vocabulario = len(np.unique(ids))
+    chaves = chaves_janelas(seq, ordens[-1])
+
+    # Mesmas posições alvo para todas as ordens: contexto inteiro dentro do teste
+    alvos = np.arange(limite_treino + 1 + ordens[-1] - 1, len(seq))
+
+    # Cada processo recebe só as chaves das janelas de que a sua ordem precisa
+    argumentos = [
+        (ordem, {k: chaves[k] for k in range(1, ordem + 1)}, limite_treino, alvos,
+         vocabulario, separador, treino, palavras_geradas, janela_copia, semente)
+        for ordem in ordens
+    ]
+
+    if processos is None:
+        processos = min(len(ordens), os.cpu_count() or 1)
+    if processos <= 1:
+        return [_avaliar_ordem(arg) for arg in argumentos]
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        return list(executor.map(_avaliar_ordem, argumentos))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Avalia as ordens dos n-gramas em texto separado.")
+    parser.add_argument("corpus", nargs="?", default="alice", help="nome do corpus (padrão: alice)")
+    parser.add_argument("--teste", type=float, default=0.1, help="fração do corpus usada como teste")
+    parser.add_argument("--processos", type=int, default=None, help="processos em paralelo")
+    parser.add_argument("--replicar", type=int, default=1,
+                        help="repete o corpus K vezes (para medir o desempenho em corpora grandes)")
+    parser.add_argument("--semente", type=int, default=0, help="semente da geração")
+    args = parser.parse_args()
+
+    modelo = RegistroModelos().obter(args.corpus)
+    ids = np.tile(np.frombuffer(modelo.tokens, dtype=np.uint32), args.replicar)
+
+    print(f"Corpus '{args.corpus}': {len(ids):,} palavras, {args.teste:.0%} para teste")
+    inicio = time.perf_counter()
+    resultados = avaliar(ids, fracao_teste=args.teste, processos=args.processos,
+                         semente=args.semente)
+    total = time.perf_counter() - inicio
+
+    print(f"\n{'n':>2} {'cobertura':>10} {'perpl. exata':>13} {'perpl. recuo':>13} {'cópia':>7} {'tempo':>7}")
+    print("-" * 57)
+    for r in resultados:
+        print(f"{r['ordem']:>2} {r['cobertura']:>10.1%} {r['perplexidade_exata']:>13.1f} "
+              f"{r['perplexidade_recuo']:>13.1f} {r['taxa_copia']:>7.1%} {r['segundos']:>6.2f}s")
+    print(f"\nTempo total: {total:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
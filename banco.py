@@ -0,0 +1,491 @@
+"""
+Modelo de Markov servido a partir de um banco SQLite.
+
+Para corpora que não cabem em memória, as transições ficam em um banco
+SQLite local, indexado por (ordem, contexto, sucessor). A construção lê os
+textos linha a linha e grava as contagens em lotes com `executemany`, em
+modo WAL; durante a geração só ficam residentes o vocabulário e um cache
+LRU com os contextos mais consultados. O modelo tem a mesma interface de
+ModeloMarkov (tabelas por ordem com `escolher`, `ids`, `palavras`,
+`tokens`), então serve às mesmas funções de geração.
+
+Uso: python banco.py [corpus] [--saida modelos/alice.sqlite] [--verificar]
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect
+from collections import Counter, OrderedDict, deque
+from itertools import accumulate
+
+from modelo import (PASTA_MODELOS, VERSAO_FORMATO, acumular,
+                    construir_corpus, encontrar_palavras_interessantes,
+                    impressao_fontes, ler_tokens, listar_corpora,
+                    sortear_prefixo)
+
+# n-gramas acumulados em memória antes de cada gravação em lote
+TAMANHO_LOTE = 200_000
+
+# Ids do corpus gravados por linha da tabela de tokens
+TOKENS_POR_BLOCO = 1 << 16
+
+# Contextos mantidos no cache LRU de cada ordem
+CONTEXTOS_EM_CACHE = 50_000
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vocabulario (
+    id INTEGER PRIMARY KEY,
+    palavra TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tokens (
+    bloco INTEGER PRIMARY KEY,
+    ids BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transicoes (
+    ordem INTEGER NOT NULL,
+    contexto BLOB NOT NULL,
+    sucessor INTEGER NOT NULL,
+    contagem INTEGER NOT NULL,
+    PRIMARY KEY (ordem, contexto, sucessor)
+) WITHOUT ROWID;
+"""
+
+INSERIR_TRANSICOES = """
+INSERT INTO transicoes (ordem, contexto, sucessor, contagem) VALUES (?, ?, ?, ?)
+ON CONFLICT (ordem, contexto, sucessor) DO UPDATE SET contagem = contagem + excluded.contagem
+"""
+
+CONSULTAR_TRANSICOES = """
+SELECT sucessor, contagem FROM transicoes
+WHERE ordem = ? AND contexto = ?
+ORDER BY contagem DESC, sucessor
+"""
+
+
+def chave_contexto(ids):
+    """Codifica uma tupla de ids como a chave binária do contexto."""
+    return array('I', ids).tobytes()
+
+
+def construir_banco(caminho, nome, arquivos, ordens=range(2, 7), tamanho_lote=TAMANHO_LOTE):
+    """
+    Constrói o banco SQLite de um corpus sem carregá-lo inteiro em memória.
+
+    Args:
+        caminho (str): Arquivo do banco (substituído se já existir)
+        nome (str): Nome do corpus
+        arquivos (tuple): Arquivos de texto do corpus
+        ordens (iterable): Ordens n dos n-gramas a construir
+        tamanho_lote (int): n-gramas acumulados antes de cada gravação
+
+    Returns:
+        ModeloSQLite: o modelo aberto a partir do banco construído
+    """
+    ordens = sorted(ordens)
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    temporario = f"{caminho}.tmp"
+    for sufixo in ('', '-wal', '-shm'):
+        if os.path.exists(temporario + sufixo):
+            os.remove(temporario + sufixo)
+
+    conexao = sqlite3.connect(temporario)
+    conexao.execute("PRAGMA journal_mode = WAL")
+    conexao.execute("PRAGMA synchronous = NORMAL")
+    conexao.executescript(ESQUEMA)
+
+    indice = {}
+    frequencias = Counter()
+    janela = deque(maxlen=ordens[-1])
+    lote = Counter()
+    bloco = array('I')
+    blocos = 0
+    total = 0
+
+    def gravar_lote():
+        conexao.executemany(INSERIR_TRANSICOES,
+                            ((o, c, s, q) for (o, c, s), q in lote.items()))
+        conexao.commit()
+        lote.clear()
+
+    for token in ler_tokens(arquivos):
+        i = indice.setdefault(token, len(indice))
+        janela.append(i)
+        frequencias[i] += 1
+        bloco.append(i)
+        total += 1
+
+        for ordem in ordens:
+            if len(janela) < ordem:
+                break
+            contexto = tuple(janela)[len(janela) - ordem:-1]
+            lote[ordem, chave_contexto(contexto), i] += 1
+
+        if len(lote) >= tamanho_lote:
+            gravar_lote()
+        if len(bloco) == TOKENS_POR_BLOCO:
+            conexao.execute("INSERT INTO tokens VALUES (?, ?)", (blocos, bloco.tobytes()))
+            blocos += 1
+            bloco = array('I')
+
+    gravar_lote()
+    if bloco:
+        conexao.execute("INSERT INTO tokens VALUES (?, ?)", (blocos, bloco.tobytes()))
+    conexao.executemany("INSERT INTO vocabulario VALUES (?, ?)",
+                        ((i, palavra) for palavra, i in indice.items()))
+
+    vocabulario = list(indice)
+    contador = Counter({vocabulario[i]: freq for i, freq in frequencias.items()})
+    contextos = dict(conexao.execute(
+        "SELECT ordem, COUNT(*) FROM (SELECT DISTINCT ordem, contexto FROM transicoes) GROUP BY ordem"))
+    estatisticas = {
+        'total_palavras': total,
+        'palavras_unicas': len(contador),
+        'mais_frequentes': contador.most_common(50),
+        'contextos_por_ordem': {ordem: contextos.get(ordem, 0) for ordem in ordens},
+        'palavras_interessantes': encontrar_palavras_interessantes(contador),
+    }
+    meta = {
+        'versao': VERSAO_FORMATO,
+        'nome': nome,
+        'ordens': ordens,
+        'total_tokens': total,
+        'fontes': impressao_fontes(arquivos),
+        'estatisticas': estatisticas,
+    }
+    conexao.executemany("INSERT INTO meta VALUES (?, ?)",
+                        ((chave, json.dumps(valor)) for chave, valor in meta.items()))
+    conexao.commit()
+    conexao.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conexao.close()
+
+    os.replace(temporario, caminho)
+    return ModeloSQLite(caminho)
+
+
+class TokensSQLite:
+    """Sequência dos ids do corpus, lida do banco em blocos sob demanda."""
+
+    def __init__(self, modelo, total):
+        self._modelo = modelo
+        self._total = total
+
+    def __len__(self):
+        return self._total
+
+    def _bloco(self, numero):
+        (dados,) = self._modelo._consultar("SELECT ids FROM tokens WHERE bloco = ?", (numero,))[0]
+        bloco = array('I')
+        bloco.frombytes(dados)
+        return bloco
+
+    def __getitem__(self, posicao):
+        if isinstance(posicao, slice):
+            inicio, fim, passo = posicao.indices(self._total)
+            if passo != 1:
+                return array('I', (self[i] for i in range(inicio, fim, passo)))
+            resultado = array('I')
+            while inicio < fim:
+                numero, deslocamento = divmod(inicio, TOKENS_POR_BLOCO)
+                pedaco = self._bloco(numero)[deslocamento:deslocamento + fim - inicio]
+                resultado.extend(pedaco)
+                inicio += len(pedaco)
+            return resultado
+        if posicao < 0:
+            posicao += self._total
+        if not 0 <= posicao < self._total:
+            raise IndexError("posição fora do corpus")
+        numero, deslocamento = divmod(posicao, TOKENS_POR_BLOCO)
+        return self._bloco(numero)[deslocamento]
+
+    def __iter__(self):
+        for numero in range((self._total + TOKENS_POR_BLOCO - 1) // TOKENS_POR_BLOCO):
+            yield from self._bloco(numero)
+
+
+class TabelaSQLite:
+    """
+    Transições de uma ordem n lidas do banco, com a interface de TabelaNgramas.
+
+    As linhas consultadas ficam em um cache LRU com os sucessores e as
+    contagens acumuladas, de modo que contextos frequentes não voltam ao
+    banco e o sorteio é uma busca binária.
+    """
+
+    def __init__(self, modelo, ordem, contextos, tamanho_cache=CONTEXTOS_EM_CACHE):
+        self._modelo = modelo
+        self.ordem = ordem
+        self._contextos = contextos
+        self.tamanho_cache = tamanho_cache
+        self._cache = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+
+    def __len__(self):
+        return self._contextos
+
+    def __contains__(self, contexto):
+        return self._linha(contexto) is not None
+
+    def _linha(self, contexto):
+        # O modelo é compartilhado entre sessões: o cache usa o lock da conexão
+        lock = self._modelo._lock
+        with lock:
+            linha = self._cache.get(contexto)
+            if linha is not None:
+                self._cache.move_to_end(contexto)
+                self.acertos += 1
+                return linha or None
+            self.falhas += 1
+
+        resultado = self._modelo._consultar(CONSULTAR_TRANSICOES,
+                                            (self.ordem, chave_contexto(contexto)))
+        if resultado:
+            sucessores, contagens = zip(*resultado)
+            # O último campo guarda os acumulados de outras temperaturas
+            linha = (sucessores, contagens, list(accumulate(contagens)), {})
+        else:
+            linha = ()  # Contextos ausentes também ficam no cache
+        with lock:
+            self._cache[contexto] = linha
+            if len(self._cache) > self.tamanho_cache:
+                self._cache.popitem(last=False)
+        return linha or None
+
+    def distribuicao(self, contexto):
+        """Retorna (sucessores, contagens) do contexto, ou None se ele não existe."""
+        linha = self._linha(contexto)
+        if linha is None:
+            return None
+        return linha[0], linha[1]
+
+    def escolher(self, contexto, rng=random):
+        """Sorteia um sucessor do contexto proporcionalmente à contagem."""
+        linha = self._linha(contexto)
+        if linha is None:
+            return None
+        sucessores, _, acumulado, _ = linha
+        if len(sucessores) == 1:
+            return sucessores[0]
+        # Mesmo sorteio de random.choices com pesos, sem recalcular as somas
+        return sucessores[bisect(acumulado, rng.random() * acumulado[-1], 0, len(acumulado) - 1)]
+
+    def escolher_controlado(self, contexto, rng=random, temperatura=1.0, top_k=0, top_p=1.0):
+        """Sorteia um sucessor do contexto com temperatura, top-k e núcleo (top-p)."""
+        linha = self._linha(contexto)
+        if linha is None:
+            return None
+        sucessores, contagens, acumulado, temperados = linha
+        if len(sucessores) == 1:
+            return sucessores[0]
+        if temperatura != 1.0:
+            acumulado = temperados.get(temperatura)
+            if acumulado is None:
+                acumulado = temperados[temperatura] = acumular((0, len(contagens)), contagens, temperatura)
+        return sucessores[sortear_prefixo(acumulado, 0, len(sucessores), rng, top_k, top_p)]
+
+    def tamanho_bytes(self):
+        """Estimativa do espaço ocupado pelo cache de contextos."""
+        with self._modelo._lock:
+            itens = list(self._cache.items())
+        total = sys.getsizeof(self._cache)
+        for contexto, linha in itens:
+            total += sys.getsizeof(contexto) + sys.getsizeof(linha)
+            total += sum(sys.getsizeof(parte) for parte in linha)
+        return total
+
+
+class ModeloSQLite:
+    """
+    Modelo de n-gramas servido a partir de um banco construído por construir_banco.
+
+    Mantém a interface de ModeloMarkov usada pela geração. A conexão é
+    compartilhada entre threads e protegida por um lock; o banco é aberto
+    só para leitura.
+
+    Args:
+        caminho (str): Arquivo do banco
+        tamanho_cache (int): Contextos mantidos no cache LRU de cada ordem
+    """
+
+    def __init__(self, caminho, tamanho_cache=CONTEXTOS_EM_CACHE):
+        if not os.path.exists(caminho):
+            raise FileNotFoundError(f"Banco não encontrado: {caminho}")
+        self.caminho = caminho
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False, cached_statements=16)
+        self._conexao.execute("PRAGMA query_only = ON")
+        self._lock = threading.Lock()
+
+        meta = {chave: json.loads(valor)
+                for chave, valor in self._consultar("SELECT chave, valor FROM meta")}
+        if meta.get('versao') != VERSAO_FORMATO:
+            raise ValueError(f"Formato de modelo incompatível em '{caminho}'.")
+
+        estatisticas = meta['estatisticas']
+        estatisticas['mais_frequentes'] = [tuple(item) for item in estatisticas['mais_frequentes']]
+        estatisticas['contextos_por_ordem'] = {
+            int(ordem): quantidade for ordem, quantidade in estatisticas['contextos_por_ordem'].items()
+        }
+
+        self.nome = meta['nome']
+        self.fontes = tuple(tuple(fonte) for fonte in meta['fontes'])
+        self.estatisticas = estatisticas
+        self.vocabulario = [palavra for (palavra,) in
+                            self._consultar("SELECT palavra FROM vocabulario ORDER BY id")]
+        self.indice = {palavra: i for i, palavra in enumerate(self.vocabulario)}
+        self.tokens = TokensSQLite(self, meta['total_tokens'])
+        self.tabelas = {
+            ordem: TabelaSQLite(self, ordem, estatisticas['contextos_por_ordem'][ordem], tamanho_cache)
+            for ordem in meta['ordens']
+        }
+
+    def _consultar(self, sql, parametros=()):
+        with self._lock:
+            return self._conexao.execute(sql, parametros).fetchall()
+
+    @property
+    def ordens(self):
+        return sorted(self.tabelas)
+
+    def ids(self, palavras):
+        """Converte palavras em tupla de ids, ou None se alguma não está no vocabulário."""
+        try:
+            return tuple(self.indice[palavra] for palavra in palavras)
+        except KeyError:
+            return None
+
+    def palavras(self, ids=None):
+        """Converte ids em palavras (por padrão, o corpus inteiro)."""
+        if ids is None:
+            ids = self.tokens
+        vocabulario = self.vocabulario
+        return [vocabulario[i] for i in ids]
+
+    def escolher(self, ordem, contexto, rng=random, temperatura=1.0, top_k=0, top_p=1.0):
+        """Sorteia a palavra seguinte a um contexto de palavras na ordem dada."""
+        tabela = self.tabelas.get(ordem)
+        ids = self.ids(contexto)
+        if tabela is None or ids is None:
+            return None
+        if temperatura == 1.0 and not top_k and top_p >= 1.0:
+            proximo = tabela.escolher(ids, rng)
+        else:
+            proximo = tabela.escolher_controlado(ids, rng, temperatura, top_k, top_p)
+        return None if proximo is None else self.vocabulario[proximo]
+
+    def preparar(self, ordens):
+        """Nada a carregar: as tabelas são consultadas no banco contexto a contexto."""
+
+    def tamanho_bytes(self):
+        """Memória residente: vocabulário, índice e caches de contextos."""
+        total = sys.getsizeof(self.vocabulario) + sys.getsizeof(self.indice)
+        total += sum(sys.getsizeof(palavra) for palavra in self.vocabulario)
+        total += sum(tabela.tamanho_bytes() for tabela in self.tabelas.values())
+        return total
+
+    def tamanho_disco(self):
+        """Tamanho do arquivo do banco, em bytes."""
+        return os.path.getsize(self.caminho)
+
+    def fechar(self):
+        with self._lock:
+            self._conexao.close()
+
+
+def caminho_banco(nome, pasta=PASTA_MODELOS):
+    """Caminho do banco SQLite de um corpus."""
+    return os.path.join(pasta, f"{nome}.sqlite")
+
+
+def verificar(modelo, referencia, amostras=2000, semente=0):
+    """
+    Compara o modelo do banco com o modelo em memória do mesmo corpus.
+
+    Confere as distribuições de contextos sorteados do corpus e a geração
+    com a mesma semente, que deve produzir exatamente o mesmo texto.
+
+    Returns:
+        int: número de divergências encontradas
+    """
+    rng = random.Random(semente)
+    divergencias = 0
+    if list(modelo.tokens) != list(referencia.tokens):
+        divergencias += 1
+
+    for ordem in referencia.ordens:
+        esperado, obtido = referencia.tabelas[ordem], modelo.tabelas[ordem]
+        if len(esperado) != len(obtido):
+            divergencias += 1
+        for _ in range(amostras):
+            i = rng.randrange(len(referencia.tokens) - ordem + 1)
+            contexto = tuple(referencia.tokens[i:i + ordem - 1])
+            a, b = esperado.distribuicao(contexto), obtido.distribuicao(contexto)
+            if list(a[0]) != list(b[0]) or list(a[1]) != list(b[1]):
+                divergencias += 1
+
+        contexto = tuple(referencia.palavras(referencia.tokens[:ordem - 1]))
+        textos = []
+        for candidato in (referencia, modelo):
+            sorteio = random.Random(semente)
+            palavras = list(contexto)
+            for _ in range(200):
+                proxima = candidato.escolher(ordem, palavras[len(palavras) - ordem + 1:], sorteio)
+                if proxima is None:
+                    break
+                palavras.append(proxima)
+            textos.append(palavras)
+        if textos[0] != textos[1]:
+            divergencias += 1
+
+    return divergencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Constrói o banco SQLite de um corpus.")
+    parser.add_argument("corpus", nargs="?", default="alice", help="nome do corpus (padrão: alice)")
+    parser.add_argument("--saida", default=None, help="arquivo do banco (padrão: modelos/<corpus>.sqlite)")
+    parser.add_argument("--verificar", action="store_true",
+                        help="compara o banco com o modelo em memória e mede as consultas")
+    args = parser.parse_args()
+
+    corpora = listar_corpora()
+    if args.corpus not in corpora:
+        sys.exit(f"Corpus '{args.corpus}' desconhecido.")
+    caminho = args.saida or caminho_banco(args.corpus)
+
+    inicio = time.perf_counter()
+    modelo = construir_banco(caminho, args.corpus, corpora[args.corpus])
+    print(f"{args.corpus}: {len(modelo.tokens):,} palavras em {time.perf_counter() - inicio:.2f}s, "
+          f"{modelo.tamanho_disco() / 2**20:.1f} MB em disco -> {caminho}")
+
+    if args.verificar:
+        referencia = construir_corpus(args.corpus, ordens=modelo.ordens, corpora=corpora)
+        print(f"Divergências em relação ao modelo em memória: {verificar(modelo, referencia)}")
+
+        rng = random.Random(0)
+        for ordem in modelo.ordens:
+            tabela = modelo.tabelas[ordem]
+            contextos = [tuple(referencia.tokens[i:i + ordem - 1])
+                         for i in (rng.randrange(len(referencia.tokens) - ordem) for _ in range(20_000))]
+            inicio = time.perf_counter()
+            for contexto in contextos:
+                tabela.escolher(contexto, rng)
+            segundos = time.perf_counter() - inicio
+            print(f"  {ordem}-gramas: {len(contextos) / segundos:,.0f} sorteios/s "
+                  f"(cache: {tabela.acertos:,} acertos, {tabela.falhas:,} falhas)")
+
+
+if __name__ == "__main__":
+    main()
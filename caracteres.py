@@ -0,0 +1,253 @@
+"""
+Modelo de Markov de caracteres.
+
+Para gerar nomes e palavras inventadas, a cadeia trabalha letra a letra.
+O alfabeto (letras do português, com acentos, mais o espaço) é pequeno o
+bastante para guardar as contagens em arrays NumPy: de forma densa, com
+uma linha para cada contexto possível, quando A^n cabe no limite, ou em
+blocos só com as linhas dos contextos observados, localizadas por busca
+binária. O sorteio usa as somas acumuladas de cada linha e avança muitas
+cadeias independentes ao mesmo tempo.
+
+Uso: python caracteres.py [corpus] [--ordem 4] [--palavras 20] [--caracteres 5000000]
+"""
+
+import argparse
+import re
+import time
+
+import numpy as np
+
+from modelo import ler_arquivos, listar_corpora
+
+# Letras do português; o índice 0 do alfabeto é o espaço (fronteira de palavra)
+LETRAS = 'abcdefghijklmnopqrstuvwxyzàáâãçéêíóôõúü'
+ALFABETO = ' ' + LETRAS
+
+# Maior número de células (contextos x alfabeto) guardadas de forma densa
+LIMITE_DENSO = 2**23
+
+
+class ModeloCaracteres:
+    """
+    Cadeia de Markov de ordem n sobre caracteres (contexto de n-1 letras).
+
+    Cada palavra do corpus é tratada como uma sequência separada, precedida
+    de n-1 espaços, de modo que o contexto só de espaços representa o
+    início de uma palavra.
+
+    Args:
+        ordem (int): Tamanho n dos n-gramas de caracteres
+        contextos (np.ndarray): Códigos dos contextos observados, ordenados,
+            ou None se a tabela é densa (linha = código do contexto)
+        acumulado (np.ndarray): Contagens acumuladas por linha, (linhas, A)
+    """
+
+    def __init__(self, ordem, contextos, acumulado):
+        self.ordem = ordem
+        self.contexto_size = ordem - 1
+        self.tamanho_alfabeto = len(ALFABETO)
+        self.modulo = self.tamanho_alfabeto ** self.contexto_size
+        self.contextos = contextos
+        self.acumulado = acumulado
+        self.totais = acumulado[:, -1]
+        self.alfabeto = np.array(list(ALFABETO))
+        self.linha_inicio = int(self.linhas(np.zeros(1, dtype=np.int64))[0])
+
+    @property
+    def denso(self):
+        return self.contextos is None
+
+    @classmethod
+    def construir(cls, texto, ordem=4, limite_denso=LIMITE_DENSO):
+        """Conta os n-gramas de caracteres do texto."""
+        if ordem < 2:
+            raise ValueError("ordem deve ser >= 2")
+
+        contexto_size = ordem - 1
+        palavras = re.findall(f'[{LETRAS}]+', texto.lower())
+        if not palavras:
+            raise ValueError("Texto sem letras para construir o modelo.")
+        separador = ' ' * contexto_size
+        sequencia = separador + separador.join(palavras) + ' '
+        indices = codificar(sequencia)
+
+        a = len(ALFABETO)
+        codigos = np.zeros(len(indices) - contexto_size, dtype=np.int64)
+        for j in range(ordem):
+            codigos = codigos * a + indices[j:len(indices) - contexto_size + j]
+
+        if a ** ordem <= limite_denso:
+            contextos = None
+            contagens = np.bincount(codigos, minlength=a ** ordem).reshape(-1, a)
+        else:
+            contextos, linhas = np.unique(codigos // a, return_inverse=True)
+            contagens = np.bincount(linhas * a + codigos % a,
+                                    minlength=len(contextos) * a).reshape(-1, a)
+
+        acumulado = np.cumsum(contagens, axis=1).astype(np.uint32)
+        return cls(ordem, contextos, acumulado)
+
+    def linhas(self, codigos):
+        """Linha de cada código de contexto, ou -1 para contextos nunca vistos."""
+        if self.denso:
+            return codigos
+        posicoes = np.searchsorted(self.contextos, codigos)
+        posicoes = np.minimum(posicoes, len(self.contextos) - 1)
+        return np.where(self.contextos[posicoes] == codigos, posicoes, -1)
+
+    def codigo_inicial(self, inicio=''):
+        """Código do contexto formado pelas últimas letras de `inicio`."""
+        a = self.tamanho_alfabeto
+        codigo = 0
+        for indice in codificar((' ' * self.contexto_size + inicio.lower())[-self.contexto_size:]):
+            codigo = codigo * a + int(indice)
+        return codigo
+
+    def gerar_lote(self, quantidade, tamanho, inicio='', rng=None):
+        """
+        Avança `quantidade` cadeias independentes por `tamanho` passos.
+
+        Returns:
+            np.ndarray: índices no alfabeto, forma (quantidade, tamanho)
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+
+        a = self.tamanho_alfabeto
+        codigos = np.full(quantidade, self.codigo_inicial(inicio), dtype=np.int64)
+        saida = np.empty((quantidade, tamanho), dtype=np.uint8)
+
+        for passo in range(tamanho):
+            linhas = self.linhas(codigos)
+            # Contexto sem continuação: fecha a palavra com um espaço e
+            # recomeça do contexto de início de palavra
+            sem_saida = (linhas < 0) | (self.totais[np.maximum(linhas, 0)] == 0)
+            linhas = np.where(sem_saida, self.linha_inicio, linhas)
+
+            acumulado = self.acumulado[linhas]
+            sorteio = (rng.random(quantidade) * acumulado[:, -1]).astype(np.int64)
+            proximos = (acumulado <= sorteio[:, None]).sum(axis=1)
+            proximos[sem_saida] = 0
+
+            saida[:, passo] = proximos
+            codigos = (codigos * a + proximos) % self.modulo
+            codigos[sem_saida] = 0
+
+        return saida
+
+    def gerar(self, tamanho, inicio='', rng=None):
+        """Gera um texto de `tamanho` caracteres continuando `inicio`."""
+        if rng is None:
+            rng = np.random.default_rng()
+
+        a = self.tamanho_alfabeto
+        codigo = self.codigo_inicial(inicio)
+        sorteios = rng.random(tamanho)
+        saida = np.empty(tamanho, dtype=np.uint8)
+
+        for passo in range(tamanho):
+            linha = int(self.linhas(np.array([codigo]))[0])
+            if linha < 0 or self.totais[linha] == 0:
+                # Sem continuação: fecha a palavra com um espaço, para que o
+                # recomeço não cole na anterior
+                saida[passo], codigo = 0, 0
+                continue
+            acumulado = self.acumulado[linha]
+            proximo = int(np.searchsorted(acumulado, int(sorteios[passo] * acumulado[-1]), side='right'))
+            saida[passo] = proximo
+            codigo = (codigo * a + proximo) % self.modulo
+
+        texto = inicio.lower() + ''.join(self.alfabeto[saida])
+        return re.sub(r' +', ' ', texto).strip()
+
+    def neologismos(self, quantidade, vocabulario=(), tamanho_minimo=4, tamanho_maximo=14, rng=None):
+        """
+        Inventa palavras que não aparecem no vocabulário.
+
+        Args:
+            quantidade (int): Número de palavras desejadas
+            vocabulario (set): Palavras conhecidas, que são descartadas
+            tamanho_minimo (int): Menor tamanho aceito
+            tamanho_maximo (int): Maior tamanho aceito
+            rng (np.random.Generator): Gerador de números aleatórios
+
+        Returns:
+            list: palavras inventadas, sem repetição
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+
+        encontradas = {}
+        for _ in range(20):
+            lote = self.gerar_lote(quantidade * 4, tamanho_maximo + 1, rng=rng)
+            for linha in self.alfabeto[lote]:
+                palavra = ''.join(linha).split(' ', 1)[0]
+                if (tamanho_minimo <= len(palavra) <= tamanho_maximo
+                        and palavra not in vocabulario):
+                    encontradas.setdefault(palavra, None)
+                    if len(encontradas) >= quantidade:
+                        return list(encontradas)
+        return list(encontradas)
+
+
+def codificar(texto):
+    """Converte o texto em índices do alfabeto (caracteres fora dele viram espaço)."""
+    pontos = np.frombuffer(texto.encode('utf-32-le'), dtype=np.uint32)
+    ordenados = np.array(sorted(ord(c) for c in ALFABETO), dtype=np.uint32)
+    indice_de = np.array([ALFABETO.index(chr(p)) for p in ordenados], dtype=np.int64)
+    posicoes = np.minimum(np.searchsorted(ordenados, pontos), len(ordenados) - 1)
+    return np.where(ordenados[posicoes] == pontos, indice_de[posicoes], 0)
+
+
+def palavras_do_texto(texto):
+    """Conjunto das palavras do texto, para descartar neologismos que já existem."""
+    return set(re.findall(f'[{LETRAS}]+', texto.lower()))
+
+
+def construir_corpus_caracteres(nome, ordem=4, corpora=None):
+    """
+    Constrói o modelo de caracteres do corpus com o nome dado.
+
+    Returns:
+        tuple: (ModeloCaracteres, conjunto das palavras do corpus)
+    """
+    if corpora is None:
+        corpora = listar_corpora()
+    if nome not in corpora:
+        raise KeyError(f"Corpus '{nome}' desconhecido.")
+    texto = ler_arquivos(corpora[nome])
+    return ModeloCaracteres.construir(texto, ordem), palavras_do_texto(texto)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera palavras inventadas com uma cadeia de caracteres.")
+    parser.add_argument("corpus", nargs="?", default="alice", help="nome do corpus (padrão: alice)")
+    parser.add_argument("--ordem", type=int, default=4, help="tamanho dos n-gramas de caracteres")
+    parser.add_argument("--palavras", type=int, default=20, help="palavras inventadas a mostrar")
+    parser.add_argument("--caracteres", type=int, default=5_000_000,
+                        help="caracteres gerados na medição de velocidade")
+    parser.add_argument("--seed", type=int, default=None, help="semente para resultados reprodutíveis")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    inicio = time.perf_counter()
+    modelo, vocabulario = construir_corpus_caracteres(args.corpus, args.ordem)
+    print(f"Modelo de {args.ordem}-gramas de caracteres "
+          f"({'denso' if modelo.denso else 'em blocos'}, {modelo.acumulado.shape[0]:,} linhas) "
+          f"construído em {time.perf_counter() - inicio:.2f}s")
+
+    print("\nPalavras inventadas:")
+    print(", ".join(modelo.neologismos(args.palavras, vocabulario, rng=rng)))
+
+    cadeias = 10_000
+    passos = max(1, args.caracteres // cadeias)
+    inicio = time.perf_counter()
+    modelo.gerar_lote(cadeias, passos, rng=rng)
+    segundos = time.perf_counter() - inicio
+    print(f"\n{cadeias * passos:,} caracteres em {segundos:.2f}s "
+          f"({cadeias * passos / segundos:,.0f} caracteres/s)")
+
+
+if __name__ == "__main__":
+    main()
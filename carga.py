@@ -0,0 +1,270 @@
+"""
+Teste de carga do app com sessões simultâneas.
+
+Sobe o app.py num servidor Streamlit local (sem navegador) e abre N
+sessões contra ele pelo mesmo websocket que o navegador usa. Cada sessão
+segue o roteiro de um usuário (escolher uma palavra, mexer no n, gerar)
+com pausas de "tempo de leitura" entre as interações, e manda os mesmos
+pedidos de rerun que o frontend mandaria, inclusive os restritos a um
+fragmento.
+
+Para cada nível de concorrência são medidos a latência de cada rerun (do
+envio do pedido até o fim do script no servidor), a vazão, a CPU do
+processo do servidor (em % de um núcleo) e o pico de memória residente
+dele. Tudo roda localmente, sem acesso à rede.
+
+Uso: python carga.py [--sessoes 1 2 4 8] [--interacoes 12] [--pausa 0.2]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.httpclient import HTTPRequest
+from tornado.websocket import websocket_connect
+
+ARQUIVO_APP = "app.py"
+
+# Segundos para o servidor responder ao health check depois de iniciado
+TIMEOUT_SERVIDOR = 60
+
+# Estados de fim de script que encerram um rerun
+FINS = {
+    ForwardMsg.ScriptFinishedStatus.FINISHED_SUCCESSFULLY,
+    ForwardMsg.ScriptFinishedStatus.FINISHED_FRAGMENT_RUN_SUCCESSFULLY,
+    ForwardMsg.ScriptFinishedStatus.FINISHED_WITH_COMPILE_ERROR,
+}
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor(porta):
+    """Inicia o servidor Streamlit e espera ele responder."""
+    processo = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', ARQUIVO_APP,
+         '--server.headless', 'true', '--server.port', str(porta),
+         '--browser.gatherUsageStats', 'false', '--server.fileWatcherType', 'none'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    limite = time.monotonic() + TIMEOUT_SERVIDOR
+    while time.monotonic() < limite:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{porta}/_stcore/health', timeout=1):
+                return processo
+        except OSError:
+            if processo.poll() is not None:
+                break
+            time.sleep(0.2)
+    processo.kill()
+    raise RuntimeError("O servidor Streamlit não respondeu.")
+
+
+def tempo_cpu(pid):
+    """Tempo de CPU (usuário + sistema) consumido pelo processo, em segundos (Linux)."""
+    with open(f'/proc/{pid}/stat') as f:
+        campos = f.read().rsplit(')', 1)[1].split()
+    return (int(campos[11]) + int(campos[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def memoria_residente(pid):
+    """Memória residente do processo, em bytes (Linux)."""
+    with open(f'/proc/{pid}/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def percentil(valores, p):
+    """Percentil p de uma lista já ordenada."""
+    return valores[min(len(valores) - 1, int(p / 100 * len(valores)))]
+
+
+class Sessao:
+    """
+    Cliente headless de uma sessão do app.
+
+    Guarda os widgets da última execução completa (id, tipo, fragmento) e
+    o estado de cada widget já alterado, como o frontend faz.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.widgets = {}
+        self.estados = {}
+        self.erros = []
+        self.pagina = ''
+
+    async def conectar(self):
+        self.ws = await websocket_connect(HTTPRequest(self.url, headers={'Sec-WebSocket-Protocol': 'streamlit'}))
+
+    async def rerun(self, gatilho=None, fragmento=''):
+        """
+        Pede um rerun com os estados atuais e espera o script terminar.
+
+        Returns:
+            float: latência do rerun, em segundos
+        """
+        mensagem = BackMsg()
+        cliente = mensagem.rerun_script
+        cliente.page_script_hash = self.pagina
+        cliente.fragment_id = fragmento
+        cliente.widget_states.widgets.extend(self.estados.values())
+        if gatilho is not None:
+            cliente.widget_states.widgets.append(gatilho)
+
+        inicio = time.perf_counter()
+        await self.ws.write_message(mensagem.SerializeToString(), binary=True)
+        while True:
+            bruto = await self.ws.read_message()
+            if bruto is None:
+                raise ConnectionError("O servidor fechou a conexão.")
+            msg = ForwardMsg()
+            msg.ParseFromString(bruto)
+            tipo = msg.WhichOneof('type')
+            if tipo == 'new_session':
+                self.pagina = msg.new_session.page_script_hash
+            elif tipo == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+                self._registrar(msg.delta)
+            elif tipo == 'script_finished' and msg.script_finished in FINS:
+                return time.perf_counter() - inicio
+
+    def _registrar(self, delta):
+        elemento = delta.new_element
+        tipo = elemento.WhichOneof('type')
+        if tipo == 'exception':
+            self.erros.append(elemento.exception.message)
+            return
+        proto = getattr(elemento, tipo)
+        if getattr(proto, 'id', ''):
+            self.widgets[proto.label] = (proto.id, delta.fragment_id, proto)
+
+    def widget(self, prefixo):
+        """(id, fragmento, proto) do widget cujo rótulo começa com o prefixo."""
+        for rotulo, widget in self.widgets.items():
+            if rotulo.startswith(prefixo):
+                return widget
+        raise KeyError(prefixo)
+
+    async def alterar(self, prefixo, **valor):
+        """Muda o valor de um widget (campo do WidgetState) e pede o rerun correspondente."""
+        id_widget, fragmento, _ = self.widget(prefixo)
+        estado = WidgetState(id=id_widget)
+        for campo, dado in valor.items():
+            alvo = getattr(estado, campo)
+            if hasattr(alvo, 'data'):
+                alvo.data[:] = dado
+            else:
+                setattr(estado, campo, dado)
+        self.estados[id_widget] = estado
+        return await self.rerun(fragmento=fragmento)
+
+    async def clicar(self, prefixo):
+        id_widget, fragmento, _ = self.widget(prefixo)
+        return await self.rerun(WidgetState(id=id_widget, trigger_value=True), fragmento)
+
+
+async def usuario(url, indice, interacoes, pausa, latencias, erros):
+    """Uma sessão simulada: abre o app e segue o roteiro."""
+    rng = random.Random(indice)
+    sessao = Sessao(url)
+    await sessao.conectar()
+    latencias.append(('abrir', await sessao.rerun()))
+    palavras = list(sessao.widget('Palavras sugeridas')[2].options)
+
+    roteiro = [
+        ('palavra', lambda: sessao.alterar('Palavras sugeridas', string_value=rng.choice(palavras))),
+        ('n', lambda: sessao.alterar('Ordem dos N-gramas', double_array_value=[rng.randint(2, 6)])),
+        ('gerar', lambda: sessao.clicar('🎲 Gerar')),
+    ]
+    for passo in range(interacoes):
+        await asyncio.sleep(rng.uniform(0, 2 * pausa))
+        nome, acao = roteiro[passo % len(roteiro)]
+        latencias.append((nome, await acao()))
+    sessao.ws.close()
+    erros.extend(sessao.erros)
+
+
+async def medir(url, pid, concorrencia, interacoes, pausa):
+    """
+    Roda `concorrencia` sessões ao mesmo tempo contra o servidor.
+
+    Returns:
+        dict: latências por interação (s), vazão, CPU e memória do servidor
+    """
+    latencias, erros = [], []
+    inicio, cpu_inicio = time.perf_counter(), tempo_cpu(pid)
+    tarefas = asyncio.gather(*(usuario(url, i, interacoes, pausa, latencias, erros)
+                               for i in range(concorrencia)))
+    pico = memoria_residente(pid)
+    while not tarefas.done():
+        await asyncio.sleep(0.05)
+        pico = max(pico, memoria_residente(pid))
+    await tarefas
+    segundos = time.perf_counter() - inicio
+
+    reruns = sorted(t for nome, t in latencias if nome != 'abrir')
+    por_interacao = {}
+    for nome, t in latencias:
+        por_interacao.setdefault(nome, []).append(t)
+    return {
+        'concorrencia': concorrencia,
+        'reruns': len(reruns),
+        'vazao': len(latencias) / segundos,
+        'p50': percentil(reruns, 50),
+        'p95': percentil(reruns, 95),
+        'p99': percentil(reruns, 99),
+        'por_interacao': {nome: sorted(ts)[len(ts) // 2] for nome, ts in por_interacao.items()},
+        'cpu': (tempo_cpu(pid) - cpu_inicio) / segundos,
+        'memoria_pico': pico,
+        'erros': erros,
+    }
+
+
+async def executar(args, url, pid):
+    # Aquecimento: a primeira sessão carrega os modelos no servidor
+    await usuario(url, -1, 3, 0, [], [])
+    print(f"Memória residente do servidor após carregar os modelos: {memoria_residente(pid) / 2**20:.0f} MB")
+    print(f"{'sessões':>8} {'reruns':>7} {'reruns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'CPU':>6} {'RSS MB':>7}  mediana por interação (ms)")
+
+    for concorrencia in args.sessoes:
+        r = await medir(url, pid, concorrencia, args.interacoes, args.pausa)
+        interacoes = ', '.join(f"{nome} {t * 1000:.0f}" for nome, t in r['por_interacao'].items())
+        print(f"{r['concorrencia']:>8} {r['reruns']:>7} {r['vazao']:>9.1f} {r['p50'] * 1000:>8.0f} "
+              f"{r['p95'] * 1000:>8.0f} {r['p99'] * 1000:>8.0f} {r['cpu']:>6.0%} "
+              f"{r['memoria_pico'] / 2**20:>7.0f}  {interacoes}")
+        for erro in sorted(set(r['erros'])):
+            print(f"  erro: {erro}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede a latência do app com várias sessões simultâneas.")
+    parser.add_argument("--sessoes", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="níveis de concorrência a medir (padrão: 1 2 4 8)")
+    parser.add_argument("--interacoes", type=int, default=12, help="interações por sessão (padrão: 12)")
+    parser.add_argument("--pausa", type=float, default=0.2,
+                        help="pausa média entre as interações de uma sessão, em segundos")
+    args = parser.parse_args()
+
+    porta = porta_livre()
+    servidor = iniciar_servidor(porta)
+    try:
+        asyncio.run(executar(args, f'ws://127.0.0.1:{porta}/_stcore/stream', servidor.pid))
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+
+if __name__ == "__main__":
+    main()
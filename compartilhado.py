@@ -0,0 +1,358 @@
+"""
+Modelo em memória compartilhada para geração com vários processos.
+
+Cada processo que desserializa o ModeloMarkov carrega uma cópia própria
+dos dicionários, e a memória cresce com o número de processos. Aqui uma
+ordem do modelo é convertida em arrays planos (sem objetos Python) e
+publicada uma única vez em um segmento de multiprocessing.shared_memory,
+ou em um arquivo mapeado com mmap. Os processos se anexam ao segmento
+somente para leitura, sem cópias.
+
+Os contextos são localizados por busca binária em um array ordenado de
+hashes de 64 bits dos ids, com verificação dos ids para resolver colisões;
+na geração o hash da janela é atualizado em O(1) a cada palavra. O
+sucessor é sorteado por busca binária nas contagens acumuladas.
+
+Uso: python compartilhado.py [corpus] [--n 4] [--processos 1 2 4] [--textos 2000] [--tamanho 500]
+"""
+
+import argparse
+import mmap
+import os
+import random
+import time
+from bisect import bisect_left, bisect_right
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+from modelo import MASCARA_64, PRIMO_HASH, hash_contexto, potencia_saida
+from registro import RegistroModelos
+from vetorizado import hash_contextos
+
+# Códigos dos arrays publicados: nome -> (dtype NumPy, código do memoryview)
+TIPOS = {
+    'hashes': (np.uint64, 'Q'),
+    'contextos': (np.uint32, 'I'),
+    'inicio': (np.uint32, 'I'),
+    'sucessores': (np.uint32, 'I'),
+    'acumulado': (np.uint32, 'I'),
+    'tokens': (np.uint32, 'I'),
+    'vocabulario_inicio': (np.uint32, 'I'),
+    'vocabulario': (np.uint8, 'B'),
+}
+
+
+def arrays_da_ordem(modelo, n):
+    """
+    Converte a ordem n do ModeloMarkov em arrays planos.
+
+    As linhas são reordenadas pelo hash do contexto e as contagens viram
+    somas acumuladas dentro de cada linha.
+
+    Returns:
+        dict: nome -> np.ndarray (ver TIPOS)
+    """
+    tabela = modelo.tabelas[n]
+    contexto_size = n - 1
+
+    contextos = np.array(list(tabela.linhas), dtype=np.uint32).reshape(-1, contexto_size)
+    inicio = np.frombuffer(tabela.inicio, dtype=np.uint32).astype(np.int64)
+    sucessores = np.frombuffer(tabela.sucessores, dtype=np.uint32)
+    contagens = np.frombuffer(tabela.contagens, dtype=np.uint32).astype(np.int64)
+
+    hashes = hash_contextos(contextos)
+    ordem = np.argsort(hashes, kind='stable')
+
+    # Reordena as linhas do formato CSR
+    tamanhos = np.diff(inicio)[ordem]
+    novo_inicio = np.concatenate(([0], np.cumsum(tamanhos)))
+    deslocamento = np.repeat(inicio[:-1][ordem] - novo_inicio[:-1], tamanhos)
+    posicoes = np.arange(novo_inicio[-1]) + deslocamento
+
+    contagens = contagens[posicoes]
+    acumulado = np.cumsum(contagens)
+    acumulado -= np.repeat(acumulado[novo_inicio[:-1]] - contagens[novo_inicio[:-1]], tamanhos)
+
+    palavras = [palavra.encode('utf-8') for palavra in modelo.vocabulario]
+    vocabulario_inicio = np.concatenate(([0], np.cumsum([len(p) for p in palavras])))
+
+    return {
+        'hashes': hashes[ordem],
+        'contextos': contextos[ordem].ravel(),
+        'inicio': novo_inicio,
+        'sucessores': sucessores[posicoes],
+        'acumulado': acumulado,
+        'tokens': np.frombuffer(modelo.tokens, dtype=np.uint32),
+        'vocabulario_inicio': vocabulario_inicio,
+        'vocabulario': np.frombuffer(b''.join(palavras), dtype=np.uint8),
+    }
+
+
+def _disposicao(arrays):
+    """Deslocamento de cada array no segmento (alinhado a 8 bytes) e tamanho total."""
+    disposicao = {}
+    deslocamento = 0
+    for nome, (dtype, _) in TIPOS.items():
+        quantidade = len(arrays[nome])
+        disposicao[nome] = (deslocamento, quantidade)
+        deslocamento += -(-quantidade * np.dtype(dtype).itemsize // 8) * 8
+    return disposicao, max(deslocamento, 1)
+
+
+class ModeloCompartilhado:
+    """
+    Uma ordem do modelo, lida diretamente de um buffer compartilhado.
+
+    Use `publicar` no processo principal e `anexar` nos processos
+    trabalhadores, com a descrição devolvida por `publicar`.
+    """
+
+    def __init__(self, descricao, buffer, segmento=None):
+        self.descricao = descricao
+        self.n = descricao['n']
+        self.contexto_size = self.n - 1
+        self._segmento = segmento
+        self._buffer = buffer
+        self._visoes = []
+        for nome, (deslocamento, quantidade) in descricao['disposicao'].items():
+            dtype, codigo = TIPOS[nome]
+            tamanho = quantidade * np.dtype(dtype).itemsize
+            visao = memoryview(buffer)[deslocamento:deslocamento + tamanho].toreadonly().cast(codigo)
+            self._visoes.append(visao)
+            setattr(self, nome, visao)
+        self.linhas = len(self.hashes)
+
+        # Hashes que não identificam sozinhos a linha: repetidos entre linhas
+        # ou iguais ao do último contexto do corpus (que não tem linha)
+        hashes = np.frombuffer(self.hashes, dtype=np.uint64)
+        self.ambiguos = set(hashes[1:][hashes[1:] == hashes[:-1]].tolist())
+        del hashes
+        fim = tuple(self.tokens[len(self.tokens) - self.contexto_size:])
+        h = hash_contexto(fim)
+        posicao = bisect_left(self.hashes, h)
+        if posicao < self.linhas and self.hashes[posicao] == h and self.linha(fim) < 0:
+            self.ambiguos.add(h)
+
+    @classmethod
+    def publicar(cls, modelo, n, arquivo=None):
+        """
+        Publica a ordem n do modelo em memória compartilhada (ou no arquivo
+        dado, para ser mapeado com mmap).
+
+        Returns:
+            ModeloCompartilhado: dono do segmento; chame `fechar(True)` no fim
+        """
+        arrays = arrays_da_ordem(modelo, n)
+        disposicao, tamanho = _disposicao(arrays)
+
+        if arquivo is None:
+            segmento = shared_memory.SharedMemory(create=True, size=tamanho)
+            buffer = segmento.buf
+            descricao = {'n': n, 'disposicao': disposicao, 'shm': segmento.name}
+        else:
+            with open(arquivo, 'wb') as f:
+                f.truncate(tamanho)
+            with open(arquivo, 'r+b') as f:
+                segmento = mmap.mmap(f.fileno(), tamanho)
+            buffer = segmento
+            descricao = {'n': n, 'disposicao': disposicao, 'arquivo': arquivo}
+
+        for nome, (deslocamento, quantidade) in disposicao.items():
+            dtype = TIPOS[nome][0]
+            destino = np.ndarray(quantidade, dtype=dtype, buffer=buffer, offset=deslocamento)
+            destino[:] = arrays[nome]
+            del destino
+
+        return cls(descricao, buffer, segmento)
+
+    @classmethod
+    def anexar(cls, descricao):
+        """Anexa-se, somente para leitura, a um modelo publicado."""
+        if 'shm' in descricao:
+            segmento = shared_memory.SharedMemory(name=descricao['shm'])
+            return cls(descricao, segmento.buf, segmento)
+        with open(descricao['arquivo'], 'rb') as f:
+            segmento = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(descricao, segmento, segmento)
+
+    def tamanho_bytes(self):
+        """Tamanho do segmento publicado."""
+        return sum(visao.nbytes for visao in self._visoes)
+
+    def fechar(self, remover=False):
+        """Libera as visões e fecha o segmento (remove-o se `remover`)."""
+        for visao in self._visoes:
+            visao.release()
+        self._visoes = []
+        for nome in TIPOS:
+            self.__dict__.pop(nome, None)
+        self._buffer = None
+        if self._segmento is None:
+            return
+        self._segmento.close()
+        if remover:
+            if 'shm' in self.descricao:
+                self._segmento.unlink()
+            else:
+                os.remove(self.descricao['arquivo'])
+        self._segmento = None
+
+    def linha(self, contexto):
+        """Linha do contexto (tupla de ids), ou -1 se ele não existe."""
+        h = hash_contexto(contexto)
+        k = self.contexto_size
+        posicao = bisect_left(self.hashes, h)
+        while posicao < self.linhas and self.hashes[posicao] == h:
+            if tuple(self.contextos[posicao * k:(posicao + 1) * k]) == contexto:
+                return posicao
+            posicao += 1
+        return -1
+
+    def escolher(self, contexto, rng=random):
+        """Sorteia o id seguinte ao contexto proporcionalmente à contagem."""
+        linha = self.linha(contexto)
+        if linha < 0:
+            return None
+        a, b = self.inicio[linha], self.inicio[linha + 1]
+        sorteio = rng.randrange(self.acumulado[b - 1])
+        return self.sucessores[bisect_right(self.acumulado, sorteio, a, b)]
+
+    def palavra(self, i):
+        """Palavra com o id dado, decodificada do vocabulário compartilhado."""
+        return str(self.vocabulario[self.vocabulario_inicio[i]:self.vocabulario_inicio[i + 1]], 'utf-8')
+
+    def gerar_ids(self, tamanho, rng=random):
+        """
+        Gera até `tamanho` ids a partir de um contexto aleatório do corpus.
+
+        O hash do contexto é atualizado em O(1) a cada id (ver
+        modelo.potencia_saida); os ids da janela só são comparados com os da
+        linha quando o hash está em `ambiguos`.
+        """
+        k = self.contexto_size
+        posicao = rng.randrange(len(self.tokens) - k)
+        saida = self.tokens[posicao:posicao + k].tolist()
+        h = hash_contexto(saida)
+        potencia = potencia_saida(k)
+
+        # Mesmo que self.escolher, com as buscas em variáveis locais (laço quente)
+        hashes, linhas, ambiguos = self.hashes, self.linhas, self.ambiguos
+        inicio, acumulado, sucessores = self.inicio, self.acumulado, self.sucessores
+        randrange = rng.randrange
+        while len(saida) < tamanho:
+            linha = bisect_left(hashes, h)
+            if linha == linhas or hashes[linha] != h:
+                break
+            if h in ambiguos:
+                linha = self.linha(tuple(saida[-k:]))
+                if linha < 0:
+                    break
+            a, b = inicio[linha], inicio[linha + 1]
+            proximo = sucessores[bisect_right(acumulado, randrange(acumulado[b - 1]), a, b)]
+            saida.append(proximo)
+            h = ((h - (saida[-k - 1] + 1) * potencia) * PRIMO_HASH + proximo + 1) & MASCARA_64
+        return saida
+
+    def gerar_texto(self, tamanho, rng=random):
+        """Gera um texto de até `tamanho` palavras."""
+        return ' '.join(self.palavra(i) for i in self.gerar_ids(tamanho, rng))
+
+
+# Modelo anexado em cada processo trabalhador
+_modelo_anexado = None
+
+
+def _iniciar_trabalhador(descricao):
+    global _modelo_anexado
+    _modelo_anexado = ModeloCompartilhado.anexar(descricao)
+
+
+def _gerar_textos(argumentos):
+    sementes, tamanho = argumentos
+    return [_modelo_anexado.gerar_texto(tamanho, random.Random(semente)) for semente in sementes]
+
+
+class PoolGeracao:
+    """
+    Processos trabalhadores que geram texto a partir de um único modelo
+    publicado em memória compartilhada.
+
+    Args:
+        modelo (ModeloMarkov): Modelo de origem
+        n (int): Tamanho do n-grama
+        processos (int): Número de processos
+        arquivo (str): Publica em um arquivo mapeado em vez de shared_memory
+
+    Exemplo:
+        with PoolGeracao(modelo, n=4, processos=8) as pool:
+            textos = pool.generate_many(10000, tamanho=200)
+    """
+
+    def __init__(self, modelo, n=4, processos=None, arquivo=None):
+        self.compartilhado = ModeloCompartilhado.publicar(modelo, n, arquivo)
+        self.processos = processos or os.cpu_count() or 1
+        self._pool = Pool(self.processos, initializer=_iniciar_trabalhador,
+                          initargs=(self.compartilhado.descricao,))
+
+    def generate_many(self, quantidade, tamanho=50, semente=0, lote=64):
+        """
+        Gera `quantidade` textos de até `tamanho` palavras.
+
+        O texto i usa a semente `semente + i`, então o resultado não depende
+        do número de processos.
+
+        Returns:
+            list: textos gerados, na ordem das sementes
+        """
+        sementes = range(semente, semente + quantidade)
+        tarefas = [(sementes[i:i + lote], tamanho) for i in range(0, quantidade, lote)]
+        textos = []
+        for parte in self._pool.imap(_gerar_textos, tarefas):
+            textos.extend(parte)
+        return textos
+
+    def fechar(self):
+        """Encerra os processos e remove o segmento compartilhado."""
+        self._pool.close()
+        self._pool.join()
+        self.compartilhado.fechar(remover=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede a geração com o modelo em memória compartilhada.")
+    parser.add_argument("corpus", nargs="?", default="alice", help="nome do corpus (padrão: alice)")
+    parser.add_argument("--n", type=int, default=4, help="tamanho do n-grama (padrão: 4)")
+    parser.add_argument("--processos", type=int, nargs="+", default=[1, 2, 4],
+                        help="números de processos a medir")
+    parser.add_argument("--textos", type=int, default=2000, help="textos gerados em cada medição")
+    parser.add_argument("--tamanho", type=int, default=500, help="palavras por texto")
+    args = parser.parse_args()
+
+    modelo = RegistroModelos().obter(args.corpus)
+    # Todas as ordens, como um processo que servisse o modelo inteiro: só as
+    # tabelas residentes entram em tamanho_bytes (ver TabelasSobDemanda)
+    modelo.preparar(modelo.ordens)
+    base = None
+    for processos in args.processos:
+        with PoolGeracao(modelo, args.n, processos) as pool:
+            if base is None:
+                print(f"Segmento compartilhado: {pool.compartilhado.tamanho_bytes() / 2**20:.1f} MB "
+                      f"(modelo completo em dicionários: {modelo.tamanho_bytes() / 2**20:.1f} MB por processo)\n")
+            inicio = time.perf_counter()
+            textos = pool.generate_many(args.textos, args.tamanho)
+            segundos = time.perf_counter() - inicio
+        palavras = sum(texto.count(' ') + 1 for texto in textos)
+        taxa = palavras / segundos
+        base = base or taxa
+        print(f"{processos:>3} processo(s): {taxa:>12,.0f} palavras/s  (x{taxa / base:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""
+Contagem de n-gramas fora da memória (ordenação externa).
+
+Para corpora grandes demais para um único dicionário de contagens, os
+n-gramas são contados em lotes limitados por um orçamento de memória.
+Cada vez que o orçamento estoura, as contagens do lote são ordenadas e
+gravadas em um arquivo temporário (uma "corrida" por ordem), e a memória
+é liberada. No fim, as corridas de cada ordem são intercaladas (merge de
+k vias), somando as contagens de n-gramas iguais, e o resultado vai
+direto para o bloco da ordem no artefato em `modelos/`, em partes de
+LINHAS_POR_PARTE contextos: nenhuma tabela inteira passa pela memória.
+
+Também ficam em disco os ids do corpus, gravados em partes à medida que
+são lidos, e as frequências das palavras saem da intercalação dos
+unigramas, contados junto com as outras ordens. Em memória ficam só o
+vocabulário, as contagens do lote e, no merge, um buffer por corrida.
+
+Os ids são gravados em big-endian, de modo que a ordem dos bytes de cada
+registro coincide com a ordem numérica das tuplas de ids.
+
+Uso: python externo.py [corpus] [--memoria-mb 64] [--replicar K] [--verificar]
+"""
+
+import argparse
+import heapq
+import os
+import pickle
+import resource
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from collections import Counter, deque
+
+from modelo import (VERSAO_FORMATO, calcular_estatisticas, caminho_modelo,
+                    carregar_modelo, construir_corpus, gravar_artefato,
+                    impressao_fontes, ler_tokens, listar_corpora)
+
+# Orçamento padrão para as contagens em memória, em MB
+MEMORIA_PADRAO_MB = 64
+
+# Bytes estimados por entrada do dicionário de contagens, além da chave
+CUSTO_ENTRADA = 110
+
+# Registros lidos de cada corrida por vez durante o merge (no máximo; com
+# muitas corridas, o buffer de cada uma diminui para caber no orçamento)
+REGISTROS_POR_LEITURA = 4096
+REGISTROS_MINIMOS = 64
+
+# Contextos por parte do bloco de cada ordem, e ids por parte dos tokens
+LINHAS_POR_PARTE = 65536
+IDS_POR_PARTE = 1 << 20
+
+CONTAGEM = struct.Struct('>I')
+
+
+class ContadorExterno:
+    """
+    Conta n-gramas de várias ordens com memória limitada.
+
+    Args:
+        ordens (iterable): Ordens n dos n-gramas
+        limite_bytes (int): Orçamento estimado para as contagens em memória
+        pasta (str): Pasta dos arquivos temporários (padrão: a do sistema)
+    """
+
+    def __init__(self, ordens, limite_bytes=MEMORIA_PADRAO_MB * 2**20, pasta=None):
+        self.ordens = sorted(ordens)
+        self.limite_bytes = limite_bytes
+        self.pasta = tempfile.mkdtemp(prefix='ngramas-', dir=pasta)
+        self.chaves = {ordem: struct.Struct(f'>{ordem}I') for ordem in self.ordens}
+        self.contagens = {ordem: Counter() for ordem in self.ordens}
+        self.corridas = {ordem: [] for ordem in self.ordens}
+        self.custo = {ordem: CUSTO_ENTRADA + sys.getsizeof(b'') + 4 * ordem for ordem in self.ordens}
+        self.memoria = 0
+        self.janela = deque(maxlen=self.ordens[-1])
+
+    def adicionar(self, i):
+        """Acrescenta o próximo id do corpus e conta os n-gramas que terminam nele."""
+        janela = self.janela
+        janela.append(i)
+        tamanho = len(janela)
+        ids = tuple(janela)
+        for ordem in self.ordens:
+            if tamanho < ordem:
+                break
+            contagens = self.contagens[ordem]
+            chave = self.chaves[ordem].pack(*ids[tamanho - ordem:])
+            if chave not in contagens:
+                self.memoria += self.custo[ordem]
+            contagens[chave] += 1
+        if self.memoria > self.limite_bytes:
+            self.despejar()
+
+    def despejar(self):
+        """Grava as contagens em memória como corridas ordenadas e as descarta."""
+        for ordem, contagens in self.contagens.items():
+            if not contagens:
+                continue
+            caminho = os.path.join(self.pasta, f"{ordem}-{len(self.corridas[ordem]):05d}.run")
+            with open(caminho, 'wb', buffering=1 << 20) as f:
+                for chave in sorted(contagens):
+                    f.write(chave)
+                    f.write(CONTAGEM.pack(contagens[chave]))
+            self.corridas[ordem].append(caminho)
+            contagens.clear()
+        self.memoria = 0
+
+    def _ler_corrida(self, caminho, ordem, registros):
+        tamanho_chave = 4 * ordem
+        tamanho = tamanho_chave + 4
+        with open(caminho, 'rb', buffering=0) as f:
+            while True:
+                bloco = f.read(tamanho * registros)
+                if not bloco:
+                    break
+                for p in range(0, len(bloco), tamanho):
+                    yield bloco[p:p + tamanho_chave], CONTAGEM.unpack_from(bloco, p + tamanho_chave)[0]
+
+    def intercalar(self, ordem):
+        """
+        Intercala as corridas da ordem em uma sequência ordenada de n-gramas.
+
+        Yields:
+            tuple: (ngrama como tupla de ids, contagem total)
+        """
+        chave = self.chaves[ordem]
+        caminhos = self.corridas[ordem]
+        registros = self.limite_bytes // (max(len(caminhos), 1) * (4 * ordem + 4))
+        registros = max(REGISTROS_MINIMOS, min(REGISTROS_POR_LEITURA, registros))
+        corridas = [self._ler_corrida(caminho, ordem, registros) for caminho in caminhos]
+        atual, total = None, 0
+        for ngrama, contagem in heapq.merge(*corridas):
+            if ngrama != atual:
+                if atual is not None:
+                    yield chave.unpack(atual), total
+                atual, total = ngrama, 0
+            total += contagem
+        if atual is not None:
+            yield chave.unpack(atual), total
+
+    def limpar(self):
+        shutil.rmtree(self.pasta, ignore_errors=True)
+
+
+def gravar_tabela(ngramas, arquivo, linhas_por_parte=LINHAS_POR_PARTE):
+    """
+    Grava o bloco de uma ordem a partir de n-gramas em ordem crescente.
+
+    Como a sequência vem ordenada por contexto, cada linha é fechada assim
+    que o contexto muda; só os sucessores de uma linha são reordenados
+    (da maior para a menor contagem). A cada `linhas_por_parte` contextos,
+    as linhas acumuladas são gravadas como uma parte (ver
+    TabelaNgramas.juntar) e descartadas.
+
+    Returns:
+        int: número de contextos da ordem
+    """
+    linhas = {}
+    inicio = array('I')
+    sucessores = array('I')
+    contagens = array('I')
+    gravados = 0  # Sucessores das partes já gravadas
+    contextos = 0
+
+    def fechar(linha):
+        linha.sort(key=lambda item: (-item[1], item[0]))
+        for sucessor, quantidade in linha:
+            sucessores.append(sucessor)
+            contagens.append(quantidade)
+
+    contexto_atual, linha = None, []
+    for ngrama, quantidade in ngramas:
+        contexto = ngrama[:-1]
+        if contexto != contexto_atual:
+            if linha:
+                fechar(linha)
+                if len(linhas) >= linhas_por_parte:
+                    pickle.dump((linhas, inicio, sucessores, contagens), arquivo,
+                                protocol=pickle.HIGHEST_PROTOCOL)
+                    gravados += len(sucessores)
+                    linhas = {}
+                    del inicio[:], sucessores[:], contagens[:]
+            linhas[contexto] = contextos
+            contextos += 1
+            inicio.append(gravados + len(sucessores))
+            contexto_atual, linha = contexto, []
+        linha.append((ngrama[-1], quantidade))
+    if linha:
+        fechar(linha)
+    inicio.append(gravados + len(sucessores))
+    pickle.dump((linhas, inicio, sucessores, contagens), arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+    return contextos
+
+
+def construir_externo(nome, arquivos, caminho, ordens=range(2, 7), limite_bytes=MEMORIA_PADRAO_MB * 2**20,
+                      replicar=1, relatorio=None, intervalo=1.0, linhas_por_parte=LINHAS_POR_PARTE):
+    """
+    Constrói o artefato do corpus contando os n-gramas com ordenação externa.
+
+    Args:
+        nome (str): Nome do corpus
+        arquivos (tuple): Arquivos de texto do corpus
+        caminho (str): Artefato gravado, legível por carregar_modelo
+        ordens (iterable): Ordens n dos n-gramas a construir
+        limite_bytes (int): Orçamento estimado para as contagens em memória
+        replicar (int): Lê o corpus K vezes seguidas (para medir corpora grandes)
+        relatorio (callable): Recebe mensagens de progresso (padrão: nenhuma)
+        intervalo (float): Segundos entre mensagens de progresso
+        linhas_por_parte (int): Contextos por parte do bloco de cada ordem
+
+    Returns:
+        dict: estatísticas do corpus (ver calcular_estatisticas)
+    """
+    if relatorio is None:
+        relatorio = lambda mensagem: None  # noqa: E731
+
+    ordens = sorted(ordens)
+    # Os unigramas dão as frequências das palavras
+    contador = ContadorExterno([1] + ordens, limite_bytes)
+    indice = {}
+    total = 0
+    inicio = ultimo = time.perf_counter()
+
+    try:
+        bloco_tokens = os.path.join(contador.pasta, "tokens.bloco")
+        with open(bloco_tokens, 'wb') as saida:
+            parte = array('I')
+            for _ in range(replicar):
+                for token in ler_tokens(arquivos):
+                    i = indice.setdefault(token, len(indice))
+                    parte.append(i)
+                    contador.adicionar(i)
+                    total += 1
+
+                    if len(parte) == IDS_POR_PARTE:
+                        pickle.dump(parte, saida, protocol=pickle.HIGHEST_PROTOCOL)
+                        parte = array('I')
+                    if not total % 10_000 and time.perf_counter() - ultimo > intervalo:
+                        ultimo = time.perf_counter()
+                        corridas = sum(len(c) for c in contador.corridas.values())
+                        relatorio(f"  {total:,} palavras, {total / (ultimo - inicio):,.0f} palavras/s, "
+                                  f"{corridas} corridas em disco")
+            pickle.dump(parte, saida, protocol=pickle.HIGHEST_PROTOCOL)
+        contador.despejar()
+
+        segundos = time.perf_counter() - inicio
+        corridas = sum(len(c) for c in contador.corridas.values())
+        relatorio(f"Contagem: {total:,} palavras em {segundos:.2f}s "
+                  f"({total / segundos:,.0f} palavras/s), {corridas} corridas")
+
+        vocabulario = list(indice)
+        del indice
+        frequencias = array('I', bytes(4 * len(vocabulario)))
+        for (i,), quantidade in contador.intercalar(1):
+            frequencias[i] = quantidade
+
+        blocos = {}
+        contextos = {}
+        for ordem in ordens:
+            inicio_ordem = time.perf_counter()
+            blocos[ordem] = os.path.join(contador.pasta, f"{ordem}.bloco")
+            with open(blocos[ordem], 'wb', buffering=1 << 20) as saida:
+                contextos[ordem] = gravar_tabela(contador.intercalar(ordem), saida, linhas_por_parte)
+            relatorio(f"Merge dos {ordem}-gramas: {len(contador.corridas[ordem])} corridas, "
+                      f"{contextos[ordem]:,} contextos em {time.perf_counter() - inicio_ordem:.2f}s")
+
+        estatisticas = calcular_estatisticas(None, vocabulario, contextos, frequencias=frequencias)
+        dados = {
+            'versao': VERSAO_FORMATO,
+            'nome': nome,
+            'vocabulario': vocabulario,
+            'tokens': None,
+            'fontes': impressao_fontes(arquivos),
+            'estatisticas': estatisticas,
+            'frases': None,
+        }
+        gravar_artefato(caminho, dados, blocos, bloco_tokens)
+    finally:
+        contador.limpar()
+
+    return estatisticas
+
+
+def verificar(modelo, referencia):
+    """
+    Compara as tabelas com as de um modelo construído em memória.
+
+    Returns:
+        int: número de ordens com alguma divergência
+    """
+    divergencias = 0
+    if (modelo.vocabulario != referencia.vocabulario or modelo.tokens != referencia.tokens
+            or modelo.estatisticas != referencia.estatisticas):
+        divergencias += 1
+    for ordem, esperado in referencia.tabelas.items():
+        obtido = modelo.tabelas.get(ordem)
+        if obtido is None or obtido.dados() != esperado.dados():
+            divergencias += 1
+    return divergencias
+
+
+def pico_memoria_mb():
+    """Maior memória residente do processo até agora, em MB (ru_maxrss vem em KB no Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Constrói um modelo contando os n-gramas fora da memória.")
+    parser.add_argument("corpus", nargs="?", default="alice", help="nome do corpus (padrão: alice)")
+    parser.add_argument("--memoria-mb", type=float, default=MEMORIA_PADRAO_MB,
+                        help="orçamento para as contagens em memória, em MB")
+    parser.add_argument("--replicar", type=int, default=1,
+                        help="lê o corpus K vezes (para medir o desempenho em corpora grandes)")
+    parser.add_argument("--verificar", action="store_true",
+                        help="constrói com um orçamento mínimo e compara com o construtor em memória")
+    args = parser.parse_args()
+
+    corpora = listar_corpora()
+    if args.corpus not in corpora:
+        sys.exit(f"Corpus '{args.corpus}' desconhecido.")
+    arquivos = corpora[args.corpus]
+
+    if args.verificar:
+        # Orçamento de 64 KB e partes de 1.000 contextos: força dezenas de
+        # corridas e de partes por ordem
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, f"{args.corpus}.pkl")
+            construir_externo(args.corpus, arquivos, caminho, limite_bytes=64 * 1024, relatorio=print,
+                              linhas_por_parte=1000)
+            modelo = carregar_modelo(caminho)
+        referencia = construir_corpus(args.corpus, corpora=corpora)
+        referencia.frases = None
+        divergencias = verificar(modelo, referencia)
+        print(f"Divergências em relação ao construtor em memória: {divergencias}")
+        sys.exit(1 if divergencias else 0)
+
+    if args.replicar > 1:
+        # Corpus replicado só serve para medir; não substitui o artefato
+        with tempfile.TemporaryDirectory() as pasta:
+            construir_externo(args.corpus, arquivos, os.path.join(pasta, f"{args.corpus}.pkl"),
+                              limite_bytes=int(args.memoria_mb * 2**20), replicar=args.replicar,
+                              relatorio=print)
+        print(f"Pico de memória residente: {pico_memoria_mb():.1f} MB")
+        return
+    caminho = caminho_modelo(args.corpus)
+    estatisticas = construir_externo(args.corpus, arquivos, caminho,
+                                     limite_bytes=int(args.memoria_mb * 2**20), relatorio=print)
+    print(f"{args.corpus}: {estatisticas['total_palavras']:,} palavras -> {caminho} "
+          f"(pico de memória residente: {pico_memoria_mb():.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
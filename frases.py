@@ -0,0 +1,252 @@
+"""
+Fronteiras de frase e geração de frases completas.
+
+As fronteiras vêm do próprio texto quando os tokens mantêm a pontuação
+final (preprocessar_texto preserva .!?). Os textos limpos por limpa.py
+(data/maravilha-limpo.txt...) não têm pontuação nenhuma; para eles as
+fronteiras vêm do original com pontuação (data/maravilha.txt), limpo de
+uma vez com uma palavra marcadora no lugar de cada fim de frase. Como a
+limpeza não junta palavras de frases vizinhas, os tokens sem os
+marcadores são exatamente os do arquivo limpo, o que é conferido antes de
+usar as posições.
+
+Com as fronteiras, o modelo indexa os contextos que abrem e que fecham
+frases (IndiceFrases, em modelo.py). A geração sorteia um contexto
+inicial pela frequência com que abre frases no corpus e, passado o
+tamanho pedido, termina no primeiro contexto que já fechou uma frase,
+sorteando entre as palavras que a fecharam: uma passada só, sem gerar e
+descartar textos. No meio do texto, cada palavra fecha uma frase com a
+proporção observada no corpus para aquele n-grama.
+
+Uso: python frases.py [corpus] [--ordem 3] [--tamanho 30] [--frases 5] [--semente 0] [--verificar]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+from array import array
+
+from limpa import limpar_texto
+from modelo import listar_corpora, preprocessar_texto, tokenizar
+
+PONTUACAO_FINAL = ('.', '!', '?', '…')
+
+# Fim de frase no texto original: pontuação final, as aspas ou parênteses
+# que a fecham e o espaço seguinte
+FIM_DE_FRASE = re.compile(r'(?<=[.!?…])["”’»)\]]*\s+')
+
+# Palavra que marca os fins de frase do original durante a limpeza (só
+# letras, para sobreviver a ela; depois de preprocessar_texto fica minúscula)
+MARCADOR = 'XFIMDEFRASEX'
+
+# Sufixos dos arquivos gerados por limpa.py a partir de um original
+SUFIXOS_LIMPOS = ('-limpo', '_limpo')
+
+
+def original(caminho):
+    """Arquivo com pontuação de que `caminho` é a versão limpa (X-limpo.txt -> X.txt), se existir."""
+    raiz, extensao = os.path.splitext(caminho)
+    for sufixo in SUFIXOS_LIMPOS:
+        if raiz.endswith(sufixo):
+            candidato = raiz[:-len(sufixo)] + extensao
+            if os.path.exists(candidato):
+                return candidato
+    return None
+
+
+def fronteiras_arquivo(caminho, tokens=None):
+    """
+    Começos de frase de um arquivo do corpus.
+
+    Args:
+        caminho (str): Arquivo do corpus
+        tokens (list): Tokens do arquivo, se já foram lidos (como em
+            tokenizar(preprocessar_texto(...)))
+
+    Returns:
+        tuple: (posições dos tokens que começam frase, número de tokens do
+                arquivo, origem das fronteiras: 'pontuacao', 'original' ou
+                None quando só o começo do arquivo é conhecido)
+    """
+    if tokens is None:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            tokens = tokenizar(preprocessar_texto(f.read()))
+    if not tokens:
+        return [], 0, None
+
+    if any(token.endswith(PONTUACAO_FINAL) for token in tokens):
+        posicoes = [0] + [i + 1 for i, token in enumerate(tokens[:-1]) if token.endswith(PONTUACAO_FINAL)]
+        return posicoes, len(tokens), 'pontuacao'
+
+    fonte = original(caminho)
+    if fonte is not None:
+        with open(fonte, 'r', encoding='utf-8') as f:
+            marcado = FIM_DE_FRASE.sub(f' {MARCADOR} ', f.read())
+        marcador = MARCADOR.lower()
+        posicoes = [0]
+        alinhados = []
+        for token in tokenizar(preprocessar_texto(limpar_texto(marcado))):
+            if token != marcador:
+                alinhados.append(token)
+            elif len(alinhados) > posicoes[-1]:  # Frases vazias não contam
+                posicoes.append(len(alinhados))
+        if alinhados == tokens:
+            if posicoes[-1] == len(tokens):
+                posicoes.pop()
+            return posicoes, len(tokens), 'original'
+
+    return [0], len(tokens), None
+
+
+def fronteiras_corpus(arquivos, tokens_por_arquivo=None):
+    """
+    Começos de frase do corpus (os arquivos em sequência, como em ler_arquivos).
+
+    O começo de cada arquivo também começa uma frase.
+
+    Args:
+        arquivos (tuple): Arquivos do corpus
+        tokens_por_arquivo (list): Tokens de cada arquivo, se já foram lidos
+
+    Returns:
+        tuple: (array('I') com as posições, número de tokens do corpus)
+    """
+    if tokens_por_arquivo is None:
+        tokens_por_arquivo = [None] * len(arquivos)
+    fronteiras = array('I')
+    total = 0
+    for caminho, tokens_arquivo in zip(arquivos, tokens_por_arquivo):
+        posicoes, tokens, _ = fronteiras_arquivo(caminho, tokens_arquivo)
+        fronteiras.extend(total + p for p in posicoes)
+        total += tokens
+    return fronteiras, total
+
+
+def gerar_frases(modelo, ordem, tamanho, rng=random, temperatura=1.0, top_k=0, top_p=1.0,
+                 primeira=None, excesso=None):
+    """
+    Gera um texto que começa no começo de uma frase e termina no fim de outra.
+
+    Args:
+        modelo (ModeloMarkov): Modelo com índice de frases
+        ordem (int): Ordem n da geração
+        tamanho (int): Palavras a partir das quais o texto pode terminar
+        rng: Gerador de números aleatórios
+        temperatura, top_k, top_p: Controle do sorteio (ver escolher_controlado)
+        primeira (int): Id da primeira palavra, se houver frases que comecem por ela
+        excesso (int): Palavras além de `tamanho` antes de desistir de achar
+            um fim de frase (padrão: o próprio tamanho)
+
+    Yields:
+        tuple: (id da palavra, se ela fecha uma frase)
+
+    Raises:
+        ValueError: Se o modelo não tem índice de frases para a ordem
+    """
+    indice = (modelo.frases or {}).get(ordem)
+    if indice is None:
+        raise ValueError(f"O modelo não tem índice de frases para n={ordem}.")
+    tabela = modelo.tabelas[ordem]
+    limite = tamanho + (tamanho if excesso is None else excesso)
+    controlado = temperatura != 1.0 or top_k or top_p < 1.0
+
+    contexto = indice.sortear_inicio(rng, primeira)
+    if contexto is None:
+        return
+    for palavra in contexto:
+        yield palavra, False
+    gerados = len(contexto)
+
+    while gerados < limite:
+        if gerados >= tamanho:
+            final = indice.sortear_final(contexto, rng)
+            if final is not None:
+                yield final, True
+                return
+        if controlado:
+            proximo = tabela.escolher_controlado(contexto, rng, temperatura, top_k, top_p)
+        else:
+            proximo = tabela.escolher(contexto, rng)
+        if proximo is None:
+            return
+        fecha = indice.fecha(contexto, proximo, rng)
+        yield proximo, fecha
+        gerados += 1
+        if fecha and gerados >= tamanho:
+            return
+        contexto = contexto[1:] + (proximo,)
+
+
+def pontuar(palavras):
+    """
+    Palavras com ponto final onde uma frase fecha e maiúscula onde a seguinte começa.
+
+    Args:
+        palavras (iterable): (palavra, se ela fecha uma frase)
+
+    Yields:
+        str: palavras prontas para exibição
+    """
+    maiuscula = True
+    for palavra, fecha in palavras:
+        if maiuscula:
+            palavra = palavra[:1].upper() + palavra[1:]
+        if fecha and not palavra.endswith(PONTUACAO_FINAL):
+            palavra += '.'
+        maiuscula = fecha
+        yield palavra
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera frases completas com o índice de fronteiras de frase.")
+    parser.add_argument("corpus", nargs="?", default="alice", help="nome do corpus (padrão: alice)")
+    parser.add_argument("--ordem", type=int, default=3, help="ordem n da geração (padrão: 3)")
+    parser.add_argument("--tamanho", type=int, default=30, help="palavras a partir das quais o texto termina")
+    parser.add_argument("--frases", type=int, default=5, help="textos gerados (padrão: 5)")
+    parser.add_argument("--semente", type=int, default=None, help="semente da geração")
+    parser.add_argument("--verificar", action="store_true",
+                        help="confere o alinhamento das fronteiras e mede onde os textos terminam")
+    args = parser.parse_args()
+
+    corpora = listar_corpora()
+    if args.corpus not in corpora:
+        sys.exit(f"Corpus '{args.corpus}' desconhecido.")
+
+    if args.verificar:
+        for caminho in corpora[args.corpus]:
+            posicoes, tokens, origem = fronteiras_arquivo(caminho)
+            print(f"{caminho}: {tokens:,} palavras, {len(posicoes):,} frases "
+                  f"(fronteiras: {origem or 'não encontradas'})")
+            if origem is None:
+                sys.exit(1)
+
+    # Importado só aqui: construir_corpus usa as fronteiras sem precisar do registro
+    from registro import RegistroModelos
+
+    modelo = RegistroModelos().obter(args.corpus)
+    if modelo.frases is None:
+        sys.exit(f"O modelo de '{args.corpus}' não tem índice de frases; reconstrua com python modelo.py.")
+    rng = random.Random(args.semente)
+
+    for _ in range(args.frases):
+        palavras = [(modelo.vocabulario[i], fecha)
+                    for i, fecha in gerar_frases(modelo, args.ordem, args.tamanho, rng)]
+        print(' '.join(pontuar(palavras)) + '\n')
+
+    if args.verificar:
+        amostras = 1000
+        terminadas = excedentes = 0
+        for _ in range(amostras):
+            geradas = list(gerar_frases(modelo, args.ordem, args.tamanho, rng))
+            if geradas and geradas[-1][1]:
+                terminadas += 1
+                excedentes += len(geradas) - args.tamanho
+        print(f"{terminadas / amostras:.1%} de {amostras} textos terminam em fim de frase, "
+              f"em média {excedentes / max(terminadas, 1):.1f} palavras além do tamanho pedido")
+        sys.exit(0 if terminadas else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Geração em massa de texto sintético direto para arquivo.
+
+Para testes de carga é preciso produzir corpora de gigabytes. Aqui o texto
+é escrito parágrafo a parágrafo por um writer com buffer grande (com gzip
+opcional), então a memória usada não depende do tamanho da saída. O
+trabalho pode ser dividido entre vários processos, cada um com sua semente
+e seu arquivo parcial; no fim as partes são concatenadas em ordem (membros
+gzip concatenados formam um arquivo gzip válido).
+
+Uso: python gerar_corpus.py saida.txt.gz --palavras 10000000 [--n 4] [--processos 4] [--seed 0]
+"""
+
+import argparse
+import gzip
+import io
+import os
+import random
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+
+from lero import iter_words, random_start
+from registro import RegistroModelos
+
+# Tamanho do buffer de escrita
+BUFFER_BYTES = 1 << 20
+
+
+@contextmanager
+def abrir_saida(caminho, comprimir=None):
+    """
+    Abre o arquivo de saída em modo texto com buffer grande.
+
+    Args:
+        caminho (str): Caminho do arquivo
+        comprimir (bool): Usa gzip; por padrão, quando o caminho termina em .gz
+    """
+    if comprimir is None:
+        comprimir = caminho.endswith('.gz')
+    with open(caminho, 'wb', buffering=BUFFER_BYTES) as arquivo:
+        if comprimir:
+            with gzip.GzipFile(fileobj=arquivo, mode='wb', compresslevel=6) as compactado:
+                with io.TextIOWrapper(compactado, encoding='utf-8') as saida:
+                    yield saida
+        else:
+            with io.TextIOWrapper(arquivo, encoding='utf-8') as saida:
+                yield saida
+
+
+def gerar_parte(argumentos):
+    """
+    Gera uma parte do corpus; executada em um processo separado.
+
+    Returns:
+        tuple: (palavras escritas, segundos)
+    """
+    caminho, corpus, n, palavras, paragrafo, semente, comprimir = argumentos
+    inicio = time.perf_counter()
+
+    modelo = RegistroModelos().obter(corpus)
+    rng = random.Random(semente)
+    escritas = 0
+
+    with abrir_saida(caminho, comprimir) as saida:
+        while escritas < palavras:
+            tamanho = min(paragrafo, palavras - escritas)
+            inicio_paragrafo = random_start(modelo, rng, n)
+            # O último parágrafo pode ser mais curto que as n-1 palavras iniciais
+            linha = list(islice(iter_words(modelo, inicio_paragrafo, tamanho, rng, n), tamanho))
+            saida.write(' '.join(linha))
+            saida.write('\n')
+            escritas += len(linha)
+
+    return escritas, time.perf_counter() - inicio
+
+
+def gerar_corpus(caminho, palavras, corpus='alice', n=4, processos=1, semente=0,
+                 paragrafo=200, comprimir=None):
+    """
+    Gera `palavras` palavras em `caminho`, um parágrafo por linha.
+
+    Args:
+        caminho (str): Arquivo de saída (.gz ativa a compressão por padrão)
+        palavras (int): Total de palavras a gerar
+        corpus (str): Corpus do modelo usado
+        n (int): Tamanho do n-grama
+        processos (int): Processos em paralelo, cada um com uma parte
+        semente (int): Semente base; cada parte usa uma semente derivada dela
+        paragrafo (int): Palavras por parágrafo (cada parágrafo recomeça de
+            um contexto aleatório do corpus, então precisa de ao menos n-1)
+        comprimir (bool): Usa gzip (padrão: conforme a extensão)
+
+    Returns:
+        tuple: (palavras escritas, segundos)
+
+    Raises:
+        ValueError: Se o parágrafo é mais curto que o contexto inicial
+    """
+    if paragrafo < n - 1:
+        raise ValueError(f"O parágrafo precisa de ao menos {n - 1} palavras (o contexto inicial de n={n}).")
+    if comprimir is None:
+        comprimir = caminho.endswith('.gz')
+
+    # Garante que o artefato existe antes de abrir os processos
+    RegistroModelos().obter(corpus)
+
+    inicio = time.perf_counter()
+    if processos <= 1:
+        escritas, _ = gerar_parte((caminho, corpus, n, palavras, paragrafo, semente, comprimir))
+        return escritas, time.perf_counter() - inicio
+
+    partes = [f"{caminho}.parte{i:03d}" for i in range(processos)]
+    cotas = [palavras // processos + (i < palavras % processos) for i in range(processos)]
+    argumentos = [
+        (parte, corpus, n, cota, paragrafo, f"{semente}:{i}", comprimir)
+        for i, (parte, cota) in enumerate(zip(partes, cotas))
+    ]
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        resultados = list(executor.map(gerar_parte, argumentos))
+
+    # Junta as partes em ordem, copiando em blocos
+    with open(caminho, 'wb') as destino:
+        for parte in partes:
+            with open(parte, 'rb') as origem:
+                shutil.copyfileobj(origem, destino, BUFFER_BYTES)
+            os.remove(parte)
+
+    return sum(escritas for escritas, _ in resultados), time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um corpus sintético grande direto para arquivo.")
+    parser.add_argument("saida", help="arquivo de saída (.gz para comprimir)")
+    parser.add_argument("--palavras", type=int, default=1_000_000, help="total de palavras")
+    parser.add_argument("--corpus", default="alice", help="corpus do modelo (padrão: alice)")
+    parser.add_argument("--n", type=int, default=4, help="tamanho do n-grama (padrão: 4)")
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1,
+                        help="processos em paralelo")
+    parser.add_argument("--seed", type=int, default=0, help="semente base")
+    parser.add_argument("--paragrafo", type=int, default=200, help="palavras por parágrafo")
+    parser.add_argument("--gzip", dest="comprimir", action="store_true", default=None,
+                        help="comprime com gzip mesmo sem a extensão .gz")
+    args = parser.parse_args()
+    if args.paragrafo < args.n - 1:
+        parser.error(f"use --paragrafo >= {args.n - 1} (as palavras iniciais de n={args.n})")
+
+    escritas, segundos = gerar_corpus(args.saida, args.palavras, args.corpus, args.n,
+                                      args.processos, args.seed, args.paragrafo, args.comprimir)
+    tamanho_mb = os.path.getsize(args.saida) / 2**20
+    print(f"{escritas:,} palavras em {segundos:.2f}s ({escritas / segundos:,.0f} palavras/s), "
+          f"{tamanho_mb:.1f} MB em '{args.saida}'")
+
+
+if __name__ == "__main__":
+    main()
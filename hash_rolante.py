@@ -0,0 +1,87 @@
+"""
+Custo por palavra da geração com contexto por hash rolante.
+
+Compara, para cada ordem, o laço antigo (uma tupla nova por palavra,
+contexto[1:] + (proximo,), com o hash de todos os seus ids na busca em
+`linhas`) com TabelaNgramas.gerar_ids, em que o contexto é um anel de
+tamanho fixo e o hash de 64 bits é atualizado em O(1) a cada palavra.
+Os dois caminhos recebem a mesma semente e devem gerar os mesmos ids. O
+índice por hash vem pronto no artefato (ver vetorizado.indice_hash); as
+ordens sem ele são puladas.
+
+Uso: python hash_rolante.py [corpus] [--palavras 200000] [--tamanho 500] [--semente 0]
+"""
+
+import argparse
+import random
+import time
+from itertools import islice
+
+from registro import RegistroModelos
+
+
+def gerar_por_tuplas(tabela, contexto, tamanho, rng):
+    """Laço de geração anterior: uma tupla nova e um hash de n-1 ids por palavra."""
+    saida = []
+    for _ in range(tamanho):
+        proximo = tabela.escolher(contexto, rng)
+        if proximo is None:
+            break
+        saida.append(proximo)
+        contexto = contexto[1:] + (proximo,)
+    return saida
+
+
+def gerar_por_hash(modelo, ordem, contexto, tamanho, rng):
+    return list(islice(modelo.gerar_ids(ordem, contexto, rng), tamanho))
+
+
+def medir(gerar, inicios, tamanho, semente):
+    """Gera um texto a partir de cada contexto inicial; retorna (ids gerados, segundos)."""
+    rng = random.Random(semente)
+    gerados = []
+    inicio = time.perf_counter()
+    for contexto in inicios:
+        gerados.append(gerar(contexto, tamanho, rng))
+    return gerados, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o custo por palavra da geração com hash rolante.")
+    parser.add_argument("corpus", nargs="?", default="alice", help="nome do corpus (padrão: alice)")
+    parser.add_argument("--palavras", type=int, default=200_000, help="palavras geradas por ordem e caminho")
+    parser.add_argument("--tamanho", type=int, default=500, help="palavras por texto")
+    parser.add_argument("--semente", type=int, default=0, help="semente da geração")
+    args = parser.parse_args()
+
+    modelo = RegistroModelos().obter(args.corpus)
+    tokens = modelo.tokens
+    print(f"{'ordem':>5} {'tuplas ns':>10} {'hash ns':>10} {'ganho':>7}")
+
+    for ordem in modelo.ordens:
+        tabela = modelo.tabelas[ordem]
+        if tabela.indice_hash() is None:
+            print(f"{ordem:>5} sem índice por hash (artefato antigo ou de construir_externo)")
+            continue
+        k = ordem - 1
+        rng = random.Random(args.semente)
+        inicios = []
+        for _ in range(-(-args.palavras // args.tamanho)):
+            posicao = rng.randrange(len(tokens) - k)
+            inicios.append(tuple(tokens[posicao:posicao + k]))
+
+        por_tuplas, segundos_tuplas = medir(lambda c, t, r: gerar_por_tuplas(tabela, c, t, r),
+                                            inicios, args.tamanho, args.semente)
+        por_hash, segundos_hash = medir(lambda c, t, r: gerar_por_hash(modelo, ordem, c, t, r),
+                                        inicios, args.tamanho, args.semente)
+        if por_tuplas != por_hash:
+            raise SystemExit(f"Os dois caminhos geraram textos diferentes na ordem {ordem}.")
+
+        palavras = sum(len(ids) for ids in por_hash)
+        ns_tuplas = segundos_tuplas / palavras * 1e9
+        ns_hash = segundos_hash / palavras * 1e9
+        print(f"{ordem:>5} {ns_tuplas:>10.0f} {ns_hash:>10.0f} {ns_tuplas / ns_hash:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
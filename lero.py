@@ -1,109 +1,301 @@
+import argparse
+import os
+import pickle
 import random
 import sys
-from collections import defaultdict, Counter
+from functools import partial
+from itertools import islice
 
-# Carrega dois textos de Alice no País das Maravilhas
+from modelo import (PASTA_MODELOS, carregar_modelo, construir_modelo,
+                    impressao_fontes)
+
+# Textos de Alice no País das Maravilhas e Através do Espelho
 # Assume que os textos já estão limpos (sem pontuação, etc.)
-try:
-    text1 = open("data/maravilha_limpo.txt", encoding="utf-8").read().lower()
-    text2 = open("data/espelho_limpo.txt", encoding="utf-8").read().lower()
-except FileNotFoundError:
-    raise FileNotFoundError("Arquivos de texto não encontrados.")
+FILES = ("data/maravilha-limpo.txt", "data/espelho-limpo.txt")
+
+# Modelos pré-compilados pelo CLI (um arquivo por ordem)
+CACHE_DIR = os.path.join(PASTA_MODELOS, "cache")
+
+
+def load_words(files=FILES):
+    """
+    Carrega os textos e quebra em palavras
+
+    Args:
+        files: caminhos dos arquivos de texto
+
+    Returns:
+        lista de palavras dos textos combinados
+    """
+    texts = []
+    for path in files:
+        try:
+            with open(path, encoding="utf-8") as f:
+                texts.append(f.read().lower())
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Arquivo de texto não encontrado: {path}")
+    return " ".join(texts).split()
 
-# Combina os dois textos e quebra em palavras
-words = (text1 + " " + text2).split()
 
 def build_ngram_model(words, n=3):
     """
     Constrói um modelo de n-gramas (Markov de ordem n-1)
-    
+
     Args:
         words: lista de palavras do texto
         n: tamanho do n-grama (3 = trigramas, 4 = 4-gramas, etc.)
-    
+
+    Returns:
+        ModeloMarkov compilado com a tabela da ordem n
+    """
+    if n < 2:
+        raise ValueError("n deve ser >= 2")
+
+    return construir_modelo("lero", words, ordens=(n,))
+
+
+def load_model(n=4, files=FILES, cache_dir=CACHE_DIR):
+    """
+    Carrega o modelo pré-compilado da ordem n, reconstruindo-o apenas
+    se os arquivos de texto mudaram desde a última compilação
+
+    Args:
+        n: tamanho do n-grama
+        files: caminhos dos arquivos de texto
+        cache_dir: pasta dos modelos pré-compilados
+
     Returns:
-        dicionário onde cada chave é um contexto de (n-1) palavras
-        e o valor é uma lista de possíveis palavras seguintes
+        ModeloMarkov com a tabela da ordem n
     """
     if n < 2:
         raise ValueError("n deve ser >= 2")
-    
-    model = defaultdict(list)
-    
-    # Percorre o texto criando n-gramas
-    for i in range(len(words) - n + 1):
-        # Contexto: (n-1) palavras
-        context = tuple(words[i:i + n - 1])
-        # Palavra que segue o contexto
-        next_word = words[i + n - 1]
-        # Adiciona a palavra ao contexto
-        model[context].append(next_word)
-    
+
+    fontes = impressao_fontes(files)
+    path = os.path.join(cache_dir, f"lero-{n}.pkl")
+
+    if os.path.exists(path):
+        try:
+            model = carregar_modelo(path)
+            if model.fontes == fontes:
+                return model
+        except (pickle.UnpicklingError, EOFError, ValueError, KeyError, IndexError,
+                AttributeError, TypeError, ImportError):
+            pass  # Cache corrompido ou de outro formato: reconstrói
+
+    model = build_ngram_model(load_words(files), n=n)
+    model.fontes = fontes
+    model.salvar(path)
     return model
 
-def generate_text(model, start_words, length=50):
+
+def random_start(model, rng=random, n=None):
     """
-    Gera texto usando o modelo de n-gramas com seleção ponderada
-    
+    Escolhe um contexto inicial aleatório do texto original
+
+    Args:
+        n: tamanho do n-grama (padrão: a maior ordem do modelo)
+
+    Returns:
+        tupla com as (n-1) palavras iniciais
+    """
+    context_size = (n or model.ordens[-1]) - 1
+    start_index = rng.randint(0, len(model.tokens) - context_size)
+    return tuple(model.palavras(model.tokens[start_index:start_index + context_size]))
+
+
+def iter_words(model, start_words, length=50, rng=random, n=None,
+               temperature=1.0, top_k=0, top_p=1.0):
+    """
+    Gera as palavras uma a uma usando o modelo de n-gramas com seleção ponderada
+
+    Só o contexto atual fica em memória, então o tempo até a primeira palavra
+    e a memória usada não dependem de `length`.
+
     Args:
         model: modelo de n-gramas construído
         start_words: tupla com palavras iniciais
         length: número total de palavras a gerar
-    
-    Returns:
-        string com o texto gerado
+        rng: gerador de números aleatórios (para resultados reprodutíveis)
+        n: tamanho do n-grama (padrão: a maior ordem do modelo)
+        temperature: temperatura do sorteio (< 1 mais conservador, > 1 mais criativo)
+        top_k: sorteia só entre as k palavras mais prováveis (0 = todas)
+        top_p: sorteia só no núcleo com essa fração da probabilidade
+
+    Yields:
+        as palavras do texto, começando pelas palavras iniciais
     """
     # Determina o tamanho do contexto baseado no modelo
-    context_size = len(next(iter(model)))
-    
+    table = model.tabelas[n or model.ordens[-1]]
+    context_size = table.ordem - 1
+
     # Verifica se o número de palavras iniciais está correto
     if len(start_words) != context_size:
         raise ValueError(f"O modelo espera {context_size} palavras no contexto.")
-    
-    # Inicializa a saída com as palavras iniciais
-    output = list(start_words)
-    
+
+    ids = model.ids(start_words)
+    if ids is None:
+        raise ValueError("Palavras iniciais fora do vocabulário do modelo.")
+
+    # Começa pelas palavras iniciais
+    yield from start_words
+    context = ids
+    vocabulary = model.vocabulario
+
+    # Tabela exata em memória: o contexto avança por hash rolante, sem tuplas
+    # novas (as tabelas do autômato, quantizadas e do SQLite usam o laço abaixo)
+    if hasattr(table, "gerar_ids"):
+        next_ids = model.gerar_ids(table.ordem, ids, rng, temperature, top_k, top_p)
+        for next_id in islice(next_ids, max(length - context_size, 0)):
+            yield vocabulary[next_id]
+        return
+
+    exact = temperature == 1.0 and not top_k and top_p >= 1.0
+
     # Gera as palavras restantes
-    for _ in range(length - context_size):  # CORREÇÃO: era "* in range"
-        # Pega o contexto atual (últimas n-1 palavras)
-        current_context = tuple(output[-context_size:])
-        
+    for _ in range(length - context_size):
+        # Escolhe uma palavra baseada na frequência (mais frequentes têm maior chance)
+        if exact:
+            next_id = table.escolher(context, rng)
+        else:
+            next_id = table.escolher_controlado(context, rng, temperature, top_k, top_p)
+
         # Se o contexto não existe no modelo, para a geração
-        if current_context not in model:
+        if next_id is None:
             break
-        
-        # Pega todas as possíveis palavras seguintes
-        next_words = model[current_context]
-        
-        # Conta a frequência de cada palavra (seleção ponderada)
-        counts = Counter(next_words)
-        palavras = list(counts.keys())
-        pesos = list(counts.values())
-        
-        # Escolhe uma palavra baseada na frequência (mais frequentes têm maior chance)
-        next_word = random.choices(palavras, weights=pesos, k=1)[0]
-        output.append(next_word)
-    
-    return " ".join(output)
 
-# CONFIGURAÇÃO 
-# Permite definir o tamanho do n-grama via linha de comando
-if len(sys.argv) < 2:
-    n = 4  # Padrão: 4-gramas (Markov ordem 3)
-else:
-    n = int(sys.argv[1])
+        yield vocabulary[next_id]
+        context = context[1:] + (next_id,)
+
+
+def generate_text(model, start_words, length=50, rng=random):
+    """
+    Gera texto usando o modelo de n-gramas com seleção ponderada
+
+    Returns:
+        string com o texto gerado
+    """
+    return " ".join(iter_words(model, start_words, length, rng))
+
+
+def stream_text(model, start_words, length=50, rng=random, out=sys.stdout, flush_every=64, n=None,
+                temperature=1.0, top_k=0, top_p=1.0):
+    """
+    Escreve o texto em `out` à medida que é gerado, esvaziando o buffer a
+    cada `flush_every` palavras (e logo após a primeira)
+    """
+    words = iter_words(model, start_words, length, rng, n, temperature, top_k, top_p)
+    for i, word in enumerate(words):
+        out.write(word if i == 0 else " " + word)
+        if i % flush_every == 0:
+            out.flush()
+    out.write("\n")
+    out.flush()
+
+
+def prepare_batch(n=4, db=None, temperature=1.0, top_k=0, top_p=1.0):
+    """
+    Carrega o modelo para o modo em lote (ver lote.py)
+
+    Os modelos de cada ordem pedida são carregados na primeira vez que
+    aparecem; com `db`, todas as ordens vêm do mesmo banco SQLite.
+
+    Returns:
+        função que recebe um pedido (dict) e devolve o texto gerado
+    """
+    import lote
+
+    models = {}
+    # Ocorrências de inícios curtos no corpus, por ordem (os ids são de cada modelo)
+    occurrences = {}
+    if db:
+        from banco import ModeloSQLite
+        shared = ModeloSQLite(db)
+    else:
+        models[n] = load_model(n)
+
+    def generate(request):
+        seed = request.get("semente")
+        rng = random.Random(seed) if seed is not None else random
+        order = lote.inteiro(request, "n", n, 2, 6)
+        model = shared if db else models.get(order)
+        if model is None:
+            model = models[order] = load_model(order)
+        length = lote.inteiro(request, "tamanho", 53, 1)
+        start_words = lote.palavras_iniciais(request)
+        if start_words:
+            ids = model.ids(start_words)
+            if ids is None:
+                raise ValueError("Palavras iniciais fora do vocabulário do modelo.")
+            context = lote.contexto_inicial(ids, order - 1, model.tokens, rng,
+                                            occurrences.setdefault(order, {}))
+            start_words = tuple(model.palavras(context))
+        else:
+            start_words = random_start(model, rng, order)
+        return " ".join(iter_words(model, start_words, length, rng, order, temperature, top_k, top_p))
+
+    return generate
+
+
+def main_chars(args):
+    """Gera texto letra a letra com o modelo de caracteres."""
+    # Importados só aqui para não atrasar a partida do modo de palavras
+    import numpy as np
+
+    from caracteres import ModeloCaracteres
+
+    rng = np.random.default_rng(args.seed)
+    model = ModeloCaracteres.construir(" ".join(load_words()), args.n)
+
+    for _ in range(args.count):
+        print(model.gerar(args.length, rng=rng), flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera lero-lero com n-gramas dos livros da Alice.")
+    parser.add_argument("n", nargs="?", type=int, default=4,
+                        help="tamanho do n-grama (padrão: 4, Markov ordem 3)")
+    parser.add_argument("--count", type=int, default=1, help="quantidade de textos a gerar")
+    parser.add_argument("--seed", type=int, default=None, help="semente para resultados reprodutíveis")
+    parser.add_argument("--length", type=int, default=53,
+                        help="palavras por texto, ou caracteres com --chars (padrão: 53)")
+    parser.add_argument("--chars", action="store_true",
+                        help="usa n-gramas de caracteres em vez de palavras")
+    parser.add_argument("--temperature", type=float, default=1.0,
+                        help="temperatura do sorteio: < 1 mais conservador, > 1 mais criativo (padrão: 1)")
+    parser.add_argument("--top-k", type=int, default=0,
+                        help="sorteia só entre as k palavras mais prováveis (padrão: 0, todas)")
+    parser.add_argument("--top-p", type=float, default=1.0,
+                        help="sorteia só no núcleo com essa fração da probabilidade (padrão: 1)")
+    parser.add_argument("--db", default=None,
+                        help="banco SQLite construído por banco.py, para corpora que não cabem em memória")
+    # Importado só aqui: quem usa lero como biblioteca não precisa do modo em lote
+    import lote
+    lote.adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+    if args.temperature <= 0 or not 0 < args.top_p <= 1 or args.top_k < 0:
+        parser.error("use --temperature > 0, --top-k >= 0 e 0 < --top-p <= 1")
+
+    if args.lote:
+        lote.executar_lote(partial(prepare_batch, args.n, args.db, args.temperature, args.top_k, args.top_p),
+                           args.lote, args.processos)
+        return
 
-context_size = n - 1
+    if args.chars:
+        main_chars(args)
+        return
 
-# Constrói o modelo
-markov_model = build_ngram_model(words, n=n)
+    rng = random.Random(args.seed)
+    if args.db:
+        from banco import ModeloSQLite
+        model = ModeloSQLite(args.db)
+    else:
+        model = load_model(args.n)
 
-# Escolhe um contexto inicial aleatório do texto original
-start_index = random.randint(0, len(words) - context_size)
-start_words = tuple(words[start_index:start_index + context_size])
+    for _ in range(args.count):
+        start_words = random_start(model, rng, args.n)
+        stream_text(model, start_words, args.length, rng, n=args.n,
+                    temperature=args.temperature, top_k=args.top_k, top_p=args.top_p)
 
-# Opcionalmente mostra o contexto inicial
-# print("Contexto inicial aleatório:", start_words)
 
-# Gera e imprime o texto
-print(generate_text(markov_model, start_words, 53))
+if __name__ == "__main__":
+    main()
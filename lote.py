@@ -0,0 +1,219 @@
+"""
+Modo em lote (JSON lines) para os geradores de linha de comando.
+
+Cada linha da entrada é um pedido em JSON, por exemplo
+
+    {"id": 1, "inicio": "alice", "n": 3, "tamanho": 50, "semente": 7}
+
+e cada linha da saída é o resultado do pedido correspondente, na mesma
+ordem, com o tempo gasto na geração:
+
+    {"id": 1, "texto": "alice ...", "palavras": 50, "ms": 0.041}
+
+Todos os campos são opcionais; os padrões são os de cada gerador. Do
+"inicio" valem as últimas n-1 palavras; com menos palavras que isso, o
+texto parte de uma ocorrência delas no corpus, sorteada. Um
+pedido que não pode ser atendido (JSON inválido, palavra fora do
+vocabulário, n não suportado) vira {"id": ..., "erro": "..."} sem
+interromper o lote.
+
+O modelo é carregado uma única vez (uma vez por processo, com
+--processos N) e os pedidos seguem para os processos em blocos, para que
+a troca de mensagens não domine o tempo de pedidos curtos.
+
+Uso: python lero.py --lote pedidos.jsonl [--processos 4] > resultados.jsonl
+     (também em markov_model_alice_v1.py, v2 e v3; "-" lê da entrada padrão)
+"""
+
+import random
+import sys
+import time
+from contextlib import redirect_stdout
+from itertools import islice, tee
+
+# Pedidos enviados a um processo de uma vez
+PEDIDOS_POR_BLOCO = 256
+
+# Gerador do processo atual, montado uma vez por preparar()
+_gerar = None
+
+
+def adicionar_argumentos(parser):
+    """Acrescenta as opções do modo em lote a um ArgumentParser."""
+    parser.add_argument("--lote", metavar="ARQUIVO", default=None,
+                        help="lê pedidos JSON lines do arquivo ('-' = entrada padrão) e escreve "
+                             "os resultados em JSON lines na saída padrão")
+    parser.add_argument("--processos", type=int, default=1,
+                        help="processos que atendem os pedidos do lote (padrão: 1)")
+
+
+def atender(linha):
+    """
+    Atende um pedido (uma linha JSON) com o gerador do processo.
+
+    Returns:
+        str: resultado em JSON, sem a quebra de linha
+    """
+    # json e multiprocessing são importados só quando há um lote: os
+    # geradores importam este módulo para as opções de linha de comando
+    import json
+
+    inicio = time.perf_counter()
+    identificador = None
+    try:
+        pedido = json.loads(linha)
+        if not isinstance(pedido, dict):
+            raise ValueError("o pedido deve ser um objeto JSON")
+        identificador = pedido.get('id')
+        texto = _gerar(pedido)
+    except (ValueError, KeyError, TypeError) as e:
+        return json.dumps({'id': identificador, 'erro': str(e)}, ensure_ascii=False)
+    return json.dumps({
+        'id': identificador,
+        'texto': texto,
+        'palavras': texto.count(' ') + 1 if texto else 0,
+        'ms': round((time.perf_counter() - inicio) * 1000, 4),
+    }, ensure_ascii=False)
+
+
+def _atender_bloco(linhas):
+    return [atender(linha) for linha in linhas]
+
+
+def _iniciar_processo(preparar):
+    global _gerar
+    # O que os geradores imprimem vai para stderr; stdout é só dos resultados
+    sys.stdout = sys.stderr
+    random.seed()  # Processos criados por fork herdariam o mesmo estado
+    _gerar = preparar()
+
+
+def _blocos(linhas, tamanho):
+    bloco = []
+    for linha in linhas:
+        if not linha.strip():
+            continue
+        bloco.append(linha)
+        if len(bloco) == tamanho:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+
+def executar_lote(preparar, caminho, processos=1, saida=None, tamanho_bloco=PEDIDOS_POR_BLOCO):
+    """
+    Atende todos os pedidos do arquivo e escreve os resultados em `saida`.
+
+    Args:
+        preparar (callable): Função de módulo, sem argumentos, que carrega o
+            modelo e devolve gerar(pedido) -> texto; executada uma vez por
+            processo
+        caminho (str): Arquivo de pedidos, ou '-' para a entrada padrão
+        processos (int): Processos que atendem os pedidos
+        saida: Arquivo dos resultados (padrão: a saída padrão)
+        tamanho_bloco (int): Pedidos enviados a um processo de uma vez
+
+    Returns:
+        dict: pedidos atendidos, erros e segundos gastos
+    """
+    global _gerar
+    if saida is None:
+        saida = sys.stdout
+    entrada = sys.stdin if caminho == '-' else open(caminho, encoding='utf-8')
+    pedidos = erros = 0
+    inicio = time.perf_counter()
+
+    try:
+        with redirect_stdout(sys.stderr):
+            if processos > 1:
+                from multiprocessing import Pool
+
+                with Pool(processos, initializer=_iniciar_processo, initargs=(preparar,)) as pool:
+                    resultados = pool.imap(_atender_bloco, _blocos(entrada, tamanho_bloco))
+                    for bloco in resultados:
+                        pedidos += len(bloco)
+                        erros += sum('"erro"' in resultado for resultado in bloco)
+                        saida.write('\n'.join(bloco) + '\n')
+            else:
+                _gerar = preparar()
+                inicio = time.perf_counter()
+                for bloco in _blocos(entrada, tamanho_bloco):
+                    bloco = _atender_bloco(bloco)
+                    pedidos += len(bloco)
+                    erros += sum('"erro"' in resultado for resultado in bloco)
+                    saida.write('\n'.join(bloco) + '\n')
+    finally:
+        saida.flush()
+        if entrada is not sys.stdin:
+            entrada.close()
+
+    segundos = time.perf_counter() - inicio
+    print(f"{pedidos:,} pedidos ({erros:,} com erro) em {segundos:.2f}s "
+          f"({pedidos / segundos if segundos else 0:,.0f} pedidos/s)", file=sys.stderr)
+    return {'pedidos': pedidos, 'erros': erros, 'segundos': segundos}
+
+
+def inteiro(pedido, campo, padrao, minimo=None, maximo=None):
+    """Campo inteiro do pedido, com padrão e limites validados."""
+    valor = pedido.get(campo, padrao)
+    if isinstance(valor, bool) or not isinstance(valor, int):
+        raise ValueError(f"'{campo}' deve ser um inteiro")
+    if (minimo is not None and valor < minimo) or (maximo is not None and valor > maximo):
+        if maximo is None:
+            raise ValueError(f"'{campo}' deve ser >= {minimo}")
+        if minimo is None:
+            raise ValueError(f"'{campo}' deve ser <= {maximo}")
+        raise ValueError(f"'{campo}' deve estar entre {minimo} e {maximo}")
+    return valor
+
+
+def palavras_iniciais(pedido):
+    """Palavras do campo 'inicio' (texto ou lista), em minúsculas; vazio se ausente."""
+    inicio = pedido.get('inicio') or ()
+    if isinstance(inicio, str):
+        inicio = inicio.split()
+    if not all(isinstance(palavra, str) for palavra in inicio):
+        raise ValueError("'inicio' deve ser um texto ou uma lista de palavras")
+    return tuple(palavra.lower() for palavra in inicio)
+
+
+def contexto_inicial(palavras, tamanho, corpus, rng=random, ocorrencias=None):
+    """
+    Contexto de `tamanho` palavras para as palavras iniciais de um pedido.
+
+    Valem as últimas `tamanho` palavras; com menos palavras que isso, o
+    contexto é o de uma ocorrência delas no corpus, sorteada com `rng`.
+
+    Args:
+        palavras: palavras iniciais (ou seus ids, se `corpus` é de ids)
+        tamanho: palavras no contexto do modelo (n-1)
+        corpus: sequência de palavras (ou ids) do texto original
+        rng: gerador de números aleatórios
+        ocorrencias: dict que guarda as ocorrências já procuradas, para que
+            pedidos com o mesmo início não percorram o corpus de novo
+
+    Returns:
+        tuple: as `tamanho` palavras do contexto
+
+    Raises:
+        ValueError: se as palavras não aparecem no corpus seguidas de
+            palavras suficientes para completar o contexto
+    """
+    palavras = tuple(palavras)
+    if len(palavras) >= tamanho:
+        return palavras[len(palavras) - tamanho:]
+
+    chave = (palavras, tamanho)
+    achadas = ocorrencias.get(chave) if ocorrencias is not None else None
+    if achadas is None:
+        # Uma passada só pelo corpus, em janelas de `tamanho` palavras
+        iteradores = tee(corpus, tamanho)
+        janelas = zip(*(islice(iterador, atraso, None) for atraso, iterador in enumerate(iteradores)))
+        achadas = [janela for janela in janelas
+                   if janela[0] == palavras[0] and janela[:len(palavras)] == palavras]
+        if ocorrencias is not None:
+            ocorrencias[chave] = achadas
+    if not achadas:
+        raise ValueError("'inicio' não aparece no corpus seguido de palavras suficientes")
+    return rng.choice(achadas)
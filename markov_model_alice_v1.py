@@ -1,3 +1,4 @@
+import argparse
 import re
 import random
 from collections import defaultdict
@@ -5,6 +6,8 @@ from collections import defaultdict
 # Variáveis globais para armazenar o modelo
 markov_model = defaultdict(list)
 total_words = 0
+available_words = []
+start_pairs = {}
 
 def load_and_process_text(file_path):
     """
@@ -20,7 +23,7 @@ def load_and_process_text(file_path):
     Returns:
         bool: True se o carregamento foi bem-sucedido, False caso contrário
     """
-    global markov_model, total_words
+    global markov_model, total_words, available_words, start_pairs
     
     try:
         # Lê o arquivo com encoding UTF-8 para suportar caracteres especiais
@@ -45,6 +48,16 @@ def load_and_process_text(file_path):
         for w1, w2, w3 in zip(words, words[1:], words[2:]):
             markov_model[(w1, w2)].append(w3)
         
+        # Palavras iniciais disponíveis, calculadas uma única vez aqui
+        # em vez de percorrer o modelo a cada consulta
+        available_words = sorted(set(pair[0] for pair in markov_model))
+        
+        # Pares agrupados pela primeira palavra, para achar os candidatos de
+        # uma palavra inicial sem percorrer o modelo inteiro
+        start_pairs = defaultdict(list)
+        for pair in markov_model:
+            start_pairs[pair[0]].append(pair)
+        
         print(f"Modelo carregado com sucesso!")
         print(f"  - Total de palavras: {total_words:,}")
         print(f"  - Trigramas únicos: {len(markov_model):,}")
@@ -65,9 +78,8 @@ def get_available_words():
     Returns:
         list: Lista ordenada de palavras disponíveis
     """
-    # Pega a primeira palavra de cada par (w1, w2) no modelo
-    available_words = list(set([pair[0] for pair in markov_model.keys()]))
-    return sorted(available_words)
+    # Primeira palavra de cada par (w1, w2), calculada ao carregar o modelo
+    return available_words
 
 def generate_text(start_word, length=50):
     """
@@ -96,7 +108,7 @@ def generate_text(start_word, length=50):
         
         # Encontra todos os pares que começam com a palavra escolhida
         # Exemplo: se start_word = "alice", encontra todos os pares ("alice", X)
-        candidates = [pair for pair in markov_model.keys() if pair[0] == start_word]
+        candidates = start_pairs.get(start_word)
         
         if not candidates:
             return None, f"Não encontrei pares começando com '{start_word}' no texto."
@@ -190,6 +202,33 @@ def show_examples():
     
     print(f"\nExemplos de palavras disponíveis: {', '.join(example_words[:5])}")
 
+def prepare_batch():
+    """
+    Carrega o modelo uma única vez para o modo em lote (ver lote.py).
+    
+    Returns:
+        function: Recebe um pedido (dict) e retorna o texto gerado
+    """
+    import lote
+    
+    if not load_and_process_text("data/maravilha.txt"):
+        raise SystemExit("Não foi possível carregar o modelo.")
+    
+    def generate(request):
+        if lote.inteiro(request, "n", 3) != 3:
+            raise ValueError("Este gerador só usa trigramas (n=3).")
+        length = lote.inteiro(request, "tamanho", 50, 1)
+        if "semente" in request:
+            random.seed(request["semente"])
+        start = lote.palavras_iniciais(request)
+        start_word = start[0] if start else random.choice(available_words)
+        generated_text, error = generate_text(start_word, length)
+        if error:
+            raise ValueError(error)
+        return generated_text
+    
+    return generate
+
 def main():
     """
     Função principal que demonstra o uso do gerador de texto Markoviano.
@@ -200,6 +239,14 @@ def main():
     - Trigramas: sequências de 3 palavras consecutivas (w1, w2, w3)
     - Modelo: dicionário que mapeia pares (w1, w2) → lista de possíveis w3
     """
+    parser = argparse.ArgumentParser(description="Gerador de texto Markoviano com trigramas.")
+    import lote  # Só a linha de comando precisa do modo em lote
+    lote.adicionar_argumentos(parser)
+    args = parser.parse_args()
+    if args.lote:
+        lote.executar_lote(prepare_batch, args.lote, args.processos)
+        return
+    
     print("Gerador de Texto Markoviano")
     print("=" * 50)
     print("Demonstração de Cadeia de Markov para Geração de Texto")
@@ -1,11 +1,13 @@
+import argparse
 import random
 from collections import defaultdict, Counter
 
 # Variáveis globais para armazenar dados
 words_corpus = []
+word_counts = Counter()
 ngram_model = defaultdict(list)
 
-def load_texts(file1="data/maravilha_limpo.txt", file2="data/espelho_limpo.txt"):
+def load_texts(file1="data/maravilha-limpo.txt", file2="data/espelho-limpo.txt"):
     """
     Carrega e combina textos de dois arquivos.
     
@@ -20,7 +22,7 @@ def load_texts(file1="data/maravilha_limpo.txt", file2="data/espelho_limpo.txt")
     Returns:
         list: Lista de palavras combinadas dos dois textos, ou None se erro
     """
-    global words_corpus
+    global words_corpus, word_counts
     
     try:
         # Lê o primeiro arquivo
@@ -36,9 +38,12 @@ def load_texts(file1="data/maravilha_limpo.txt", file2="data/espelho_limpo.txt")
         combined_text = text1 + " " + text2
         words_corpus = combined_text.split()
         
+        # Conta as palavras uma única vez; as estatísticas reutilizam a contagem
+        word_counts = Counter(words_corpus)
+        
         print(f"Textos carregados com sucesso!")
         print(f"  - Total de palavras: {len(words_corpus):,}")
-        print(f"  - Palavras únicas: {len(set(words_corpus)):,}")
+        print(f"  - Palavras únicas: {len(word_counts):,}")
         
         return words_corpus
         
@@ -66,8 +71,9 @@ def create_sample_text():
     ela decidiu partir em sua própria aventura para descobrir novos lugares
     """
     
-    global words_corpus
+    global words_corpus, word_counts
     words_corpus = sample_text.lower().split()
+    word_counts = Counter(words_corpus)
     
     print("Usando texto de exemplo para demonstração.")
     print(f"  - Total de palavras: {len(words_corpus):,}")
@@ -225,12 +231,13 @@ def show_word_statistics(words, top_n=10):
         words (list): Lista de palavras
         top_n (int): Número de palavras mais comuns a mostrar
     """
-    word_counts = Counter(words)
+    # Reutiliza a contagem feita no carregamento quando é o mesmo corpus
+    counts = word_counts if words is words_corpus else Counter(words)
     
     print(f"\nPalavras mais comuns (top {top_n}):")
     print("-" * 30)
     
-    for word, count in word_counts.most_common(top_n):
+    for word, count in counts.most_common(top_n):
         percentage = (count / len(words)) * 100
         print(f"{word:<15} {count:>5} ({percentage:.1f}%)")
 
@@ -271,6 +278,45 @@ def suggest_contexts(model, partial_context, max_suggestions=5):
     
     return suggestions
 
+def prepare_batch():
+    """
+    Carrega o corpus uma única vez para o modo em lote (ver lote.py).
+    
+    O modelo de cada ordem é construído na primeira vez que é pedido.
+    
+    Returns:
+        function: Recebe um pedido (dict) e retorna o texto gerado
+    """
+    import lote
+    
+    words = load_texts()
+    if words is None:
+        words = create_sample_text()
+    models = {}
+    occurrences = {}
+    
+    def generate(request):
+        n = lote.inteiro(request, "n", 3, 2, 6)
+        length = lote.inteiro(request, "tamanho", 50, 1)
+        if "semente" in request:
+            random.seed(request["semente"])
+        
+        model = models.get(n)
+        if model is None:
+            model = models[n] = build_ngram_model(words, n=n)
+        
+        start_words = lote.palavras_iniciais(request)
+        if start_words:
+            # Usa as últimas n-1 palavras, ou completa um início curto pelo corpus
+            start_words = lote.contexto_inicial(start_words, n - 1, words, random, occurrences)
+        else:
+            start_words = get_random_start_words(words, n - 1)
+        if start_words not in model:
+            raise ValueError(f"Contexto '{' '.join(start_words)}' não encontrado no modelo.")
+        return generate_text(model, start_words, length)
+    
+    return generate
+
 def main():
     """
     Função principal que implementa a interface de linha de comando
@@ -280,6 +326,14 @@ def main():
     modela sequências de palavras para gerar texto que segue padrões
     estatísticos similares ao texto original.
     """
+    parser = argparse.ArgumentParser(description="Gerador de texto com modelos N-gramas.")
+    import lote  # Só a linha de comando precisa do modo em lote
+    lote.adicionar_argumentos(parser)
+    args = parser.parse_args()
+    if args.lote:
+        lote.executar_lote(prepare_batch, args.lote, args.processos)
+        return
+    
     print("Gerador de Texto com Modelos N-Gramas")
     print("=" * 50)
     print("Sistema de geração de texto baseado em cadeias de Markov")
@@ -1,3 +1,4 @@
+import argparse
 import re
 import random
 from collections import defaultdict, Counter
@@ -146,7 +147,38 @@ def gerar_texto(ngramas_dict, palavra_inicial, n, tamanho=51):
     
     return resultado[:tamanho]
 
+def preparar_lote():
+    """Lê os textos e cria os n-gramas de 2 a 6 uma única vez, para o modo em lote (ver lote.py)."""
+    import lote
+    
+    texto_completo = ler_arquivos()
+    if not texto_completo:
+        raise SystemExit("Erro ao ler os arquivos!")
+    
+    tokens = tokenizar(preprocessar_texto(texto_completo))
+    ngramas_dict = {i: criar_ngramas(tokens, i) for i in range(2, 7)}
+    palavras_interessantes = encontrar_palavras_interessantes(tokens)
+    
+    def gerar(pedido):
+        n = lote.inteiro(pedido, 'n', 3, 2, 6)
+        tamanho = lote.inteiro(pedido, 'tamanho', 51, 1)
+        if 'semente' in pedido:
+            random.seed(pedido['semente'])
+        inicio = lote.palavras_iniciais(pedido)
+        palavra_inicial = inicio[0] if inicio else random.choice(palavras_interessantes)
+        return ' '.join(gerar_texto(ngramas_dict, palavra_inicial, n, tamanho))
+    
+    return gerar
+
 def main():
+    parser = argparse.ArgumentParser(description="Gerador de texto com n-gramas de Markov dos livros da Alice.")
+    import lote  # Só a linha de comando precisa do modo em lote
+    lote.adicionar_argumentos(parser)
+    args = parser.parse_args()
+    if args.lote:
+        lote.executar_lote(preparar_lote, args.lote, args.processos)
+        return
+    
     print("=== Gerador de Texto com N-gramas de Markov - Livros da Alice ===\n")
     
     # Lê os arquivos
@@ -3,12 +3,31 @@
 """
 Pré-processador ULTRA-RÁPIDO para Alice
 Gera apenas dados essenciais para velocidade máxima
+
+Cada etapa (limpeza e tokenização de cada livro, listas de n-gramas de
+cada livro e ordem, junção dos livros, poda e exportação) passa pelo cache
+de artefatos (ver artefatos.py): rodar de novo sem mudanças não recalcula
+nada, e mudar um livro ou o limite de uma ordem refaz só o que depende dele.
 """
 
 import json
 import re
 import os
 from collections import defaultdict, Counter
+from functools import partial
+
+from artefatos import CacheArtefatos, escrever_se_mudou
+from limpa import limpeza
+
+# Limite de contextos exportados por ordem (os mais frequentes)
+LIMITES = {2: 800, 3: 600, 4: 400, 5: 200, 6: 100}
+
+# Versões das etapas no cache (incrementar ao mudar o código da etapa)
+VERSAO_TOKENS = 1
+VERSAO_NGRAMAS = 1
+VERSAO_JUNCAO = 1
+VERSAO_PODA = 1
+VERSAO_EXPORTACAO = 2
 
 def preprocessar_texto(texto):
     """Preprocessa mantendo acentos."""
@@ -25,8 +44,8 @@ def preprocessar_texto(texto):
 def tokenizar(texto):
     return [token for token in texto.split() if token]
 
-def criar_ngramas_otimizados(tokens, n, limite=1000):
-    """Cria apenas os n-gramas mais frequentes para velocidade."""
+def criar_ngramas(tokens, n):
+    """Palavras seguintes de cada contexto, na ordem em que aparecem no texto."""
     ngramas = defaultdict(list)
     
     for i in range(len(tokens) - n + 1):
@@ -34,6 +53,34 @@ def criar_ngramas_otimizados(tokens, n, limite=1000):
         proxima_palavra = tokens[i+n-1]
         ngramas[chave].append(proxima_palavra)
     
+    return dict(ngramas)
+
+def juntar_ngramas(n, *entradas):
+    """
+    Junta as listas de n-gramas dos livros como se os textos fossem concatenados.
+    
+    As entradas são os tokens de cada livro seguidos das listas de cada
+    livro. Os n-gramas que atravessam a divisa entre dois livros são
+    montados aqui, na mesma posição em que apareceriam no texto único.
+    """
+    livros = len(entradas) // 2
+    juntas = {}
+    pendentes = []
+    for tokens, ngramas in zip(entradas[:livros], entradas[livros:]):
+        trecho = pendentes + tokens[:n-1]
+        for i in range(min(len(pendentes), len(trecho) - n + 1)):
+            juntas.setdefault(' '.join(trecho[i:i+n-1]), []).append(trecho[i+n-1])
+        for chave, palavras in ngramas.items():
+            juntas.setdefault(chave, []).extend(palavras)
+        pendentes = (pendentes + tokens[-(n-1):])[-(n-1):]
+    return juntas
+
+def criar_ngramas_otimizados(tokens, n, limite=1000):
+    """Cria apenas os n-gramas mais frequentes para velocidade."""
+    return podar_ngramas(criar_ngramas(tokens, n), limite)
+
+def podar_ngramas(ngramas, limite):
+    """Mantém só os `limite` contextos mais frequentes entre os que aparecem 2 vezes ou mais."""
     # Filtra apenas os mais frequentes
     ngramas_filtrados = {}
     for chave, palavras in ngramas.items():
@@ -65,58 +112,11 @@ def encontrar_palavras_top(tokens):
     
     return sorted(list(set(alice_disp + top_freq)))
 
-def main():
-    print("⚡ ULTRA-FAST Preprocessor Alice")
-    print("=" * 40)
-    
-    # Encontra arquivos
-    caminhos = [
-        ('public_html/estocastico/markov_lero/data/', 'maravilha-limpo.txt', 'espelho-limpo.txt'),
-        ('data/', 'maravilha-limpo.txt', 'espelho-limpo.txt'),
-        ('./', 'maravilha-limpo.txt', 'espelho-limpo.txt')
-    ]
-    
-    texto_completo = ""
-    
-    for pasta, arq1, arq2 in caminhos:
-        try:
-            with open(os.path.join(pasta, arq1), 'r', encoding='utf-8') as f:
-                maravilha = f.read()
-            with open(os.path.join(pasta, arq2), 'r', encoding='utf-8') as f:
-                espelho = f.read()
-            
-            texto_completo = maravilha + " " + espelho
-            print(f"✅ Arquivos: {pasta}")
-            break
-        except:
-            continue
-    
-    if not texto_completo:
-        print("❌ Arquivos não encontrados!")
-        return
-    
-    print(f"📖 Texto: {len(texto_completo):,} chars")
-    
-    # Processa
-    texto_limpo = preprocessar_texto(texto_completo)
-    tokens = tokenizar(texto_limpo)
-    print(f"🔤 Tokens: {len(tokens):,}")
-    
+def montar_dados(ordens, *entradas):
+    """Dados exportados: as entradas são os tokens de cada livro seguidos dos n-gramas podados de cada ordem."""
+    livros = len(entradas) - len(ordens)
+    tokens = [token for tokens_livro in entradas[:livros] for token in tokens_livro]
     palavras_top = encontrar_palavras_top(tokens)
-    print(f"⭐ Palavras: {len(palavras_top)}")
-    
-    # N-gramas LIMITADOS para velocidade
-    print("🚀 N-gramas otimizados...")
-    ngramas = {
-        '2': criar_ngramas_otimizados(tokens, 2, 800),   # Menos dados
-        '3': criar_ngramas_otimizados(tokens, 3, 600),   # para velocidade
-        '4': criar_ngramas_otimizados(tokens, 4, 400),   # máxima
-        '5': criar_ngramas_otimizados(tokens, 5, 200),
-        '6': criar_ngramas_otimizados(tokens, 6, 100)
-    }
-    
-    for n, dados in ngramas.items():
-        print(f"  {n}-gramas: {len(dados)}")
     
     # Dados MÍNIMOS
     dados_rapidos = {
@@ -126,19 +126,77 @@ def main():
             'unicos': len(set(tokens)),
             'alice_count': len([p for p in palavras_top if p in ['alice', 'coelho', 'gato']])
         },
-        'ng': ngramas  # Nome curto para economia
+        'ng': {str(n): ngramas for n, ngramas in zip(ordens, entradas[livros:])}  # Nome curto para economia
     }
+    return json.dumps(dados_rapidos, ensure_ascii=False, separators=(',', ':'))
+
+def construir(arquivos, limites=LIMITES, cache=None):
+    """
+    Pipeline completo, dos textos originais ao JSON exportado.
+    
+    Args:
+        arquivos (list): Textos originais dos livros, na ordem de concatenação
+        limites (dict): Ordem n -> contextos exportados
+        cache (CacheArtefatos): Cache das etapas (padrão: modelos/artefatos)
+    
+    Returns:
+        Artefato: JSON exportado (texto)
+    """
+    if cache is None:
+        cache = CacheArtefatos()
+    
+    livros = []
+    for caminho in arquivos:
+        nome = os.path.basename(caminho)
+        limpo = limpeza(cache, cache.fonte(caminho), nome)
+        livros.append(cache.etapa('tokens', VERSAO_TOKENS, {}, [limpo],
+                                  lambda texto: tokenizar(preprocessar_texto(texto)), nome))
+    
+    podados = []
+    for n, limite in limites.items():
+        por_livro = [
+            cache.etapa('ngramas', VERSAO_NGRAMAS, {'n': n}, [tokens], partial(criar_ngramas, n=n),
+                        f"{os.path.basename(caminho)} n={n}")
+            for caminho, tokens in zip(arquivos, livros)
+        ]
+        juntos = cache.etapa('juncao', VERSAO_JUNCAO, {'n': n}, livros + por_livro,
+                             partial(juntar_ngramas, n), f"n={n}")
+        podados.append(cache.etapa('poda', VERSAO_PODA, {'limite': limite}, [juntos],
+                                   partial(podar_ngramas, limite=limite), f"n={n}"))
+    
+    ordens = list(limites)
+    return cache.etapa('exportacao', VERSAO_EXPORTACAO, {'ordens': ordens}, livros + podados,
+                       partial(montar_dados, ordens))
+
+def main():
+    print("⚡ ULTRA-FAST Preprocessor Alice")
+    print("=" * 40)
     
-    # Salva compacto
-    arquivo = 'alice_fast.json'
-    with open(arquivo, 'w', encoding='utf-8') as f:
-        json.dump(dados_rapidos, f, ensure_ascii=False, separators=(',', ':'))
+    # Encontra os textos originais (a limpeza faz parte do pipeline)
+    pastas = ['public_html/estocastico/markov_lero/data/', 'data/', './']
+    arquivos = None
+    for pasta in pastas:
+        candidatos = [os.path.join(pasta, nome) for nome in ('maravilha.txt', 'espelho.txt')]
+        if all(os.path.exists(caminho) for caminho in candidatos):
+            arquivos = candidatos
+            print(f"✅ Arquivos: {pasta}")
+            break
     
-    tamanho_kb = os.path.getsize(arquivo) / 1024
-    print(f"💾 Salvo: {arquivo} ({tamanho_kb:.1f} KB)")
+    if not arquivos:
+        print("❌ Arquivos não encontrados!")
+        return
     
-    print(f"🎯 Top palavras: {', '.join(palavras_top[:8])}")
-    print("🚀 PRONTO! Será MUITO mais rápido agora!")
+    cache = CacheArtefatos(relatorio=print)
+    exportacao = construir(arquivos, cache=cache)
+    print(f"🧱 {cache.resumo()}")
+    
+    # Salva compacto (só se mudou)
+    arquivo = 'alice_fast.json'
+    if escrever_se_mudou(arquivo, exportacao.valor):
+        tamanho_kb = os.path.getsize(arquivo) / 1024
+        print(f"💾 Salvo: {arquivo} ({tamanho_kb:.1f} KB)")
+    else:
+        print(f"✔️ {arquivo} já está atualizado")
 
 if __name__ == "__main__":
     main()
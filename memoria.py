@@ -0,0 +1,341 @@
+"""
+Contabilidade de memória das estruturas do modelo.
+
+sys.getsizeof de um dicionário mede só a tabela de hash: as tuplas das
+chaves, as listas de sucessores e as strings ficam de fora. Aqui cada
+estrutura é percorrida objeto a objeto, contando cada objeto uma única
+vez (pelo id), e os bytes são separados por categoria:
+
+    tabela      dicionários e conjuntos (só a tabela de hash)
+    chaves      tuplas (os contextos)
+    sequencias  listas de sucessores, a lista de tokens e os arrays
+    strings     a primeira string com cada valor
+    numeros     o primeiro número com cada valor (inteiros fora do cache
+                do interpretador, de -5 a 256, e floats)
+    duplicatas  strings e números com um valor já visto, em outro objeto:
+                o que se economizaria compartilhando um objeto por valor
+                (str.split cria uma string por ocorrência; tolist() e a
+                leitura de um pickle, um int por posição)
+    caches      pesos acumulados e índice por hash das tabelas compactas
+
+As duas representações são comparadas: a de markov_model_alice_v3.py
+(`ngramas_dict` de listas de palavras, a lista `tokens` e as
+`palavras_interessantes`) e o ModeloMarkov compacto. Para conferir a
+caminhada, cada uma também é construída sob tracemalloc. Por fim, as duas
+são medidas em prefixos do corpus e ajustadas a bytes = a * palavras^b,
+o que dá a memória prevista para um corpus de outro tamanho.
+
+Uso: python memoria.py [corpus] [--palavras N]
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+from markov_model_alice_v3 import criar_ngramas, encontrar_palavras_interessantes
+from modelo import (construir_modelo, impressao_fontes, ler_arquivos, listar_corpora,
+                    preprocessar_texto, tokenizar)
+
+CATEGORIAS = ('tabela', 'chaves', 'sequencias', 'strings', 'numeros', 'duplicatas', 'caches')
+
+# Inteiros pequenos são objetos únicos do interpretador, não das estruturas
+MENOR_INTEIRO_CACHE = -5
+MAIOR_INTEIRO_CACHE = 256
+
+# Frações do corpus medidas para ajustar a previsão
+FRACOES_PREVISAO = (0.125, 0.25, 0.5, 1.0)
+
+
+class Contabilidade:
+    """
+    Bytes por categoria de um conjunto de estruturas.
+
+    Um objeto já contado não é contado de novo, nem quando aparece em outra
+    estrutura medida com a mesma Contabilidade: as strings compartilhadas
+    entre os tokens, as chaves e as listas entram uma vez só. Objetos
+    distintos com o mesmo valor (str, int ou float) entram todos, e os que
+    vêm depois do primeiro vão para 'duplicatas'.
+    """
+
+    def __init__(self):
+        self.bytes = dict.fromkeys(CATEGORIAS, 0)
+        self._vistos = set()
+        self._valores = set()
+
+    @property
+    def total(self):
+        return sum(self.bytes.values())
+
+    def medir(self, objeto, caches=False):
+        """
+        Conta o objeto e tudo que ele referencia.
+
+        Args:
+            objeto: str, número, array ou contêiner (dict, list, tuple, set)
+            caches (bool): Conta tudo na categoria 'caches'
+        """
+        pilha = [objeto]
+        while pilha:
+            atual = pilha.pop()
+            if id(atual) in self._vistos:
+                continue
+            if isinstance(atual, (str, int, float)):
+                if isinstance(atual, int) and MENOR_INTEIRO_CACHE <= atual <= MAIOR_INTEIRO_CACHE:
+                    continue
+                self._vistos.add(id(atual))
+                if (type(atual), atual) in self._valores:
+                    categoria = 'duplicatas'
+                else:
+                    categoria = 'strings' if isinstance(atual, str) else 'numeros'
+                    self._valores.add((type(atual), atual))
+            else:
+                self._vistos.add(id(atual))
+                if isinstance(atual, dict):
+                    categoria = 'tabela'
+                    pilha.extend(atual.keys())
+                    pilha.extend(atual.values())
+                elif isinstance(atual, (set, frozenset)):
+                    categoria = 'tabela'
+                    pilha.extend(atual)
+                elif isinstance(atual, tuple):
+                    categoria = 'chaves'
+                    pilha.extend(atual)
+                else:
+                    categoria = 'sequencias'
+                    if isinstance(atual, list):
+                        pilha.extend(atual)
+            self.bytes['caches' if caches else categoria] += sys.getsizeof(atual)
+
+
+def _relatorio(partes):
+    """
+    Mede cada parte sozinha e todas juntas.
+
+    Args:
+        partes (list): (rótulo, número de itens, objetos da parte, se são caches)
+
+    Returns:
+        tuple: (lista de (rótulo, itens, Contabilidade), Contabilidade do conjunto)
+    """
+    conjunto = Contabilidade()
+    linhas = []
+    for rotulo, itens, objetos, caches in partes:
+        conta = Contabilidade()
+        for objeto in objetos:
+            conta.medir(objeto, caches)
+            conjunto.medir(objeto, caches)
+        linhas.append((rotulo, itens, conta))
+    return linhas, conjunto
+
+
+def representacao_dicionarios(tokens, ordens):
+    """Estruturas de markov_model_alice_v3.py: tokens, ngramas_dict e palavras_interessantes."""
+    return {
+        'tokens': tokens,
+        'ngramas_dict': {n: criar_ngramas(tokens, n) for n in ordens},
+        'palavras_interessantes': encontrar_palavras_interessantes(tokens),
+    }
+
+
+def medir_dicionarios(estruturas):
+    """Relatório (ver _relatorio) da representação em dicionários de listas."""
+    partes = [(f"{n}-gramas", len(ngramas), [ngramas], False)
+              for n, ngramas in estruturas['ngramas_dict'].items()]
+    partes.append(("tokens", len(estruturas['tokens']), [estruturas['tokens']], False))
+    interessantes = estruturas['palavras_interessantes']
+    partes.append(("palavras_interessantes", len(interessantes), [interessantes], False))
+    return _relatorio(partes)
+
+
+def medir_modelo(modelo):
+    """Relatório (ver _relatorio) de um ModeloMarkov, só com as tabelas residentes."""
+    partes = []
+    residentes = modelo.tabelas_residentes()
+    for ordem in sorted(residentes):
+        tabela = residentes[ordem]
+        partes.append((f"{ordem}-gramas", len(tabela),
+                       [tabela.linhas, tabela.inicio, tabela.sucessores, tabela.contagens], False))
+    partes.append(("tokens", len(modelo.tokens), [modelo.tokens], False))
+    partes.append(("vocabulário e índice", len(modelo.vocabulario),
+                   [modelo.vocabulario, modelo.indice], False))
+    partes.append(("estatísticas", len(modelo.estatisticas['palavras_interessantes']),
+                   [modelo.estatisticas], False))
+    if modelo.frases is not None:
+        partes.append(("índice de frases", sum(len(indice.inicios) for indice in modelo.frases.values()),
+                       [indice.dados() for indice in modelo.frases.values()], False))
+    caches = [tabela.caches() for tabela in residentes.values()]
+    partes.append(("caches", sum(len(acumulados) + (por_hash is not None) for acumulados, por_hash in caches),
+                   caches, True))
+    return _relatorio(partes)
+
+
+def registros(linhas, conjunto):
+    """Linhas do relatório como dicionários (MB por categoria), com o total do conjunto no fim."""
+    resultado = []
+    for rotulo, itens, conta in linhas + [("total", None, conjunto)]:
+        registro = {'estrutura': rotulo, 'itens': itens}
+        for categoria in CATEGORIAS:
+            registro[categoria] = conta.bytes[categoria] / 2**20
+        registro['total'] = conta.total / 2**20
+        resultado.append(registro)
+    return resultado
+
+
+def imprimir(titulo, linhas, conjunto):
+    print(titulo)
+    print(f"  {'estrutura':<24} {'itens':>9}" + "".join(f" {c:>10}" for c in CATEGORIAS) + f" {'total MB':>9}")
+    for registro in registros(linhas, conjunto):
+        itens = '' if registro['itens'] is None else f"{registro['itens']:,}"
+        print(f"  {registro['estrutura']:<24} {itens:>9}"
+              + "".join(f" {registro[c]:>10.2f}" for c in CATEGORIAS) + f" {registro['total']:>9.2f}")
+
+
+def memoria_residente():
+    """Memória residente do processo atual, em bytes (None fora do Linux)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def rastrear(construir):
+    """
+    Executa construir() sob tracemalloc.
+
+    Returns:
+        tuple: (resultado, bytes alocados e ainda retidos no fim, as 3
+                linhas de código que mais retiveram)
+    """
+    ja_rastreando = tracemalloc.is_tracing()
+    if not ja_rastreando:
+        tracemalloc.start()
+    filtros = (tracemalloc.Filter(False, tracemalloc.__file__),)
+    antes = tracemalloc.take_snapshot().filter_traces(filtros)
+    resultado = construir()
+    depois = tracemalloc.take_snapshot().filter_traces(filtros)
+    if not ja_rastreando:
+        tracemalloc.stop()
+    diferencas = depois.compare_to(antes, 'lineno')
+    return resultado, sum(d.size_diff for d in diferencas), diferencas[:3]
+
+
+def ajustar(pontos):
+    """
+    Ajusta bytes = a * palavras^b por mínimos quadrados em escala log-log.
+
+    Args:
+        pontos (list): (palavras, bytes)
+
+    Returns:
+        tuple: (a, b)
+    """
+    xs = [math.log(palavras) for palavras, _ in pontos]
+    ys = [math.log(tamanho) for _, tamanho in pontos]
+    media_x, media_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    variancia = sum((x - media_x) ** 2 for x in xs)
+    b = sum((x - media_x) * (y - media_y) for x, y in zip(xs, ys)) / variancia if variancia else 1.0
+    return math.exp(media_y - b * media_x), b
+
+
+def curva(tokens, ordens, fracoes=FRACOES_PREVISAO):
+    """
+    Bytes das duas representações em prefixos do corpus.
+
+    Prefixos, e não o corpus repetido: repetir o texto não cria contextos
+    novos e subestimaria o crescimento das tabelas.
+
+    Returns:
+        dict: 'dicionarios' e 'compacto' -> lista de (palavras, bytes)
+    """
+    pontos = {'dicionarios': [], 'compacto': []}
+    for fracao in fracoes:
+        prefixo = tokens[:max(int(len(tokens) * fracao), max(ordens))]
+        _, conjunto = medir_dicionarios(representacao_dicionarios(prefixo, ordens))
+        pontos['dicionarios'].append((len(prefixo), conjunto.total))
+        _, conjunto = medir_modelo(construir_modelo('prefixo', prefixo, ordens))
+        pontos['compacto'].append((len(prefixo), conjunto.total))
+    return pontos
+
+
+def prever(pontos, palavras):
+    """Bytes previstos para um corpus de `palavras` palavras, por representação (ver curva)."""
+    previsao = {}
+    for representacao, medidos in pontos.items():
+        a, b = ajustar(medidos)
+        previsao[representacao] = (a * palavras ** b, b)
+    return previsao
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede a memória das estruturas do modelo e prevê o RSS.")
+    parser.add_argument("corpus", nargs="?", default="alice", help="nome do corpus (padrão: alice)")
+    parser.add_argument("--palavras", type=int, default=None,
+                        help="tamanho de corpus para a previsão (padrão: 10 vezes o corpus)")
+    args = parser.parse_args()
+
+    corpora = listar_corpora()
+    if args.corpus not in corpora:
+        sys.exit(f"Corpus '{args.corpus}' desconhecido.")
+    arquivos = corpora[args.corpus]
+    ordens = range(2, 7)
+
+    def ler():
+        return tokenizar(preprocessar_texto(ler_arquivos(arquivos)))
+
+    # O RSS de cada representação é medido sem tracemalloc, que guarda
+    # dados próprios por alocação; as duas ficam vivas até o fim
+    rss_inicial = memoria_residente()
+    legado = representacao_dicionarios(ler(), ordens)
+    rss_legado = memoria_residente()
+    modelo = construir_modelo(args.corpus, ler(), ordens, impressao_fontes(arquivos))
+    rss_compacto = memoria_residente()
+    palavras = len(legado['tokens'])
+    print(f"{args.corpus}: {palavras:,} palavras, ordens {ordens.start}-{ordens.stop - 1}\n")
+
+    medidas = {}
+    for rotulo, chave, estruturas, medir, reconstruir, rss in (
+            ("Dicionários de listas (markov_model_alice_v3.py)", 'dicionarios', legado, medir_dicionarios,
+             lambda: representacao_dicionarios(ler(), ordens), (rss_inicial, rss_legado)),
+            ("Tabelas compactas (ModeloMarkov)", 'compacto', modelo, medir_modelo,
+             lambda: construir_modelo(args.corpus, ler(), ordens), (rss_legado, rss_compacto))):
+        inicio = time.perf_counter()
+        linhas, conjunto = medir(estruturas)
+        segundos = time.perf_counter() - inicio
+        imprimir(rotulo, linhas, conjunto)
+
+        _, alocados, maiores = rastrear(reconstruir)
+        print(f"  percorrido: {conjunto.total / 2**20:.2f} MB em {segundos:.2f}s; "
+              f"tracemalloc: {alocados / 2**20:.2f} MB retidos na construção", end='')
+        if None not in rss:
+            print(f"; RSS: +{(rss[1] - rss[0]) / 2**20:.2f} MB")
+        else:
+            print()
+        for diferenca in maiores:
+            quadro = diferenca.traceback[0]
+            print(f"    {diferenca.size_diff / 2**20:6.2f} MB em "
+                  f"{os.path.basename(quadro.filename)}:{quadro.lineno}")
+        print()
+        medidas[chave] = conjunto.total
+
+    # A previsão soma ao RSS do processo sem estruturas o tamanho previsto
+    # de cada representação; a fragmentação do alocador fica de fora
+    alvo = args.palavras or palavras * 10
+    pontos = curva(ler(), ordens)
+    print(f"Previsão para {alvo:,} palavras (bytes = a * palavras^b, "
+          f"ajustado em {len(FRACOES_PREVISAO)} prefixos do corpus):")
+    for chave, (previsto, expoente) in prever(pontos, alvo).items():
+        linha = f"  {chave:<12} b = {expoente:.3f}  estruturas: {previsto / 2**20:8.1f} MB"
+        if rss_inicial is not None:
+            linha += f"  RSS previsto: {(rss_inicial + previsto) / 2**20:8.1f} MB"
+        print(linha)
+    print(f"  (medido agora: dicionários {medidas['dicionarios'] / 2**20:.1f} MB, "
+          f"compacto {medidas['compacto'] / 2**20:.1f} MB, "
+          f"x{medidas['dicionarios'] / medidas['compacto']:.1f})")
+
+
+if __name__ == "__main__":
+    main()
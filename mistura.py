@@ -0,0 +1,359 @@
+"""
+Mistura ponderada de modelos por documento.
+
+Em vez de compilar um corpus com os livros concatenados (em que a
+proporção entre eles é fixada pelo tamanho de cada um), cada livro tem seu
+próprio modelo e a combinação é feita na hora do sorteio:
+
+    P(w | contexto) = soma_i  peso_i * P_i(w | contexto)
+
+com os pesos renormalizados entre os livros em que o contexto aparece.
+A linha combinada de cada contexto (sucessores em ordem decrescente de
+probabilidade e os acumulados) é calculada só quando o contexto é usado e
+fica em cache por vetor de pesos, de modo que mudar os pesos nunca
+reconstrói os modelos.
+
+Uso: python mistura.py [corpus] [--pesos 0.7 0.3] [--n 3] [--length 50]
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+from array import array
+from collections import Counter, OrderedDict
+from collections.abc import Mapping
+from itertools import accumulate
+
+from modelo import (acumular, construir_modelo, encontrar_palavras_interessantes,
+                    ler_tokens, listar_corpora, sortear_prefixo)
+
+# Contextos combinados mantidos em cache para cada vetor de pesos
+CONTEXTOS_EM_CACHE = 50_000
+
+# Vetores de pesos com cache mantido ao mesmo tempo
+VETORES_EM_CACHE = 4
+
+
+def documentos(nome, corpora=None):
+    """
+    Documentos do corpus, um por arquivo.
+
+    Arquivos que formam sozinhos um corpus conhecido (como maravilha e
+    espelho) têm o modelo servido pelo registro, com o nome desse corpus
+    como rótulo; os demais são rotulados pelo nome do arquivo.
+
+    Returns:
+        list: (rótulo, caminho, se o modelo vem do registro)
+    """
+    if corpora is None:
+        corpora = listar_corpora()
+    if nome not in corpora:
+        raise KeyError(f"Corpus '{nome}' desconhecido.")
+    individuais = {arquivos[0]: corpus for corpus, arquivos in corpora.items() if len(arquivos) == 1}
+
+    resultado = []
+    for caminho in corpora[nome]:
+        if caminho in individuais:
+            resultado.append((individuais[caminho], caminho, True))
+        else:
+            resultado.append((os.path.splitext(os.path.basename(caminho))[0], caminho, False))
+    return resultado
+
+
+def modelos_por_documento(nome, registro, corpora=None):
+    """
+    Um modelo para cada arquivo do corpus (ver documentos).
+
+    Os modelos servidos pelo registro vêm dele; os demais são compilados
+    na hora.
+
+    Returns:
+        dict: rótulo do documento -> modelo
+    """
+    modelos = {}
+    for rotulo, caminho, do_registro in documentos(nome, corpora):
+        if do_registro:
+            modelos[rotulo] = registro.obter(rotulo)
+        else:
+            modelos[rotulo] = construir_modelo(rotulo, list(ler_tokens((caminho,))))
+    return modelos
+
+
+class Mistura:
+    """
+    Componentes de uma mistura sobre um vocabulário comum.
+
+    Args:
+        modelos (dict): rótulo -> modelo (ModeloMarkov ou compatível)
+    """
+
+    def __init__(self, modelos):
+        self.modelos = modelos
+        self.rotulos = list(modelos)
+
+        # Vocabulário comum e tradução dos ids de cada componente
+        self.indice = {}
+        self.para_comum = {}
+        for rotulo, modelo in modelos.items():
+            self.para_comum[rotulo] = array('I', (self.indice.setdefault(palavra, len(self.indice))
+                                                  for palavra in modelo.vocabulario))
+        self.vocabulario = list(self.indice)
+        self.ordens = sorted(set.intersection(*(set(m.ordens) for m in modelos.values())))
+
+        tokens = array('I')
+        for rotulo, modelo in modelos.items():
+            traducao = self.para_comum[rotulo]
+            tokens.extend(traducao[i] for i in modelo.tokens)
+        self.tokens = tokens
+
+        frequencias = Counter(tokens)
+        contador = Counter({self.vocabulario[i]: freq for i, freq in frequencias.items()})
+        self.estatisticas = {
+            'total_palavras': len(tokens),
+            'palavras_unicas': len(contador),
+            'mais_frequentes': contador.most_common(50),
+            'contextos_por_ordem': ContextosPorOrdem(self),
+            'palavras_interessantes': encontrar_palavras_interessantes(contador),
+        }
+
+        self._caches = OrderedDict()
+        self._visoes = {}
+        self._lock = threading.Lock()
+
+    def _contar_contextos(self, ordem):
+        """Contextos distintos da ordem somando todos os componentes."""
+        tabelas = {rotulo: m.tabelas[ordem] for rotulo, m in self.modelos.items()}
+        if not all(hasattr(tabela, 'linhas') for tabela in tabelas.values()):
+            # Componentes sem índice de contextos em memória: limite inferior
+            return max(len(tabela) for tabela in tabelas.values())
+        contextos = set()
+        for rotulo, tabela in tabelas.items():
+            traducao = self.para_comum[rotulo]
+            contextos.update(tuple(traducao[i] for i in contexto) for contexto in tabela.linhas)
+        return len(contextos)
+
+    def normalizar(self, pesos):
+        """Converte os pesos (dict rótulo -> peso ou sequência) em uma tupla que soma 1."""
+        if isinstance(pesos, dict):
+            pesos = [pesos.get(rotulo, 0.0) for rotulo in self.rotulos]
+        pesos = [max(0.0, float(p)) for p in pesos]
+        if len(pesos) != len(self.rotulos) or not sum(pesos):
+            raise ValueError(f"Informe um peso positivo para algum de: {', '.join(self.rotulos)}")
+        total = sum(pesos)
+        return tuple(round(p / total, 6) for p in pesos)
+
+    def com_pesos(self, pesos):
+        """Modelo com a interface de ModeloMarkov para o vetor de pesos dado."""
+        pesos = self.normalizar(pesos)
+        with self._lock:
+            visao = self._visoes.get(pesos)
+            if visao is None:
+                visao = self._visoes[pesos] = ModeloMistura(self, pesos)
+            return visao
+
+    def _cache(self, pesos):
+        """Cache de linhas combinadas do vetor de pesos (LRU entre vetores)."""
+        cache = self._caches.get(pesos)
+        if cache is None:
+            cache = self._caches[pesos] = OrderedDict()
+            if len(self._caches) > VETORES_EM_CACHE:
+                antigo, _ = self._caches.popitem(last=False)
+                self._visoes.pop(antigo, None)
+        else:
+            self._caches.move_to_end(pesos)
+        return cache
+
+    def combinar(self, pesos, ordem, contexto):
+        """
+        Linha combinada de um contexto (tupla de ids comuns).
+
+        Returns:
+            tuple: (sucessores, probabilidades, acumulados, acumulados por
+                    temperatura), ou None se nenhum componente tem o contexto
+        """
+        chave = (ordem, contexto)
+        with self._lock:
+            cache = self._cache(pesos)
+            linha = cache.get(chave)
+            if linha is not None:
+                cache.move_to_end(chave)
+                return linha or None
+
+        palavras = [self.vocabulario[i] for i in contexto]
+        combinada = {}
+        massa = 0.0
+        for rotulo, peso in zip(self.rotulos, pesos):
+            modelo = self.modelos[rotulo]
+            tabela = modelo.tabelas.get(ordem)
+            ids = modelo.ids(palavras)
+            if not peso or tabela is None or ids is None:
+                continue
+            distribuicao = tabela.distribuicao(ids)
+            if distribuicao is None:
+                continue
+            sucessores, contagens = distribuicao
+            total = sum(contagens)
+            traducao = self.para_comum[rotulo]
+            for sucessor, contagem in zip(sucessores, contagens):
+                comum = traducao[sucessor]
+                combinada[comum] = combinada.get(comum, 0.0) + peso * contagem / total
+            massa += peso
+
+        if combinada:
+            itens = sorted(combinada.items(), key=lambda item: (-item[1], item[0]))
+            sucessores = tuple(sucessor for sucessor, _ in itens)
+            probabilidades = tuple(p / massa for _, p in itens)
+            linha = (sucessores, probabilidades, list(accumulate(probabilidades)), {})
+        else:
+            linha = ()  # Contextos ausentes também ficam no cache
+        with self._lock:
+            cache[chave] = linha
+            if len(cache) > CONTEXTOS_EM_CACHE:
+                cache.popitem(last=False)
+        return linha or None
+
+
+class ContextosPorOrdem(Mapping):
+    """
+    ordem n -> contextos distintos da mistura, contados na primeira consulta.
+
+    A contagem percorre a tabela da ordem em todos os componentes; feita
+    só para as ordens consultadas, não força a leitura das demais quando
+    os componentes as carregam sob demanda (ver TabelasSobDemanda).
+    """
+
+    def __init__(self, mistura):
+        self._mistura = mistura
+        self._contagens = {}
+
+    def __getitem__(self, ordem):
+        if ordem not in self._mistura.ordens:
+            raise KeyError(ordem)
+        if ordem not in self._contagens:
+            self._contagens[ordem] = self._mistura._contar_contextos(ordem)
+        return self._contagens[ordem]
+
+    def __iter__(self):
+        return iter(self._mistura.ordens)
+
+    def __len__(self):
+        return len(self._mistura.ordens)
+
+
+class TabelaMistura:
+    """Transições combinadas de uma ordem n, com a interface de TabelaNgramas."""
+
+    __slots__ = ('mistura', 'pesos', 'ordem')
+
+    def __init__(self, mistura, pesos, ordem):
+        self.mistura = mistura
+        self.pesos = pesos
+        self.ordem = ordem
+
+    def __len__(self):
+        return self.mistura.estatisticas['contextos_por_ordem'][self.ordem]
+
+    def __contains__(self, contexto):
+        return self.mistura.combinar(self.pesos, self.ordem, contexto) is not None
+
+    def distribuicao(self, contexto):
+        """Retorna (sucessores, probabilidades) do contexto, ou None se ele não existe."""
+        linha = self.mistura.combinar(self.pesos, self.ordem, contexto)
+        if linha is None:
+            return None
+        return linha[0], linha[1]
+
+    def escolher(self, contexto, rng=random):
+        """Sorteia um sucessor pela distribuição combinada."""
+        return self.escolher_controlado(contexto, rng)
+
+    def escolher_controlado(self, contexto, rng=random, temperatura=1.0, top_k=0, top_p=1.0):
+        """Sorteia um sucessor com temperatura, top-k e núcleo (top-p)."""
+        linha = self.mistura.combinar(self.pesos, self.ordem, contexto)
+        if linha is None:
+            return None
+        sucessores, probabilidades, acumulado, temperados = linha
+        if len(sucessores) == 1:
+            return sucessores[0]
+        if temperatura != 1.0:
+            acumulado = temperados.get(temperatura)
+            if acumulado is None:
+                acumulado = temperados[temperatura] = acumular((0, len(sucessores)), probabilidades,
+                                                               temperatura)
+        return sucessores[sortear_prefixo(acumulado, 0, len(sucessores), rng, top_k, top_p)]
+
+
+class ModeloMistura:
+    """
+    Mistura com um vetor de pesos fixo, com a interface de ModeloMarkov.
+
+    Não copia nada dos componentes: vocabulário, tokens e estatísticas são
+    os da Mistura, e as linhas combinadas ficam no cache do vetor de pesos.
+    """
+
+    def __init__(self, mistura, pesos):
+        self.mistura = mistura
+        self.pesos = pesos
+        self.nome = "+".join(f"{rotulo}:{peso:.0%}" for rotulo, peso in zip(mistura.rotulos, pesos))
+        self.vocabulario = mistura.vocabulario
+        self.indice = mistura.indice
+        self.tokens = mistura.tokens
+        self.estatisticas = mistura.estatisticas
+        self.tabelas = {ordem: TabelaMistura(mistura, pesos, ordem) for ordem in mistura.ordens}
+
+    @property
+    def ordens(self):
+        return sorted(self.tabelas)
+
+    def ids(self, palavras):
+        """Converte palavras em tupla de ids, ou None se alguma não está no vocabulário."""
+        try:
+            return tuple(self.indice[palavra] for palavra in palavras)
+        except KeyError:
+            return None
+
+    def palavras(self, ids=None):
+        """Converte ids em palavras (por padrão, o corpus inteiro)."""
+        if ids is None:
+            ids = self.tokens
+        vocabulario = self.vocabulario
+        return [vocabulario[i] for i in ids]
+
+    def escolher(self, ordem, contexto, rng=random, temperatura=1.0, top_k=0, top_p=1.0):
+        """Sorteia a palavra seguinte a um contexto de palavras na ordem dada."""
+        tabela = self.tabelas.get(ordem)
+        ids = self.ids(contexto)
+        if tabela is None or ids is None:
+            return None
+        proximo = tabela.escolher_controlado(ids, rng, temperatura, top_k, top_p)
+        return None if proximo is None else self.vocabulario[proximo]
+
+
+def main():
+    from lero import random_start, stream_text
+    from registro import RegistroModelos
+
+    parser = argparse.ArgumentParser(description="Gera texto com uma mistura ponderada dos livros do corpus.")
+    parser.add_argument("corpus", nargs="?", default="alice", help="nome do corpus (padrão: alice)")
+    parser.add_argument("--pesos", type=float, nargs="+", default=None,
+                        help="peso de cada documento, na ordem do corpus (padrão: iguais)")
+    parser.add_argument("--n", type=int, default=3, help="tamanho do n-grama (padrão: 3)")
+    parser.add_argument("--length", type=int, default=50, help="palavras por texto")
+    parser.add_argument("--seed", type=int, default=None, help="semente para resultados reprodutíveis")
+    args = parser.parse_args()
+
+    mistura = Mistura(modelos_por_documento(args.corpus, RegistroModelos()))
+    try:
+        modelo = mistura.com_pesos(args.pesos or [1.0] * len(mistura.rotulos))
+    except ValueError as e:
+        sys.exit(str(e))
+
+    rng = random.Random(args.seed)
+    print(f"Mistura {modelo.nome}, {len(mistura.vocabulario):,} palavras no vocabulário comum")
+    stream_text(modelo, random_start(modelo, rng, args.n), args.length, rng, n=args.n)
+
+
+if __name__ == "__main__":
+    main()
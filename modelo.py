@@ -0,0 +1,949 @@
+"""
+Modelo de Markov compilado.
+
+Em vez de um dicionário de listas com uma entrada por ocorrência, cada ordem
+guarda suas transições em formato compacto: as palavras viram ids inteiros
+(vocabulário) e os sucessores de cada contexto ficam em arrays contíguos
+com as respectivas contagens. O modelo é persistido em disco como artefato
+e pode ser recarregado sem reprocessar os textos.
+
+Na geração, o contexto é identificado por um hash de 64 bits dos ids,
+atualizado em O(1) a cada palavra a partir de um anel com as últimas n-1
+palavras, em vez de uma tupla nova por passo.
+
+No artefato, cada ordem fica em um bloco próprio depois dos metadados,
+para que um modelo possa ser carregado só com as ordens que forem usadas
+(ver TabelasSobDemanda).
+
+Com as fronteiras de frase do corpus (ver frases.py), o modelo guarda
+também, por ordem, os contextos que abrem frases e os que já as fecharam
+(IndiceFrases), para gerar frases completas sem tentativas.
+"""
+
+import io
+import os
+import pickle
+import random
+import re
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect, bisect_left
+from collections import Counter
+from collections.abc import Mapping
+from itertools import accumulate, chain
+
+PASTA_MODELOS = 'modelos'
+PASTA_CORPORA = 'data/corpora'
+VERSAO_FORMATO = 2
+
+# Hash polinomial de 64 bits dos contextos (tuplas de ids)
+PRIMO_HASH = 0x100000001B3
+MASCARA_64 = (1 << 64) - 1
+
+# Palavras relacionadas às fábulas da Alice, sugeridas como início do texto
+PALAVRAS_ALICE = [
+    'alice', 'coelho', 'chapeleiro', 'gato', 'rainha', 'rei', 'carta', 'cartas',
+    'chá', 'mesa', 'jardim', 'buraco', 'toca', 'relógio', 'tempo', 'mundo',
+    'país', 'maravilhas', 'espelho', 'sonho', 'dormindo', 'acordar',
+    'pequena', 'grande', 'crescer', 'diminuir', 'poção', 'beber', 'comer',
+    'porta', 'chave', 'curiosa', 'estranha', 'estranho', 'medo', 'coragem'
+]
+
+# Corpora disponíveis por padrão: nome -> arquivos de texto
+CORPORA = {
+    'alice': ('data/maravilha-limpo.txt', 'data/espelho-limpo.txt'),
+    'maravilha': ('data/maravilha-limpo.txt',),
+    'espelho': ('data/espelho-limpo.txt',),
+}
+
+
+def listar_corpora(pasta=PASTA_CORPORA):
+    """
+    Lista os corpora conhecidos.
+
+    Além dos corpora padrão, cada subpasta de `pasta` é um corpus formado
+    pelos seus arquivos .txt (por exemplo data/corpora/machado/*.txt).
+
+    Returns:
+        dict: nome do corpus -> tupla de caminhos dos arquivos
+    """
+    corpora = dict(CORPORA)
+    if os.path.isdir(pasta):
+        for nome in sorted(os.listdir(pasta)):
+            subpasta = os.path.join(pasta, nome)
+            if not os.path.isdir(subpasta):
+                continue
+            arquivos = tuple(sorted(
+                os.path.join(subpasta, arquivo)
+                for arquivo in os.listdir(subpasta) if arquivo.endswith('.txt')
+            ))
+            if arquivos:
+                corpora[nome] = arquivos
+    return corpora
+
+
+def ler_arquivos(arquivos):
+    """Lê os arquivos de texto e retorna o conteúdo combinado."""
+    textos = []
+    for caminho in arquivos:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            textos.append(f.read())
+    return " ".join(textos)
+
+
+def preprocessar_texto(texto):
+    """Preprocessa o texto removendo caracteres especiais e convertendo para minúsculas."""
+    if not texto:
+        return ""
+
+    # Remove quebras de linha excessivas e caracteres especiais
+    texto = re.sub(r'\n+', ' ', texto)
+    texto = re.sub(r'[^\w\s\.\!\?\,\;\:]', '', texto)
+
+    # Converte para minúsculas
+    texto = texto.lower()
+
+    # Remove espaços múltiplos
+    texto = re.sub(r'\s+', ' ', texto)
+
+    return texto.strip()
+
+
+def tokenizar(texto):
+    """Tokeniza o texto em palavras."""
+    return [token for token in texto.split() if token]
+
+
+def ler_tokens(arquivos):
+    """
+    Lê os arquivos linha a linha e produz os tokens preprocessados.
+
+    Equivale a tokenizar(preprocessar_texto(ler_arquivos(arquivos))), mas
+    sem manter o texto inteiro em memória.
+    """
+    for caminho in arquivos:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            for linha in f:
+                yield from tokenizar(preprocessar_texto(linha))
+
+
+def encontrar_palavras_interessantes(contador):
+    """Encontra palavras interessantes e relevantes para começar o texto, a partir das frequências."""
+    palavras_disponiveis = []
+    for palavra in PALAVRAS_ALICE:
+        if palavra in contador and contador[palavra] > 3:
+            palavras_disponiveis.append(palavra)
+
+    palavras_frequentes = [palavra for palavra, freq in contador.most_common(30)
+                           if len(palavra) > 3 and palavra.isalpha()]
+
+    todas_palavras = list(set(palavras_disponiveis + palavras_frequentes[:15]))
+
+    return sorted(todas_palavras)
+
+
+def calcular_estatisticas(ids, vocabulario, tabelas, top_k=50, frequencias=None):
+    """
+    Calcula as estatísticas do corpus durante a construção do modelo.
+
+    Args:
+        ids (array): Sequência do corpus como ids (não é lida se as
+            frequências forem dadas)
+        vocabulario (list): Palavras, indexadas pelo id
+        tabelas (dict): ordem n -> TabelaNgramas, ou ordem n -> número de
+            contextos quando as tabelas não estão em memória
+        top_k (int): Tamanho da tabela de palavras mais frequentes
+        frequencias (list): Frequência de cada id, se já foram contadas
+
+    Returns:
+        dict: total de palavras, palavras únicas, palavras mais frequentes
+              (lista de (palavra, frequência)), contextos únicos por ordem e
+              palavras interessantes para começar o texto
+    """
+    if frequencias is None:
+        contador = Counter()
+        for i, freq in Counter(ids).items():
+            contador[vocabulario[i]] = freq
+        total = len(ids)
+    else:
+        contador = Counter(dict(zip(vocabulario, frequencias)))
+        total = sum(frequencias)
+
+    return {
+        'total_palavras': total,
+        'palavras_unicas': len(contador),
+        'mais_frequentes': contador.most_common(top_k),
+        'contextos_por_ordem': {ordem: tabela if isinstance(tabela, int) else len(tabela)
+                                for ordem, tabela in tabelas.items()},
+        'palavras_interessantes': encontrar_palavras_interessantes(contador),
+    }
+
+
+def acumular(inicio, pesos, temperatura=1.0):
+    """
+    Acumula pesos^(1/temperatura) linha a linha, recomeçando em cada linha.
+
+    Args:
+        inicio (array): A linha i ocupa [inicio[i], inicio[i+1])
+        pesos (array): Peso de cada sucessor
+        temperatura (float): Abaixo de 1 concentra nos mais prováveis,
+            acima de 1 aproxima da distribuição uniforme
+    """
+    expoente = 1.0 / temperatura
+    acumulado = array('d')
+    for linha in range(len(inicio) - 1):
+        soma = 0.0
+        for i in range(inicio[linha], inicio[linha + 1]):
+            soma += pesos[i] ** expoente
+            acumulado.append(soma)
+    return acumulado
+
+
+def tamanho_acumulados(acumulados):
+    """Espaço ocupado por um dicionário temperatura -> pesos acumulados (ver acumular)."""
+    return sys.getsizeof(acumulados) + sum(sys.getsizeof(vetor) for vetor in acumulados.values())
+
+
+def sortear_prefixo(acumulado, a, b, rng=random, top_k=0, top_p=1.0):
+    """
+    Sorteia uma posição em [a, b) pelos pesos acumulados da linha.
+
+    Como os sucessores de cada linha estão em ordem decrescente de peso,
+    top-k e núcleo (top-p) são só prefixos da linha: o corte é achado por
+    busca binária nos acumulados, sem reordenar nada.
+
+    Args:
+        acumulado (sequence): Pesos acumulados, recomeçando em cada linha
+        a, b (int): Intervalo da linha
+        top_k (int): Considera só os k sucessores mais prováveis (0 = todos)
+        top_p (float): Considera só o menor prefixo com essa fração da massa
+    """
+    if top_k and top_k < b - a:
+        b = a + top_k
+    if top_p < 1.0:
+        b = min(b, bisect_left(acumulado, top_p * acumulado[b - 1], a, b - 1) + 1)
+    return bisect(acumulado, rng.random() * acumulado[b - 1], a, b - 1)
+
+
+def hash_contexto(contexto):
+    """Hash de 64 bits de um contexto (tupla de ids)."""
+    h = 0
+    for i in contexto:
+        h = (h * PRIMO_HASH + i + 1) & MASCARA_64
+    return h
+
+
+def potencia_saida(contexto_size):
+    """
+    Peso da palavra mais antiga no hash de um contexto com esse tamanho.
+
+    Ao trocar a palavra mais antiga `saindo` pela nova `entrando`, o hash
+    passa a ser ((h - (saindo + 1) * potencia) * PRIMO_HASH + entrando + 1),
+    mascarado em 64 bits: o mesmo que hash_contexto da janela nova.
+    """
+    return pow(PRIMO_HASH, contexto_size - 1, MASCARA_64 + 1)
+
+
+def impressao_fontes(arquivos):
+    """Retorna (caminho, mtime, tamanho) de cada arquivo, para detectar mudanças."""
+    impressao = []
+    for caminho in arquivos:
+        estado = os.stat(caminho)
+        impressao.append((caminho, estado.st_mtime_ns, estado.st_size))
+    return tuple(impressao)
+
+
+class TabelaNgramas:
+    """
+    Transições de uma ordem n em formato compacto.
+
+    `linhas` mapeia cada contexto (tupla de n-1 ids) para uma linha; os
+    sucessores da linha i ficam em sucessores[inicio[i]:inicio[i+1]], com as
+    contagens correspondentes, ordenados da maior para a menor contagem.
+
+    `por_hash`, quando existe, mapeia o hash de 64 bits de cada contexto
+    (ver hash_contexto) para a sua linha, ou para -1 se o hash não basta
+    para identificá-la; é montado na compilação (ver vetorizado.py) e
+    permite a gerar_ids avançar o contexto por hash rolante.
+    """
+
+    __slots__ = ('ordem', 'linhas', 'inicio', 'sucessores', 'contagens', '_acumulados', '_por_hash',
+                 '_bytes')
+
+    def __init__(self, ordem, linhas, inicio, sucessores, contagens, por_hash=None):
+        self.ordem = ordem
+        self.linhas = linhas
+        self.inicio = inicio
+        self.sucessores = sucessores
+        self.contagens = contagens
+        self._acumulados = {}
+        self._por_hash = por_hash
+        self._bytes = None
+
+    @classmethod
+    def construir(cls, ids, ordem):
+        """Conta os n-gramas da sequência de ids e monta a tabela da ordem dada."""
+        contagem = Counter(zip(*(ids[d:] for d in range(ordem))))
+        itens = sorted(contagem.items(), key=lambda item: (item[0][:-1], -item[1], item[0][-1]))
+
+        linhas = {}
+        inicio = array('I')
+        sucessores = array('I')
+        contagens = array('I')
+        for ngrama, quantidade in itens:
+            contexto = ngrama[:-1]
+            if contexto not in linhas:
+                linhas[contexto] = len(linhas)
+                inicio.append(len(sucessores))
+            sucessores.append(ngrama[-1])
+            contagens.append(quantidade)
+        inicio.append(len(sucessores))
+
+        return cls(ordem, linhas, inicio, sucessores, contagens)
+
+    @classmethod
+    def juntar(cls, ordem, partes):
+        """
+        Monta a tabela a partir das partes gravadas em sequência no artefato.
+
+        Cada parte é um (linhas, inicio, sucessores, contagens) com um lote
+        de linhas já na numeração da tabela inteira; a última traz também o
+        fim da última linha em `inicio`. Uma tabela gravada inteira (como
+        em ModeloMarkov.salvar) é uma parte só, seguida do índice por hash.
+        """
+        partes = iter(partes)
+        linhas, inicio, sucessores, contagens, *por_hash = next(partes)
+        for mais_linhas, mais_inicio, mais_sucessores, mais_contagens in partes:
+            linhas.update(mais_linhas)
+            inicio.extend(mais_inicio)
+            sucessores.extend(mais_sucessores)
+            contagens.extend(mais_contagens)
+        return cls(ordem, linhas, inicio, sucessores, contagens, *por_hash)
+
+    def __len__(self):
+        return len(self.linhas)
+
+    def __contains__(self, contexto):
+        return contexto in self.linhas
+
+    def distribuicao(self, contexto):
+        """Retorna (sucessores, contagens) do contexto, ou None se ele não existe."""
+        linha = self.linhas.get(contexto)
+        if linha is None:
+            return None
+        a, b = self.inicio[linha], self.inicio[linha + 1]
+        return self.sucessores[a:b], self.contagens[a:b]
+
+    def escolher(self, contexto, rng=random):
+        """Sorteia um sucessor do contexto proporcionalmente à contagem."""
+        linha = self.linhas.get(contexto)
+        if linha is None:
+            return None
+        a, b = self.inicio[linha], self.inicio[linha + 1]
+        if b - a == 1:
+            return self.sucessores[a]
+        return rng.choices(self.sucessores[a:b], weights=self.contagens[a:b])[0]
+
+    def acumulado(self, temperatura=1.0):
+        """
+        Pesos acumulados linha a linha sob a temperatura dada.
+
+        O peso de cada sucessor é contagem^(1/temperatura); o array é
+        calculado na primeira vez que a temperatura é usada e guardado.
+        """
+        acumulados = self._acumulados
+        if temperatura not in acumulados:
+            if len(acumulados) >= 8:
+                acumulados.pop(next(iter(acumulados)))
+            acumulados[temperatura] = acumular(self.inicio, self.contagens, temperatura)
+        return acumulados[temperatura]
+
+    def escolher_controlado(self, contexto, rng=random, temperatura=1.0, top_k=0, top_p=1.0):
+        """Sorteia um sucessor do contexto com temperatura, top-k e núcleo (top-p)."""
+        linha = self.linhas.get(contexto)
+        if linha is None:
+            return None
+        a, b = self.inicio[linha], self.inicio[linha + 1]
+        if b - a == 1:
+            return self.sucessores[a]
+        return self.sucessores[sortear_prefixo(self.acumulado(temperatura), a, b, rng, top_k, top_p)]
+
+    def indice_hash(self):
+        """Índice por hash dos contextos (ver a classe), ou None se a tabela não tem um."""
+        return self._por_hash
+
+    def gerar_ids(self, contexto, rng=random, temperatura=1.0, top_k=0, top_p=1.0):
+        """
+        Gera os ids seguintes ao contexto até chegar a um contexto sem sucessores.
+
+        O contexto inicial é conferido em `linhas`. Daí em diante cada janela
+        é um trecho do corpus (o contexto anterior mais um sucessor visto
+        depois dele), então o hash rolante só pode coincidir com o de outra
+        linha nos casos marcados no índice por hash, os únicos em que a
+        tupla da janela é montada. Sem o índice (tabelas de
+        TabelaNgramas.construir, de construir_externo ou de artefatos
+        antigos), o contexto avança como tupla. O sorteio consome o rng
+        como escolher e escolher_controlado: com a mesma semente, o texto
+        é o mesmo.
+
+        Args:
+            contexto (tuple): Ids do contexto inicial (n-1 ids)
+
+        Yields:
+            int: id de cada palavra gerada
+        """
+        contexto = tuple(contexto)
+        linha = self.linhas.get(contexto)
+        if linha is None:
+            return
+        exato = temperatura == 1.0 and not top_k and top_p >= 1.0
+        por_hash = self._por_hash
+        if por_hash is None:
+            while True:
+                if exato:
+                    proximo = self.escolher(contexto, rng)
+                else:
+                    proximo = self.escolher_controlado(contexto, rng, temperatura, top_k, top_p)
+                if proximo is None:
+                    return
+                yield proximo
+                contexto = contexto[1:] + (proximo,)
+
+        linhas, inicio, sucessores, contagens = self.linhas, self.inicio, self.sucessores, self.contagens
+        # Pesos acumulados da tabela inteira só com temperatura, top-k ou
+        # núcleo; no sorteio exato basta acumular a linha sorteada
+        acumulado = None if exato else self.acumulado(temperatura)
+        aleatorio = rng.random
+
+        # Janela das últimas n-1 palavras num anel; `posicao` é a mais antiga
+        anel = array('I', contexto)
+        tamanho = len(anel)
+        posicao = 0
+        h = hash_contexto(contexto)
+        potencia = potencia_saida(tamanho)
+
+        while True:
+            a, b = inicio[linha], inicio[linha + 1]
+            if b - a == 1:
+                proximo = sucessores[a]
+            elif exato:
+                # Como rng.choices(sucessores, weights=contagens) em escolher
+                pesos = list(accumulate(contagens[a:b]))
+                proximo = sucessores[a + bisect(pesos, aleatorio() * pesos[-1], 0, b - a - 1)]
+            else:
+                proximo = sucessores[sortear_prefixo(acumulado, a, b, rng, top_k, top_p)]
+            yield proximo
+
+            saindo = anel[posicao]
+            anel[posicao] = proximo
+            posicao += 1
+            if posicao == tamanho:
+                posicao = 0
+            h = ((h - (saindo + 1) * potencia) * PRIMO_HASH + proximo + 1) & MASCARA_64
+
+            linha = por_hash.get(h)
+            if linha is None:
+                return
+            if linha < 0:
+                linha = linhas.get(tuple(anel[posicao:]) + tuple(anel[:posicao]))
+                if linha is None:
+                    return
+
+    def tamanho_bytes(self):
+        """
+        Estimativa do espaço ocupado pela tabela em memória, com o índice
+        por hash e os pesos acumulados guardados até agora.
+
+        A parte fixa (estruturas e índice) é calculada uma vez; os pesos
+        acumulados, que aparecem com o uso, são contados a cada chamada.
+        """
+        if self._bytes is None:
+            total = sys.getsizeof(self.linhas)
+            for contexto in self.linhas:
+                total += sys.getsizeof(contexto)
+            for vetor in (self.inicio, self.sucessores, self.contagens):
+                total += sys.getsizeof(vetor)
+            if self._por_hash is not None:
+                total += sys.getsizeof(self._por_hash)
+                for h, linha in self._por_hash.items():
+                    total += sys.getsizeof(h) + sys.getsizeof(linha)
+            self._bytes = total
+        return self._bytes + tamanho_acumulados(self._acumulados)
+
+    def caches(self):
+        """Estruturas derivadas das contagens: pesos acumulados (montados sob demanda) e índice por hash."""
+        return self._acumulados, self._por_hash
+
+    def dados(self):
+        """Estruturas da tabela em tipos nativos, para persistência."""
+        return (self.linhas, self.inicio, self.sucessores, self.contagens)
+
+
+class IndiceFrases:
+    """
+    Fronteiras de frase de uma ordem n.
+
+    `inicios` são os contextos (tuplas de n-1 ids) que abrem frases no
+    corpus, do mais ao menos frequente, com as frequências acumuladas em
+    `acumulado_inicios`. `finais` mapeia cada contexto que já apareceu no
+    fim de uma frase (os que podem encerrar uma) para
+    (sucessores, vezes em que fecharam a frase, vezes em que apareceram
+    depois do contexto).
+    """
+
+    __slots__ = ('ordem', 'inicios', 'acumulado_inicios', 'finais')
+
+    def __init__(self, ordem, inicios, acumulado_inicios, finais):
+        self.ordem = ordem
+        self.inicios = inicios
+        self.acumulado_inicios = acumulado_inicios
+        self.finais = finais
+
+    @classmethod
+    def construir(cls, ids, fronteiras, tabela):
+        """
+        Indexa as frases do corpus para a ordem da tabela.
+
+        Args:
+            ids (array): Sequência do corpus como ids
+            fronteiras (sequence): Posições, em ordem crescente, dos tokens
+                que começam uma frase
+            tabela (TabelaNgramas): Tabela da ordem, de onde vêm as vezes
+                em que cada n-grama aparece no corpus
+        """
+        ordem = tabela.ordem
+        k = ordem - 1
+        total = len(ids)
+        # Só contextos com sucessor, isto é, linhas da tabela da ordem
+        inicios = Counter(tuple(ids[p:p + k]) for p in fronteiras if p + k < total)
+        # A frase que termina antes da posição p (ou no fim do corpus) fecha
+        # com o n-grama ids[p-n:p]
+        fins = Counter(tuple(ids[p - ordem:p]) for p in chain(fronteiras, (total,)) if p >= ordem)
+
+        ordenados = sorted(inicios.items(), key=lambda item: (-item[1], item[0]))
+        acumulado = array('I')
+        soma = 0
+        for _, frequencia in ordenados:
+            soma += frequencia
+            acumulado.append(soma)
+
+        finais = {}
+        for ngrama, vezes in sorted(fins.items(), key=lambda item: (item[0][:-1], -item[1], item[0][-1])):
+            sucessores, fechou, apareceu = finais.setdefault(ngrama[:-1], ([], [], []))
+            sucessores.append(ngrama[-1])
+            fechou.append(vezes)
+            seguintes, contagens = tabela.distribuicao(ngrama[:-1])
+            apareceu.append(contagens[seguintes.index(ngrama[-1])])
+        finais = {contexto: tuple(map(tuple, listas)) for contexto, listas in finais.items()}
+        return cls(ordem, [contexto for contexto, _ in ordenados], acumulado, finais)
+
+    def sortear_inicio(self, rng=random, primeira=None):
+        """
+        Sorteia um contexto inicial pela frequência com que abre frases.
+
+        Com `primeira` (um id), o sorteio fica entre os contextos que começam
+        por ele; se nenhum começa, entre todos.
+        """
+        inicios, acumulado = self.inicios, self.acumulado_inicios
+        if primeira is not None:
+            pares = [(contexto, acumulado[i] - (acumulado[i - 1] if i else 0))
+                     for i, contexto in enumerate(inicios) if contexto[0] == primeira]
+            if pares:
+                inicios = [contexto for contexto, _ in pares]
+                acumulado = list(accumulate(frequencia for _, frequencia in pares))
+        if not inicios:
+            return None
+        return inicios[bisect(acumulado, rng.random() * acumulado[-1])]
+
+    def fecha(self, contexto, proximo, rng=random):
+        """Sorteia se a palavra `proximo` depois do contexto fecha uma frase, pela proporção no corpus."""
+        final = self.finais.get(contexto)
+        if final is None:
+            return False
+        sucessores, fechou, apareceu = final
+        try:
+            i = sucessores.index(proximo)
+        except ValueError:
+            return False
+        return rng.random() * apareceu[i] < fechou[i]
+
+    def sortear_final(self, contexto, rng=random):
+        """Sorteia a palavra que fecha a frase depois do contexto, ou None se ele não encerra frases."""
+        final = self.finais.get(contexto)
+        if final is None:
+            return None
+        sucessores, fechou, _ = final
+        return sucessores[bisect(list(accumulate(fechou)), rng.random() * sum(fechou))]
+
+    def dados(self):
+        """Estruturas do índice em tipos nativos, para persistência."""
+        return (self.inicios, self.acumulado_inicios, self.finais)
+
+
+def ler_partes(dados):
+    """Objetos dos pickles gravados em sequência num bloco do artefato."""
+    fluxo = io.BytesIO(dados)
+    while fluxo.tell() < len(dados):
+        yield pickle.load(fluxo)
+
+
+def gravar_artefato(caminho, dados, blocos, bloco_tokens=None):
+    """
+    Grava um artefato no formato de ModeloMarkov.salvar (escrita atômica).
+
+    Os blocos já estão em arquivos (um ou mais pickles cada) e são copiados
+    para depois dos metadados aos pedaços, sem passar inteiros pela memória.
+
+    Args:
+        caminho (str): Artefato
+        dados (dict): Metadados; 'blocos' (e 'bloco_tokens') são preenchidos
+            aqui com a posição de cada bloco
+        blocos (dict): ordem -> arquivo com o bloco da tabela
+        bloco_tokens (str): Arquivo com os tokens em partes (array de ids),
+            quando eles não vêm em dados['tokens']
+    """
+    # Importado só aqui, como em salvar: só quem grava artefatos precisa dele
+    import shutil
+
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    arquivos = list(blocos.items())
+    if bloco_tokens is not None:
+        arquivos.append((None, bloco_tokens))
+    dados['blocos'] = {}
+    deslocamento = 0
+    for ordem, arquivo in arquivos:
+        tamanho = os.path.getsize(arquivo)
+        if ordem is None:
+            dados['bloco_tokens'] = (deslocamento, tamanho)
+        else:
+            dados['blocos'][ordem] = (deslocamento, tamanho)
+        deslocamento += tamanho
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'wb') as f:
+        pickle.dump(dados, f, protocol=pickle.HIGHEST_PROTOCOL)
+        for _, arquivo in arquivos:
+            with open(arquivo, 'rb') as bloco:
+                shutil.copyfileobj(bloco, f, 1 << 20)
+    os.replace(temporario, caminho)
+
+
+class TabelasSobDemanda(Mapping):
+    """
+    ordem n -> TabelaNgramas, lida do artefato no primeiro acesso.
+
+    As ordens disponíveis são conhecidas sem ler nenhuma tabela; cada uma é
+    lida do seu bloco no arquivo quando alguém a pede e fica residente
+    depois. O arquivo fica aberto até a última ordem ser lida, de modo que
+    um artefato substituído no disco não muda as tabelas de um modelo já
+    carregado.
+
+    Args:
+        caminho (str): Artefato do modelo
+        arquivo: Artefato aberto para leitura binária
+        base (int): Posição do primeiro bloco no arquivo
+        blocos (dict): ordem -> (deslocamento a partir de base, tamanho em bytes)
+        relatorio (callable): Recebe uma mensagem por ordem lida (padrão: nenhuma)
+    """
+
+    def __init__(self, caminho, arquivo, base, blocos, relatorio=None):
+        self.caminho = caminho
+        self.relatorio = relatorio or (lambda mensagem: None)
+        self.tempos = {}  # ordem -> segundos gastos na leitura
+        self._arquivo = arquivo
+        self._base = base
+        self._blocos = blocos
+        self._tabelas = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, ordem):
+        tabela = self._tabelas.get(ordem)
+        if tabela is None:
+            with self._lock:
+                tabela = self._tabelas.get(ordem)
+                if tabela is None:
+                    tabela = self._ler(ordem)
+        return tabela
+
+    def _ler(self, ordem):
+        deslocamento, tamanho = self._blocos[ordem]
+        inicio = time.perf_counter()
+        self._arquivo.seek(self._base + deslocamento)
+        tabela = TabelaNgramas.juntar(ordem, ler_partes(self._arquivo.read(tamanho)))
+        self._tabelas[ordem] = tabela
+        if len(self._tabelas) == len(self._blocos):
+            self._arquivo.close()
+        self.tempos[ordem] = time.perf_counter() - inicio
+        self.relatorio(f"{self.caminho}: ordem {ordem} carregada em "
+                       f"{self.tempos[ordem] * 1000:.1f} ms ({tamanho / 2**20:.1f} MB)")
+        return tabela
+
+    def __contains__(self, ordem):
+        return ordem in self._blocos
+
+    def __iter__(self):
+        return iter(self._blocos)
+
+    def __len__(self):
+        return len(self._blocos)
+
+    def residentes(self):
+        """Tabelas já lidas: ordem -> TabelaNgramas."""
+        return dict(self._tabelas)
+
+    def __del__(self):
+        self._arquivo.close()
+
+
+class ModeloMarkov:
+    """
+    Modelo de n-gramas de várias ordens sobre um vocabulário indexado.
+
+    Args:
+        nome (str): Nome do corpus
+        vocabulario (list): Palavras, indexadas pelo id
+        tokens (array): Sequência do corpus como ids
+        tabelas (dict): ordem n -> TabelaNgramas
+        fontes (tuple): Impressão dos arquivos de origem (ver impressao_fontes)
+        estatisticas (dict): Estatísticas do corpus (ver calcular_estatisticas);
+            calculadas na hora se não forem fornecidas
+        frases (dict): ordem n -> IndiceFrases, ou None se o corpus não foi
+            indexado por frases (ver indexar_frases)
+    """
+
+    def __init__(self, nome, vocabulario, tokens, tabelas, fontes=(), estatisticas=None, frases=None):
+        self.nome = nome
+        self.vocabulario = vocabulario
+        self.tokens = tokens
+        self.tabelas = tabelas
+        self.fontes = fontes
+        if estatisticas is None:
+            estatisticas = calcular_estatisticas(tokens, vocabulario, tabelas)
+        self.estatisticas = estatisticas
+        self.frases = frases
+        self.indice = {palavra: i for i, palavra in enumerate(vocabulario)}
+        # Bytes fora das tabelas, calculados uma vez
+        self._tamanho_bytes = None
+
+    @property
+    def ordens(self):
+        return sorted(self.tabelas)
+
+    def tabelas_residentes(self):
+        """Tabelas já em memória: todas, a não ser com TabelasSobDemanda."""
+        if isinstance(self.tabelas, TabelasSobDemanda):
+            return self.tabelas.residentes()
+        return self.tabelas
+
+    def indexar_frases(self, fronteiras):
+        """Monta o IndiceFrases de cada ordem a partir das posições dos começos de frase."""
+        self.frases = {ordem: IndiceFrases.construir(self.tokens, fronteiras, self.tabelas[ordem])
+                       for ordem in self.ordens}
+
+    def preparar(self, ordens):
+        """Carrega as tabelas das ordens dadas que existem no modelo, se ainda não estão em memória."""
+        for ordem in ordens:
+            if ordem in self.tabelas:
+                self.tabelas[ordem]
+
+    def ids(self, palavras):
+        """Converte palavras em tupla de ids, ou None se alguma não está no vocabulário."""
+        try:
+            return tuple(self.indice[palavra] for palavra in palavras)
+        except KeyError:
+            return None
+
+    def palavras(self, ids=None):
+        """Converte ids em palavras (por padrão, o corpus inteiro)."""
+        if ids is None:
+            ids = self.tokens
+        vocabulario = self.vocabulario
+        return [vocabulario[i] for i in ids]
+
+    def escolher(self, ordem, contexto, rng=random, temperatura=1.0, top_k=0, top_p=1.0):
+        """
+        Sorteia a palavra seguinte a um contexto de palavras na ordem dada.
+
+        Com os valores padrão o sorteio é proporcional às contagens; a
+        temperatura, top_k e top_p são repassados a escolher_controlado.
+        """
+        tabela = self.tabelas.get(ordem)
+        ids = self.ids(contexto)
+        if tabela is None or ids is None:
+            return None
+        if temperatura == 1.0 and not top_k and top_p >= 1.0:
+            proximo = tabela.escolher(ids, rng)
+        else:
+            proximo = tabela.escolher_controlado(ids, rng, temperatura, top_k, top_p)
+        return None if proximo is None else self.vocabulario[proximo]
+
+    def gerar_ids(self, ordem, contexto, rng=random, temperatura=1.0, top_k=0, top_p=1.0):
+        """Gera os ids seguintes ao contexto (tupla de ids) na ordem dada (ver TabelaNgramas.gerar_ids)."""
+        return self.tabelas[ordem].gerar_ids(contexto, rng, temperatura, top_k, top_p)
+
+    def tamanho_bytes(self):
+        """
+        Estimativa da memória ocupada pelo modelo, contando só as tabelas residentes.
+
+        Cada tabela guarda a conta das suas estruturas fixas; os pesos
+        acumulados que ela monta com o uso entram a cada chamada.
+        """
+        if self._tamanho_bytes is None:
+            total = sys.getsizeof(self.vocabulario) + sys.getsizeof(self.tokens)
+            total += sum(sys.getsizeof(palavra) for palavra in self.vocabulario)
+            total += sys.getsizeof(self.indice)
+            self._tamanho_bytes = total
+        return self._tamanho_bytes + sum(tabela.tamanho_bytes() for tabela in self.tabelas_residentes().values())
+
+    def salvar(self, caminho):
+        """
+        Persiste o modelo em disco (escrita atômica).
+
+        O arquivo começa com um pickle dos metadados e da posição de cada
+        ordem; depois vêm as tabelas, um bloco por ordem, que podem ser
+        lidas uma a uma (ver carregar_modelo). Aqui cada bloco é um pickle
+        só; construir_externo (em externo.py) grava os seus em partes.
+        """
+        dados = {
+            'versao': VERSAO_FORMATO,
+            'nome': self.nome,
+            'vocabulario': self.vocabulario,
+            'tokens': self.tokens,
+            'fontes': self.fontes,
+            'estatisticas': self.estatisticas,
+            'frases': None if self.frases is None else
+                      {ordem: indice.dados() for ordem, indice in self.frases.items()},
+        }
+        # Importado só aqui: quem só lê modelos prontos não precisa dele
+        import tempfile
+
+        # Cada ordem vai para um arquivo temporário ao lado do artefato: só o
+        # pickle de uma tabela fica em memória por vez
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with tempfile.TemporaryDirectory(prefix='blocos-', dir=pasta or None) as temporaria:
+            blocos = {}
+            for ordem, tabela in self.tabelas.items():
+                blocos[ordem] = os.path.join(temporaria, f"{ordem}.bloco")
+                estruturas = tabela.dados()
+                if isinstance(tabela, TabelaNgramas):
+                    estruturas += (tabela.indice_hash(),)
+                with open(blocos[ordem], 'wb') as f:
+                    pickle.dump(estruturas, f, protocol=pickle.HIGHEST_PROTOCOL)
+            gravar_artefato(caminho, dados, blocos)
+
+
+def construir_modelo(nome, tokens, ordens=range(2, 7), fontes=(), vetorizado=True):
+    """
+    Constrói um ModeloMarkov a partir de uma lista de palavras.
+
+    Args:
+        nome (str): Nome do corpus
+        tokens (list): Palavras do corpus, em ordem
+        ordens (iterable): Ordens n dos n-gramas a construir
+        fontes (tuple): Impressão dos arquivos de origem
+        vetorizado (bool): Conta os n-gramas com NumPy (ver vetorizado.py);
+            False usa um Counter de tuplas, com o mesmo resultado
+
+    Returns:
+        ModeloMarkov: modelo compilado
+    """
+    if vetorizado:
+        # Importado só aqui: carregar o NumPy atrasaria quem só lê modelos prontos
+        from vetorizado import construir_modelo_vetorizado
+        return construir_modelo_vetorizado(nome, tokens, ordens, fontes)
+
+    indice = {}
+    ids = array('I', (indice.setdefault(token, len(indice)) for token in tokens))
+    vocabulario = list(indice)
+    tabelas = {ordem: TabelaNgramas.construir(ids, ordem) for ordem in ordens}
+    return ModeloMarkov(nome, vocabulario, ids, tabelas, fontes)
+
+
+def construir_corpus(nome, ordens=range(2, 7), corpora=None):
+    """Lê, preprocessa e compila o corpus com o nome dado."""
+    if corpora is None:
+        corpora = listar_corpora()
+    if nome not in corpora:
+        raise KeyError(f"Corpus '{nome}' desconhecido.")
+    arquivos = corpora[nome]
+    # Cada arquivo é lido uma vez: os tokens servem também às fronteiras de frase
+    tokens_por_arquivo = [tokenizar(preprocessar_texto(ler_arquivos((caminho,)))) for caminho in arquivos]
+    tokens = list(chain.from_iterable(tokens_por_arquivo))
+    modelo = construir_modelo(nome, tokens, ordens, impressao_fontes(arquivos))
+
+    # Importado só aqui: frases.py usa a limpeza de limpa.py, que depende deste módulo
+    from frases import fronteiras_corpus
+    fronteiras, total = fronteiras_corpus(arquivos, tokens_por_arquivo)
+    if total == len(tokens):
+        modelo.indexar_frases(fronteiras)
+    return modelo
+
+
+def caminho_modelo(nome, pasta=PASTA_MODELOS):
+    """Caminho do artefato persistido de um corpus."""
+    return os.path.join(pasta, f"{nome}.pkl")
+
+
+def carregar_modelo(caminho, sob_demanda=False, relatorio=None):
+    """
+    Carrega um modelo persistido por ModeloMarkov.salvar.
+
+    Args:
+        caminho (str): Artefato do modelo
+        sob_demanda (bool): Lê cada ordem só no primeiro acesso (ver
+            TabelasSobDemanda); False lê todas agora
+        relatorio (callable): Recebe uma mensagem por ordem lida sob demanda
+    """
+    arquivo = open(caminho, 'rb')
+    try:
+        dados = pickle.load(arquivo)
+        # Artefatos de antes do índice de frases não têm a chave 'frases'
+        # (os sem frases indexadas a gravam como None): são recompilados
+        if dados.get('versao') != VERSAO_FORMATO or 'frases' not in dados:
+            raise ValueError(f"Formato de modelo incompatível em '{caminho}'.")
+        base = arquivo.tell()
+        if dados['tokens'] is None:
+            # Artefato de construir_externo: os tokens vêm em partes, depois das tabelas
+            deslocamento, tamanho = dados['bloco_tokens']
+            arquivo.seek(base + deslocamento)
+            dados['tokens'] = array('I')
+            for parte in ler_partes(arquivo.read(tamanho)):
+                dados['tokens'].extend(parte)
+        tabelas = TabelasSobDemanda(caminho, arquivo, base, dados['blocos'], relatorio)
+        if not sob_demanda:
+            tabelas = dict(tabelas)
+            arquivo.close()
+    except BaseException:
+        arquivo.close()
+        raise
+    frases = dados['frases']
+    if frases is not None:
+        frases = {ordem: IndiceFrases(ordem, *estruturas) for ordem, estruturas in frases.items()}
+    return ModeloMarkov(dados['nome'], dados['vocabulario'], dados['tokens'],
+                        tabelas, dados['fontes'], dados['estatisticas'], frases)
+
+
+def main():
+    """Compila e persiste os corpora passados na linha de comando (padrão: todos)."""
+    corpora = listar_corpora()
+    nomes = sys.argv[1:] or list(corpora)
+
+    for nome in nomes:
+        try:
+            modelo = construir_corpus(nome, corpora=corpora)
+        except (KeyError, FileNotFoundError) as e:
+            print(f"Erro ao construir '{nome}': {e}")
+            continue
+        caminho = caminho_modelo(nome)
+        modelo.salvar(caminho)
+        print(f"{nome}: {len(modelo.tokens):,} palavras, "
+              f"{modelo.tamanho_bytes() / 2**20:.1f} MB em memória -> {caminho}")
+
+
+if __name__ == "__main__":
+    main()
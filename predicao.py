@@ -0,0 +1,297 @@
+"""
+Previsão da próxima palavra (teclado preditivo / autocompletar).
+
+Dadas as últimas palavras digitadas, retorna as k palavras seguintes mais
+prováveis com suas probabilidades. Para cada contexto de cada ordem, a
+lista das palavras mais frequentes já vem pronta da construção (os
+sucessores das tabelas estão em ordem decrescente de contagem), então uma
+consulta é só a busca do contexto. Nas demais tabelas (banco SQLite,
+quantizadas, autômato, mistura) as listas saem de `distribuicao` na
+primeira consulta de cada contexto. Quando o contexto mais longo não existe
+ou tem menos de k sucessores, a busca recua para contextos mais curtos e,
+no fim, para as palavras mais frequentes do corpus.
+
+Se o texto não termina em espaço, a última palavra é tratada como um
+prefixo ainda incompleto e só entram sugestões que começam com ele.
+
+Uso: python predicao.py [corpus] [--texto "a rainha"] [--k 5] [--sessoes 200]
+"""
+
+import argparse
+import heapq
+import random
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from modelo import TabelaNgramas, preprocessar_texto, tokenizar
+from registro import RegistroModelos
+
+# Sugestões guardadas por contexto
+K_MAXIMO = 10
+
+# Prefixos com listas de palavras frequentes já prontas (até este tamanho)
+PREFIXO_CURTO = 3
+
+# Sucessores examinados por contexto ao filtrar por prefixo
+LIMITE_VARREDURA = 256
+
+
+class Preditor:
+    """
+    Sugestões de próxima palavra a partir de um modelo de n-gramas.
+
+    Args:
+        modelo: ModeloMarkov, ModeloSQLite ou outro modelo com a mesma
+            interface (as tabelas só precisam de `distribuicao`)
+        k_maximo (int): Sugestões guardadas por contexto
+    """
+
+    def __init__(self, modelo, k_maximo=K_MAXIMO):
+        self.modelo = modelo
+        self.k_maximo = k_maximo
+        self.indice = modelo.indice
+        self.ordens = sorted(modelo.tabelas, reverse=True)
+        self.maior_contexto = self.ordens[0] - 1 if self.ordens else 0
+
+        vocabulario = modelo.vocabulario
+        self.sugestoes = {}
+        # Ordens com as listas de todos os contextos prontas
+        self.completas = set()
+        for ordem in self.ordens:
+            tabela = modelo.tabelas[ordem]
+            if not isinstance(tabela, TabelaNgramas):
+                self.sugestoes[ordem] = {}
+                continue
+            inicio, sucessores, contagens = tabela.inicio, tabela.sucessores, tabela.contagens
+            listas = {}
+            for contexto, linha in tabela.linhas.items():
+                a, b = inicio[linha], inicio[linha + 1]
+                total = sum(contagens[a:b])
+                listas[contexto] = tuple(
+                    (vocabulario[sucessores[i]], contagens[i] / total)
+                    for i in range(a, min(b, a + k_maximo))
+                )
+            self.sugestoes[ordem] = listas
+            self.completas.add(ordem)
+
+        # Recuo final: frequências das palavras; para buscar por prefixo, o
+        # vocabulário em ordem alfabética e, para prefixos curtos (os que
+        # casam com mais palavras), as listas já prontas
+        frequencias = Counter(modelo.tokens)
+        total = len(modelo.tokens)
+        unigramas = sorted(((vocabulario[i], freq / total) for i, freq in frequencias.items()),
+                           key=lambda item: -item[1])
+        self.unigramas = tuple(unigramas[:k_maximo])
+        self.alfabetica = sorted(unigramas)
+        self.palavras_alfabeticas = [palavra for palavra, _ in self.alfabetica]
+        self.posto = array('I', bytes(4 * len(vocabulario)))
+        for posto, palavra in enumerate(self.palavras_alfabeticas):
+            self.posto[self.indice[palavra]] = posto
+        self.por_prefixo = {}
+        for palavra, probabilidade in unigramas:
+            for tamanho in range(1, min(len(palavra), PREFIXO_CURTO) + 1):
+                lista = self.por_prefixo.setdefault(palavra[:tamanho], [])
+                if len(lista) < k_maximo:
+                    lista.append((palavra, probabilidade))
+
+    def _lista(self, tabela, contexto):
+        """As k_maximo palavras seguintes mais frequentes do contexto, com probabilidades."""
+        distribuicao = tabela.distribuicao(contexto)
+        if distribuicao is None:
+            return None
+        sucessores, contagens = distribuicao
+        total = sum(contagens)
+        vocabulario, k_maximo = self.modelo.vocabulario, self.k_maximo
+        return tuple((vocabulario[sucessor], contagem / total) for sucessor, contagem
+                     in zip(sucessores[:k_maximo], contagens[:k_maximo]))
+
+    def _sugestoes(self, ordem, contexto):
+        """Lista de sugestões do contexto, montada na primeira consulta nas ordens sob demanda."""
+        listas = self.sugestoes[ordem]
+        if contexto in listas or ordem in self.completas:
+            return listas.get(contexto)
+        lista = listas[contexto] = self._lista(self.modelo.tabelas[ordem], contexto)
+        return lista
+
+    def _faixa(self, prefixo):
+        """Postos alfabéticos [a, b) das palavras que começam com o prefixo."""
+        a = bisect_left(self.palavras_alfabeticas, prefixo)
+        return a, bisect_left(self.palavras_alfabeticas, prefixo + '\uffff', a)
+
+    def _com_prefixo(self, ordem, contexto, faixa):
+        """Sucessores do contexto que começam com o prefixo, entre os LIMITE_VARREDURA mais frequentes."""
+        sucessores, contagens = self.modelo.tabelas[ordem].distribuicao(contexto)
+        primeiro, ultimo = faixa
+        posto = self.posto
+        total = None
+        for i in range(min(len(sucessores), LIMITE_VARREDURA)):
+            if primeiro <= posto[sucessores[i]] < ultimo:
+                if total is None:
+                    total = sum(contagens)
+                yield self.modelo.vocabulario[sucessores[i]], contagens[i] / total
+
+    def prever(self, texto, k=5):
+        """
+        Sugere as próximas palavras para o texto digitado.
+
+        Args:
+            texto (str): Texto digitado até agora
+            k (int): Número de sugestões
+
+        Returns:
+            list: (palavra, probabilidade, ordem) em ordem decrescente de
+                  preferência; `ordem` é o n do contexto que deu a sugestão
+                  (1 para as palavras mais frequentes do corpus)
+        """
+        palavras = tokenizar(preprocessar_texto(texto[-120:]))
+        prefixo = ''
+        if palavras and texto and not texto[-1].isspace():
+            prefixo = palavras.pop()
+        return self.prever_palavras(palavras[-self.maior_contexto:], k, prefixo)
+
+    def prever_palavras(self, palavras, k=5, prefixo=''):
+        """Como prever, a partir da lista de palavras já tokenizada."""
+        resultado = []
+        vistas = set()
+        if prefixo:
+            faixa = self._faixa(prefixo)
+
+        ids = []
+        for palavra in reversed(palavras):
+            i = self.indice.get(palavra)
+            if i is None:
+                break  # Só serve o trecho final conhecido pelo modelo
+            ids.append(i)
+        ids.reverse()
+
+        for ordem in self.ordens:
+            if ordem - 1 > len(ids):
+                continue
+            contexto = tuple(ids[len(ids) - ordem + 1:])
+            lista = self._sugestoes(ordem, contexto)
+            if lista is None:
+                continue
+            candidatas = lista
+            if prefixo:
+                candidatas = self._com_prefixo(ordem, contexto, faixa)
+            for palavra, probabilidade in candidatas:
+                if palavra not in vistas:
+                    vistas.add(palavra)
+                    resultado.append((palavra, probabilidade, ordem))
+                    if len(resultado) == k:
+                        return resultado
+
+        if prefixo in self.por_prefixo and len(self.por_prefixo[prefixo]) >= k + len(vistas):
+            candidatas = self.por_prefixo[prefixo]
+        elif prefixo:
+            a, b = faixa
+            candidatas = heapq.nlargest(k + len(vistas), self.alfabetica[a:b], key=lambda item: item[1])
+        else:
+            candidatas = self.unigramas
+        for palavra, probabilidade in candidatas:
+            if palavra not in vistas:
+                vistas.add(palavra)
+                resultado.append((palavra, probabilidade, 1))
+                if len(resultado) == k:
+                    break
+        return resultado
+
+
+def sessoes_digitacao(modelo, quantidade, palavras_por_sessao=12, semente=0):
+    """Trechos do corpus usados como sessões de digitação."""
+    rng = random.Random(semente)
+    for _ in range(quantidade):
+        inicio = rng.randrange(len(modelo.tokens) - palavras_por_sessao)
+        yield modelo.palavras(modelo.tokens[inicio:inicio + palavras_por_sessao])
+
+
+def simular(preditor, sessoes, k=5):
+    """
+    Reproduz as sessões tecla a tecla, consultando o preditor a cada tecla.
+
+    Uma palavra é considerada aceita assim que aparece entre as k
+    sugestões; as teclas que faltariam para digitá-la são economizadas.
+
+    Returns:
+        dict: latências das consultas (µs), acertos no início das palavras
+              e fração de teclas economizadas
+    """
+    latencias = []
+    palavras = acertos_inicio = acertos_primeira = 0
+    teclas_total = teclas_digitadas = 0
+    relogio = time.perf_counter
+
+    for sessao in sessoes:
+        texto = ''
+        for palavra in sessao:
+            palavras += 1
+            teclas_total += len(palavra) + 1
+            for posicao in range(len(palavra) + 1):
+                inicio = relogio()
+                sugestoes = preditor.prever(texto, k)
+                latencias.append((relogio() - inicio) * 1e6)
+
+                sugeridas = [s[0] for s in sugestoes]
+                if palavra in sugeridas:
+                    if posicao == 0:
+                        acertos_inicio += 1
+                        acertos_primeira += sugeridas[0] == palavra
+                    teclas_digitadas += posicao + 1  # Letras digitadas + o toque na sugestão
+                    break
+                if posicao < len(palavra):
+                    texto += palavra[posicao]
+            else:
+                teclas_digitadas += len(palavra) + 1
+            texto = texto[:len(texto) - len(texto.split(' ')[-1])] + palavra + ' '
+
+    latencias.sort()
+
+    def percentil(p):
+        return latencias[min(len(latencias) - 1, int(p / 100 * len(latencias)))]
+
+    return {
+        'consultas': len(latencias),
+        'p50': percentil(50),
+        'p95': percentil(95),
+        'p99': percentil(99),
+        'media': sum(latencias) / len(latencias),
+        'acerto_inicio': acertos_inicio / palavras,
+        'acerto_primeira': acertos_primeira / palavras,
+        'economia_teclas': 1 - teclas_digitadas / teclas_total,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sugere a próxima palavra e mede o preditor.")
+    parser.add_argument("corpus", nargs="?", default="alice", help="nome do corpus (padrão: alice)")
+    parser.add_argument("--texto", default=None, help="texto digitado para uma consulta avulsa")
+    parser.add_argument("--k", type=int, default=5, help="número de sugestões (padrão: 5)")
+    parser.add_argument("--sessoes", type=int, default=200,
+                        help="sessões de digitação simuladas no benchmark (padrão: 200)")
+    parser.add_argument("--semente", type=int, default=0, help="semente da escolha das sessões")
+    args = parser.parse_args()
+
+    modelo = RegistroModelos().obter(args.corpus)
+    inicio = time.perf_counter()
+    preditor = Preditor(modelo)
+    print(f"Listas de sugestões de '{args.corpus}' preparadas em {time.perf_counter() - inicio:.2f}s")
+
+    if args.texto is not None:
+        for palavra, probabilidade, ordem in preditor.prever(args.texto, args.k):
+            print(f"  {palavra:<20} {probabilidade:6.1%}  ({ordem}-grama)")
+        return
+
+    # As sessões saem do próprio corpus: a acurácia é otimista, a latência não
+    resultado = simular(preditor, sessoes_digitacao(modelo, args.sessoes, semente=args.semente), args.k)
+    print(f"{resultado['consultas']:,} consultas em {args.sessoes} sessões (k={args.k})")
+    print(f"  latência: média {resultado['media']:.1f} µs, p50 {resultado['p50']:.1f} µs, "
+          f"p95 {resultado['p95']:.1f} µs, p99 {resultado['p99']:.1f} µs")
+    print(f"  palavra certa entre as sugestões antes da 1ª letra: {resultado['acerto_inicio']:.1%} "
+          f"(em 1º lugar: {resultado['acerto_primeira']:.1%})")
+    print(f"  teclas economizadas: {resultado['economia_teclas']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Tabelas de probabilidade quantizadas.
+
+Para sortear o sucessor de um contexto não é preciso guardar as contagens
+exatas em inteiros de 32 bits: bastam limiares acumulados com poucos bits.
+Cada linha é reescalada para somar 2^bits - 1 (cada sucessor fica com pelo
+menos um quantum, para que nenhum fique com probabilidade zero) e os
+limiares acumulados são guardados em uint8 (até 8 bits) ou uint16 (até 16
+bits). Linhas com mais sucessores do que quanta disponíveis mantêm as
+contagens exatas.
+
+O relatório compara o tamanho com as contagens exatas e mede a divergência
+de Kullback-Leibler introduzida, ponderada pela frequência de cada contexto.
+
+Uso: python quantizado.py [corpus] [--bits 8 12 16] [--salvar]
+"""
+
+import argparse
+import math
+import os
+import pickle
+import random
+import sys
+from array import array
+from bisect import bisect
+from itertools import accumulate
+
+from modelo import (PASTA_MODELOS, VERSAO_FORMATO, ModeloMarkov, acumular,
+                    sortear_prefixo, tamanho_acumulados)
+from registro import RegistroModelos
+
+
+def quantizar_linha(contagens, bits):
+    """
+    Reescala as contagens de uma linha para somarem 2^bits - 1.
+
+    Usa o método dos maiores restos, com no mínimo um quantum por sucessor.
+
+    Returns:
+        list: pesos inteiros da linha, ou None se ela tem mais sucessores
+              do que quanta disponíveis
+    """
+    quanta = (1 << bits) - 1
+    if len(contagens) > quanta:
+        return None
+
+    total = sum(contagens)
+    alvos = [c * quanta / total for c in contagens]
+    pesos = [max(1, int(alvo)) for alvo in alvos]
+
+    sobra = quanta - sum(pesos)
+    if sobra > 0:
+        # Distribui o que falta pelos maiores restos
+        for i in sorted(range(len(pesos)), key=lambda i: pesos[i] - alvos[i])[:sobra]:
+            pesos[i] += 1
+    while sobra < 0:
+        # O mínimo de um quantum estourou o total: tira dos maiores pesos
+        i = max(range(len(pesos)), key=lambda i: pesos[i] - alvos[i] if pesos[i] > 1 else -math.inf)
+        pesos[i] -= 1
+        sobra += 1
+    return pesos
+
+
+class TabelaQuantizada:
+    """
+    Transições de uma ordem n com limiares quantizados, com a interface de TabelaNgramas.
+
+    `linhas`, `inicio` e `sucessores` são os mesmos da tabela exata; os
+    limiares acumulados da linha i ficam em limiares[inicio[i]:inicio[i+1]].
+    As linhas que não cabem na largura escolhida ficam em `largas`, com as
+    contagens exatas acumuladas.
+    """
+
+    __slots__ = ('ordem', 'linhas', 'inicio', 'sucessores', 'limiares', 'largas', 'bits', '_acumulados',
+                 '_bytes')
+
+    def __init__(self, ordem, linhas, inicio, sucessores, limiares, largas, bits):
+        self.ordem = ordem
+        self.linhas = linhas
+        self.inicio = inicio
+        self.sucessores = sucessores
+        self.limiares = limiares
+        self.largas = largas
+        self.bits = bits
+        self._acumulados = {}
+        self._bytes = None
+
+    @classmethod
+    def quantizar(cls, tabela, bits=8):
+        """Quantiza uma TabelaNgramas com a largura de bits dada (1 a 16)."""
+        if not 1 <= bits <= 16:
+            raise ValueError("bits deve estar entre 1 e 16")
+
+        limiares = array('B' if bits <= 8 else 'H')
+        largas = {}
+        for linha in range(len(tabela.inicio) - 1):
+            a, b = tabela.inicio[linha], tabela.inicio[linha + 1]
+            pesos = quantizar_linha(tabela.contagens[a:b], bits)
+            if pesos is None:
+                largas[linha] = array('I', accumulate(tabela.contagens[a:b]))
+                limiares.extend([0] * (b - a))
+            else:
+                limiares.extend(accumulate(pesos))
+
+        return cls(tabela.ordem, tabela.linhas, tabela.inicio, tabela.sucessores,
+                   limiares, largas, bits)
+
+    def __len__(self):
+        return len(self.linhas)
+
+    def __contains__(self, contexto):
+        return contexto in self.linhas
+
+    def pesos(self, linha):
+        """Pesos (não acumulados) dos sucessores da linha."""
+        a, b = self.inicio[linha], self.inicio[linha + 1]
+        acumulado = self.largas.get(linha) or self.limiares[a:b]
+        return [y - x for x, y in zip([0] + list(acumulado[:-1]), acumulado)]
+
+    def distribuicao(self, contexto):
+        """Retorna (sucessores, pesos quantizados) do contexto, ou None se ele não existe."""
+        linha = self.linhas.get(contexto)
+        if linha is None:
+            return None
+        a, b = self.inicio[linha], self.inicio[linha + 1]
+        return self.sucessores[a:b], self.pesos(linha)
+
+    def escolher(self, contexto, rng=random):
+        """Sorteia um sucessor do contexto pelos limiares quantizados."""
+        linha = self.linhas.get(contexto)
+        if linha is None:
+            return None
+        a, b = self.inicio[linha], self.inicio[linha + 1]
+        if b - a == 1:
+            return self.sucessores[a]
+        larga = self.largas.get(linha)
+        if larga is not None:
+            return self.sucessores[a + bisect(larga, rng.random() * larga[-1], 0, b - a - 1)]
+        limiares = self.limiares
+        return self.sucessores[bisect(limiares, rng.random() * limiares[b - 1], a, b - 1)]
+
+    def acumulado(self, temperatura=1.0):
+        """Pesos quantizados acumulados linha a linha sob a temperatura dada (calculados uma vez)."""
+        if temperatura not in self._acumulados:
+            if len(self._acumulados) >= 8:
+                self._acumulados.pop(next(iter(self._acumulados)))
+            pesos = array('I')
+            for linha in range(len(self.inicio) - 1):
+                pesos.extend(self.pesos(linha))
+            self._acumulados[temperatura] = acumular(self.inicio, pesos, temperatura)
+        return self._acumulados[temperatura]
+
+    def escolher_controlado(self, contexto, rng=random, temperatura=1.0, top_k=0, top_p=1.0):
+        """Sorteia um sucessor do contexto com temperatura, top-k e núcleo (top-p)."""
+        linha = self.linhas.get(contexto)
+        if linha is None:
+            return None
+        a, b = self.inicio[linha], self.inicio[linha + 1]
+        if b - a == 1:
+            return self.sucessores[a]
+        return self.sucessores[sortear_prefixo(self.acumulado(temperatura), a, b, rng, top_k, top_p)]
+
+    def tamanho_bytes(self):
+        """Estimativa do espaço ocupado pela tabela em memória, com os pesos acumulados guardados até agora."""
+        if self._bytes is None:
+            total = sys.getsizeof(self.linhas)
+            for contexto in self.linhas:
+                total += sys.getsizeof(contexto)
+            for vetor in (self.inicio, self.sucessores, self.limiares):
+                total += sys.getsizeof(vetor)
+            total += sys.getsizeof(self.largas) + sum(sys.getsizeof(v) for v in self.largas.values())
+            self._bytes = total
+        return self._bytes + tamanho_acumulados(self._acumulados)
+
+    def dados(self):
+        """Estruturas da tabela em tipos nativos, para persistência."""
+        return (self.linhas, self.inicio, self.sucessores, self.limiares, self.largas, self.bits)
+
+
+def divergencia(tabela, quantizada):
+    """
+    Divergência de Kullback-Leibler D(exata || quantizada), em bits.
+
+    Returns:
+        tuple: (média ponderada pela frequência dos contextos, maior valor
+                de uma linha)
+    """
+    soma = maior = 0.0
+    for linha in range(len(tabela.inicio) - 1):
+        a, b = tabela.inicio[linha], tabela.inicio[linha + 1]
+        if b - a == 1 or linha in quantizada.largas:
+            continue  # Distribuição preservada exatamente
+        contagens = tabela.contagens[a:b]
+        total = sum(contagens)
+        pesos = quantizada.pesos(linha)
+        total_q = sum(pesos)
+        kl = sum(c / total * math.log2((c / total) / (q / total_q)) for c, q in zip(contagens, pesos))
+        soma += total * kl
+        maior = max(maior, kl)
+    peso_total = sum(tabela.contagens)
+    return soma / peso_total, maior
+
+
+def quantizar_modelo(modelo, bits=8):
+    """Retorna um ModeloMarkov com as mesmas ordens e tabelas quantizadas."""
+    tabelas = {ordem: TabelaQuantizada.quantizar(tabela, bits) for ordem, tabela in modelo.tabelas.items()}
+    return ModeloMarkov(modelo.nome, modelo.vocabulario, modelo.tokens, tabelas,
+                        modelo.fontes, modelo.estatisticas)
+
+
+def caminho_quantizado(nome, bits, pasta=PASTA_MODELOS):
+    """Caminho do artefato quantizado de um corpus."""
+    return os.path.join(pasta, "quantizados", f"{nome}-q{bits}.pkl")
+
+
+def salvar_quantizado(modelo, caminho):
+    """Persiste um modelo quantizado (escrita atômica)."""
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    dados = {
+        'versao': VERSAO_FORMATO,
+        'quantizado': True,
+        'nome': modelo.nome,
+        'vocabulario': modelo.vocabulario,
+        'tokens': modelo.tokens,
+        'tabelas': {ordem: tabela.dados() for ordem, tabela in modelo.tabelas.items()},
+        'fontes': modelo.fontes,
+        'estatisticas': modelo.estatisticas,
+    }
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'wb') as f:
+        pickle.dump(dados, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporario, caminho)
+
+
+def carregar_quantizado(caminho):
+    """Carrega um modelo persistido por salvar_quantizado."""
+    with open(caminho, 'rb') as f:
+        dados = pickle.load(f)
+    if dados.get('versao') != VERSAO_FORMATO or not dados.get('quantizado'):
+        raise ValueError(f"Formato de modelo quantizado incompatível em '{caminho}'.")
+    tabelas = {ordem: TabelaQuantizada(ordem, *estruturas)
+               for ordem, estruturas in dados['tabelas'].items()}
+    return ModeloMarkov(dados['nome'], dados['vocabulario'], dados['tokens'],
+                        tabelas, dados['fontes'], dados['estatisticas'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantiza as tabelas de um modelo e mede a perda.")
+    parser.add_argument("corpus", nargs="?", default="alice", help="nome do corpus (padrão: alice)")
+    parser.add_argument("--bits", type=int, nargs="+", default=[4, 8, 12, 16],
+                        help="larguras dos limiares a comparar")
+    parser.add_argument("--salvar", action="store_true",
+                        help="persiste cada modelo quantizado em modelos/quantizados/<corpus>-q<bits>.pkl")
+    args = parser.parse_args()
+
+    modelo = RegistroModelos().obter(args.corpus)
+    contagens = sum(sys.getsizeof(t.contagens) for t in modelo.tabelas.values())
+    tabelas = sum(t.tamanho_bytes() for t in modelo.tabelas.values())
+    serializado = len(pickle.dumps({o: t.dados() for o, t in modelo.tabelas.items()},
+                                   protocol=pickle.HIGHEST_PROTOCOL))
+    print(f"Corpus '{args.corpus}', ordens {modelo.ordens[0]}-{modelo.ordens[-1]}")
+    print(f"Exato: contagens {contagens / 2**20:.2f} MB, tabelas {tabelas / 2**20:.1f} MB, "
+          f"serializado {serializado / 2**20:.1f} MB\n")
+
+    print(f"{'bits':>4} {'limiares':>9} {'tabelas':>8} {'serializado':>12} {'KL média':>10} "
+          f"{'KL máx.':>8} {'largas':>7}")
+    for bits in args.bits:
+        quantizado = quantizar_modelo(modelo, bits)
+        q_tabelas = quantizado.tabelas.values()
+        limiares = sum(sys.getsizeof(t.limiares) + sum(sys.getsizeof(v) for v in t.largas.values())
+                       for t in q_tabelas)
+        tamanho = sum(t.tamanho_bytes() for t in q_tabelas)
+        q_serializado = len(pickle.dumps({o: t.dados() for o, t in quantizado.tabelas.items()},
+                                         protocol=pickle.HIGHEST_PROTOCOL))
+        medias, maiores = zip(*(divergencia(modelo.tabelas[o], quantizado.tabelas[o])
+                                for o in modelo.ordens))
+        # Média ponderada pelo número de n-gramas de cada ordem
+        pesos = [sum(modelo.tabelas[o].contagens) for o in modelo.ordens]
+        media = sum(m * p for m, p in zip(medias, pesos)) / sum(pesos)
+        largas = sum(len(t.largas) for t in q_tabelas)
+        print(f"{bits:>4} {limiares / 2**20:>7.2f}MB {tamanho / 2**20:>6.1f}MB "
+              f"{q_serializado / 2**20:>10.1f}MB {media:>10.5f} {max(maiores):>8.4f} {largas:>7}")
+        print(f"{'':>4} ({contagens / limiares:.1f}x menos que as contagens, "
+              f"{1 - q_serializado / serializado:.0%} a menos serializado)")
+
+        if args.salvar:
+            caminho = caminho_quantizado(args.corpus, bits)
+            salvar_quantizado(quantizado, caminho)
+            print(f"{'':>4} -> {caminho}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+Registro de modelos por corpus.
+
+Carrega modelos sob demanda a partir dos artefatos persistidos em
+`modelos/` (ou, se existir, do banco SQLite `modelos/<corpus>.sqlite`,
+para corpora que não cabem em memória) e mantém residentes os usados mais recentemente, dentro de um
+limite de memória. Quando o limite é ultrapassado, o modelo usado há mais
+tempo é descartado (LRU). As tabelas de cada ordem são lidas do artefato
+só quando usadas pela primeira vez (ver TabelasSobDemanda), e o tempo de
+cada leitura vai para a saída de erros.
+
+Com `vigiar()`, uma thread verifica periodicamente se os textos de origem
+ou os artefatos dos modelos residentes mudaram. O modelo novo é compilado
+em outro processo e carregado em segundo plano, e só então substitui o
+antigo no registro; gerações em andamento terminam com o modelo que já
+tinham, que é liberado quando a última referência a ele cai.
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from banco import ModeloSQLite, caminho_banco, construir_banco
+from modelo import (PASTA_MODELOS, TabelasSobDemanda, caminho_modelo, carregar_modelo,
+                    construir_corpus, impressao_fontes, listar_corpora)
+
+# Limite padrão de memória para modelos residentes, em MB
+LIMITE_PADRAO_MB = int(os.environ.get('LERO_LIMITE_MEMORIA_MB', '256'))
+
+# Segundos entre as verificações de mudança nos textos e artefatos
+INTERVALO_VIGIA = float(os.environ.get('LERO_INTERVALO_RECARGA', '2'))
+
+# Processo que recompila um corpus; um interpretador novo não reimporta o
+# programa principal (o Streamlit, no caso do app)
+COMANDO_COMPILAR = ("import sys; from registro import _compilar; "
+                    "_compilar(sys.argv[1], sys.argv[2], sys.argv[3] == 'banco')")
+
+
+def _compilar(nome, caminho, banco):
+    """Recompila e persiste o corpus; executada em um processo separado."""
+    arquivos = listar_corpora()[nome]
+    if banco:
+        construir_banco(caminho, nome, arquivos).fechar()
+    else:
+        construir_corpus(nome).salvar(caminho)
+
+
+def _estado_arquivo(caminho):
+    """(mtime, tamanho) do arquivo, ou None se ele não existe."""
+    try:
+        estado = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    return estado.st_mtime_ns, estado.st_size
+
+
+class RegistroModelos:
+    """
+    Cache LRU de modelos indexado pelo nome do corpus.
+
+    Args:
+        pasta (str): Pasta dos artefatos persistidos
+        limite_bytes (int): Memória máxima ocupada pelos modelos residentes
+        construir_ausentes (bool): Compila e persiste o corpus se o artefato
+            ainda não existe
+        sob_demanda (bool): Lê cada ordem do artefato só no primeiro acesso
+    """
+
+    def __init__(self, pasta=PASTA_MODELOS, limite_bytes=LIMITE_PADRAO_MB * 2**20,
+                 construir_ausentes=True, sob_demanda=True):
+        self.pasta = pasta
+        self.limite_bytes = limite_bytes
+        self.construir_ausentes = construir_ausentes
+        self.sob_demanda = sob_demanda
+        self._modelos = OrderedDict()
+        self._carregando = {}  # nome -> Future da leitura em andamento
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.despejos = 0
+
+        # Recarga: versão e artefato de cada modelo carregado
+        self.versoes = {}
+        self.recargas = {}
+        self._artefatos = {}
+        self._vigia = None
+        self._parar = threading.Event()
+
+    def listar(self):
+        """Nomes dos corpora disponíveis (com artefato persistido ou fonte conhecida)."""
+        nomes = set(listar_corpora())
+        if os.path.isdir(self.pasta):
+            nomes.update(os.path.splitext(arquivo)[0] for arquivo in os.listdir(self.pasta)
+                         if arquivo.endswith(('.pkl', '.sqlite')))
+        return sorted(nomes)
+
+    def obter(self, nome):
+        """
+        Retorna o modelo do corpus, carregando-o se não estiver residente.
+
+        A leitura (ou compilação) roda fora do lock do registro, de modo que
+        um corpus frio não atrasa quem pede modelos já residentes. Pedidos
+        do mesmo corpus durante a leitura esperam por ela em vez de repeti-la.
+
+        Raises:
+            KeyError: Se não há artefato nem fonte para o corpus
+        """
+        with self._lock:
+            modelo = self._modelos.get(nome)
+            if modelo is not None:
+                self._modelos.move_to_end(nome)
+                self.acertos += 1
+                return modelo
+
+            futuro = self._carregando.get(nome)
+            if futuro is None:
+                self.falhas += 1
+                futuro = self._carregando[nome] = Future()
+                carregar = True
+            else:
+                carregar = False
+
+        if not carregar:
+            return futuro.result()
+
+        try:
+            modelo, estado = self._ler_artefato(nome)
+        except BaseException as e:
+            with self._lock:
+                del self._carregando[nome]
+            futuro.set_exception(e)
+            raise
+
+        with self._lock:
+            self._modelos[nome] = modelo
+            self._artefatos[nome] = estado
+            self.versoes[nome] = self.versoes.get(nome, 0) + 1
+            self._despejar()
+            del self._carregando[nome]
+        futuro.set_result(modelo)
+        return modelo
+
+    def _artefato(self, nome):
+        """Caminho do artefato servido para o corpus e se ele é um banco SQLite."""
+        banco = caminho_banco(nome, self.pasta)
+        if os.path.exists(banco):
+            return banco, True
+        return caminho_modelo(nome, self.pasta), False
+
+    def _ler_artefato(self, nome):
+        """
+        Lê o modelo do artefato do corpus, compilando-o se preciso.
+
+        O estado do artefato é tomado antes da leitura: se ele for
+        substituído durante a leitura, o estado guardado é o antigo e a
+        vigia ainda vê a mudança.
+
+        Returns:
+            tuple: (modelo, estado do artefato lido; ver _estado_arquivo)
+        """
+        banco = caminho_banco(nome, self.pasta)
+        estado = _estado_arquivo(banco)
+        if estado is not None:
+            return ModeloSQLite(banco), estado
+
+        caminho = caminho_modelo(nome, self.pasta)
+        estado = _estado_arquivo(caminho)
+        if estado is not None:
+            try:
+                return carregar_modelo(caminho, self.sob_demanda,
+                                       lambda mensagem: print(mensagem, file=sys.stderr)), estado
+            except ValueError:
+                # Artefato de um formato antigo: recompila se permitido
+                if not self.construir_ausentes:
+                    raise
+        elif not self.construir_ausentes:
+            raise KeyError(f"Modelo '{nome}' não encontrado em '{self.pasta}'.")
+        modelo = construir_corpus(nome)
+        modelo.salvar(caminho)
+        return modelo, _estado_arquivo(caminho)
+
+    def desatualizado(self, nome, modelo):
+        """
+        Motivo para recarregar o modelo residente, ou None se ele está em dia.
+
+        Returns:
+            str: 'fontes' se os textos do corpus mudaram (é preciso
+                 recompilar) ou 'artefato' se o arquivo do modelo foi
+                 substituído (basta recarregar)
+        """
+        arquivos = listar_corpora().get(nome)
+        if arquivos and modelo.fontes:
+            try:
+                if impressao_fontes(arquivos) != tuple(modelo.fontes):
+                    return 'fontes'
+            except FileNotFoundError:
+                pass  # Texto removido: continua servindo o modelo atual
+        caminho, _ = self._artefato(nome)
+        if _estado_arquivo(caminho) != self._artefatos.get(nome):
+            return 'artefato'
+        return None
+
+    def recarregar(self, nome, motivo='artefato'):
+        """
+        Monta o modelo novo sem bloquear o registro e o troca pelo atual.
+
+        Args:
+            nome (str): Corpus a recarregar
+            motivo (str): 'fontes' recompila em outro processo antes de carregar
+        """
+        inicio = time.perf_counter()
+        caminho, banco = self._artefato(nome)
+        if motivo == 'fontes':
+            # A compilação roda em outro processo para não disputar o GIL com
+            # as gerações; o artefato é substituído atomicamente no fim
+            pasta_codigo = os.path.dirname(os.path.abspath(__file__))
+            ambiente = dict(os.environ, PYTHONPATH=os.pathsep.join(
+                filter(None, (pasta_codigo, os.environ.get('PYTHONPATH')))))
+            subprocess.run([sys.executable, '-c', COMANDO_COMPILAR, nome, os.path.abspath(caminho),
+                            'banco' if banco else 'pickle'],
+                           env=ambiente, check=True, capture_output=True)
+        novo, estado = self._ler_artefato(nome)
+
+        with self._lock:
+            if nome in self._modelos:
+                self._modelos[nome] = novo  # Mantém a posição no LRU
+            self._artefatos[nome] = estado
+            self.versoes[nome] = self.versoes.get(nome, 0) + 1
+            self.recargas[nome] = {
+                'versao': self.versoes[nome],
+                'motivo': motivo,
+                'segundos': time.perf_counter() - inicio,
+                'quando': time.time(),
+            }
+            self._despejar()
+        return novo
+
+    def verificar(self):
+        """Recarrega os modelos residentes desatualizados; retorna os nomes recarregados."""
+        with self._lock:
+            residentes = list(self._modelos.items())
+        recarregados = []
+        for nome, modelo in residentes:
+            motivo = self.desatualizado(nome, modelo)
+            if motivo is not None:
+                self.recarregar(nome, motivo)
+                recarregados.append(nome)
+        return recarregados
+
+    def vigiar(self, intervalo=INTERVALO_VIGIA):
+        """Inicia (uma vez) a thread que verifica mudanças a cada `intervalo` segundos."""
+        if self._vigia is not None:
+            return
+
+        def laco():
+            while not self._parar.wait(intervalo):
+                try:
+                    self.verificar()
+                except Exception as e:  # Uma recarga falha não derruba a vigia
+                    print(f"Falha ao recarregar modelos: {e}", file=sys.stderr)
+
+        self._vigia = threading.Thread(target=laco, name='vigia-modelos', daemon=True)
+        self._vigia.start()
+
+    def parar(self):
+        """Encerra a thread de vigia."""
+        self._parar.set()
+        if self._vigia is not None:
+            self._vigia.join()
+            self._vigia = None
+
+    def _despejar(self):
+        # Chamada com o lock; mantém pelo menos o modelo recém-carregado,
+        # mesmo acima do limite
+        while len(self._modelos) > 1 and self._memoria(self._modelos.values()) > self.limite_bytes:
+            self._modelos.popitem(last=False)
+            self.despejos += 1
+
+    @staticmethod
+    def _memoria(modelos):
+        return sum(modelo.tamanho_bytes() for modelo in modelos)
+
+    def memoria_bytes(self):
+        """Memória estimada ocupada pelos modelos residentes."""
+        with self._lock:
+            modelos = list(self._modelos.values())
+        return self._memoria(modelos)
+
+    def residentes(self):
+        """Nomes dos modelos residentes, do menos para o mais recente."""
+        with self._lock:
+            return list(self._modelos)
+
+    def ordens_carregadas(self):
+        """Segundos gastos na leitura de cada ordem já lida sob demanda: corpus -> {ordem: segundos}."""
+        with self._lock:
+            residentes = list(self._modelos.items())
+        return {nome: dict(modelo.tabelas.tempos) for nome, modelo in residentes
+                if isinstance(modelo.tabelas, TabelasSobDemanda)}
+
+    def estatisticas(self):
+        """Contadores de acertos, falhas e despejos, e ocupação atual."""
+        with self._lock:
+            modelos = list(self._modelos.values())
+            estatisticas = {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'despejos': self.despejos,
+                'residentes': len(modelos),
+                'limite_bytes': self.limite_bytes,
+                'versoes': dict(self.versoes),
+                'recargas': dict(self.recargas),
+            }
+        estatisticas['memoria_bytes'] = self._memoria(modelos)
+        estatisticas['ordens'] = self.ordens_carregadas()
+        return estatisticas
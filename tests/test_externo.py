@@ -0,0 +1,66 @@
+"""Construção fora da memória (externo.py) comparada com a construção em memória."""
+
+import random
+
+import pytest
+
+import externo
+from modelo import (TabelaNgramas, carregar_modelo, construir_modelo, ler_arquivos,
+                    ler_partes, preprocessar_texto, tokenizar)
+
+ORDENS = (2, 3, 4)
+
+
+@pytest.fixture
+def arquivos(tmp_path):
+    rng = random.Random(0)
+    vocabulario = [f"palavra{i}" for i in range(150)]
+    caminhos = []
+    for nome in ("um.txt", "dois.txt"):
+        # Palavras frequentes e raras, para linhas com um e com muitos sucessores
+        palavras = rng.choices(vocabulario, weights=range(150, 0, -1), k=3000)
+        caminho = tmp_path / nome
+        caminho.write_text("\n".join(" ".join(palavras[i:i + 12]) for i in range(0, len(palavras), 12)),
+                           encoding="utf-8")
+        caminhos.append(str(caminho))
+    return tuple(caminhos)
+
+
+@pytest.mark.parametrize("sob_demanda", (False, True))
+def test_orcamento_minimo_igual_ao_construtor_em_memoria(arquivos, tmp_path, monkeypatch, sob_demanda):
+    despejos = []
+    despejar = externo.ContadorExterno.despejar
+    monkeypatch.setattr(externo.ContadorExterno, "despejar",
+                        lambda self: (despejos.append(self.memoria), despejar(self))[1])
+
+    caminho = str(tmp_path / "externo.pkl")
+    estatisticas = externo.construir_externo("teste", arquivos, caminho, ORDENS,
+                                             limite_bytes=32 * 1024, linhas_por_parte=100)
+    assert len(despejos) > 10
+
+    modelo = carregar_modelo(caminho, sob_demanda=sob_demanda)
+    tokens = tokenizar(preprocessar_texto(ler_arquivos(arquivos)))
+    for vetorizado in (True, False):
+        referencia = construir_modelo("teste", tokens, ORDENS, vetorizado=vetorizado)
+        assert modelo.vocabulario == referencia.vocabulario
+        assert modelo.tokens == referencia.tokens
+        assert estatisticas == modelo.estatisticas == referencia.estatisticas
+        for ordem in ORDENS:
+            assert modelo.tabelas[ordem].dados() == referencia.tabelas[ordem].dados()
+
+
+def test_tabela_em_partes(tmp_path):
+    ngramas = sorted({(a, b, c): 1 + (a * b + c) % 5
+                      for a in range(12) for b in range(12) for c in range(0, 12, 1 + a % 3)}.items())
+    caminho = tmp_path / "bloco"
+    with open(caminho, "wb") as f:
+        contextos = externo.gravar_tabela(iter(ngramas), f, linhas_por_parte=7)
+    assert contextos == 144
+
+    partes = list(ler_partes(caminho.read_bytes()))
+    assert len(partes) == 21
+    tabela = TabelaNgramas.juntar(3, partes)
+    assert len(tabela.inicio) == contextos + 1
+    for (a, b, c), quantidade in ngramas:
+        sucessores, contagens = tabela.distribuicao((a, b))
+        assert contagens[list(sucessores).index(c)] == quantidade
@@ -0,0 +1,81 @@
+"""Geração de palavras com cada representação do modelo (ver lero.iter_words)."""
+
+import random
+
+import pytest
+
+import lero
+from automato import compactar
+from banco import ModeloSQLite, construir_banco
+from modelo import carregar_modelo, construir_modelo
+from quantizado import quantizar_modelo
+
+TEXTO = ("a rainha gritou cortem a cabeça dela e alice olhou para o gato "
+         "o gato sorriu para alice e a rainha olhou para o gato de novo "
+         "alice disse que o gato sorriu e a rainha gritou de novo ") * 3
+
+ORDENS = (2, 3, 4)
+
+
+@pytest.fixture(scope="module")
+def modelo():
+    return construir_modelo("teste", TEXTO.split(), ORDENS)
+
+
+def _representacoes(modelo, pasta):
+    caminho = pasta / "teste.pkl"
+    modelo.salvar(str(caminho))
+    arquivo = pasta / "teste.txt"
+    arquivo.write_text(TEXTO, encoding="utf-8")
+    return {
+        "exato": modelo,
+        "sob demanda": carregar_modelo(str(caminho), sob_demanda=True),
+        "autômato": compactar(modelo),
+        "quantizado 8 bits": quantizar_modelo(modelo, 8),
+        "quantizado 2 bits": quantizar_modelo(modelo, 2),
+        "sqlite": construir_banco(str(pasta / "teste.db"), "teste", (str(arquivo),), ORDENS),
+    }
+
+
+@pytest.mark.parametrize("n", ORDENS)
+def test_todas_as_representacoes_geram_palavras(modelo, tmp_path, n):
+    vocabulario = set(modelo.vocabulario)
+    for nome, representacao in _representacoes(modelo, tmp_path).items():
+        for controle in ({}, {"temperature": 0.7, "top_k": 3, "top_p": 0.9}):
+            rng = random.Random(0)
+            inicio = lero.random_start(representacao, rng, n)
+            palavras = list(lero.iter_words(representacao, inicio, 12, rng, n, **controle))
+            assert len(palavras) > n, nome
+            assert set(palavras) <= vocabulario, nome
+        if isinstance(representacao, ModeloSQLite):
+            representacao.fechar()
+
+
+def test_mesma_semente_mesmo_texto(modelo):
+    # O autômato sorteia pelos mesmos pesos que a tabela exata
+    for n in ORDENS:
+        inicio = lero.random_start(modelo, random.Random(1), n)
+        exato = list(lero.iter_words(modelo, inicio, 30, random.Random(2), n))
+        compacto = list(lero.iter_words(compactar(modelo), inicio, 30, random.Random(2), n))
+        assert exato == compacto
+
+
+def test_indice_hash_mesmo_texto(modelo):
+    # Com o índice por hash (construtor vetorizado) ou sem ele (Counter de
+    # tuplas), a geração consome o rng da mesma forma
+    sem_indice = construir_modelo("teste", TEXTO.split(), ORDENS, vetorizado=False)
+    for n in ORDENS:
+        assert modelo.tabelas[n].indice_hash() is not None
+        assert sem_indice.tabelas[n].indice_hash() is None
+        for controle in ({}, {"temperature": 0.7, "top_k": 3, "top_p": 0.9}):
+            inicio = lero.random_start(modelo, random.Random(1), n)
+            com = list(lero.iter_words(modelo, inicio, 40, random.Random(2), n, **controle))
+            sem = list(lero.iter_words(sem_indice, inicio, 40, random.Random(2), n, **controle))
+            assert com == sem
+
+
+def test_tamanho_conta_caches():
+    modelo = construir_modelo("teste", TEXTO.split(), ORDENS)
+    antes = modelo.tamanho_bytes()
+    modelo.tabelas[3].acumulado(0.5)
+    assert modelo.tamanho_bytes() > antes
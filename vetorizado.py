@@ -0,0 +1,266 @@
+"""
+Contagem de n-gramas vetorizada com NumPy.
+
+O construtor em memória (TabelaNgramas.construir) passa cada n-grama do
+corpus, como tupla, por um Counter. Aqui o corpus vira um array de ids e
+as janelas de cada ordem são vistas de uma vez com sliding_window_view,
+sem cópias. Cada n-grama é reduzido a um inteiro: o posto do seu prefixo
+de n-1 ids entre os (n-1)-gramas distintos, vezes o tamanho do
+vocabulário, mais o último id. Ordenar esses inteiros dá os n-gramas
+distintos em ordem lexicográfica, as contagens (o tamanho de cada grupo
+de iguais) e os postos usados como prefixo na ordem seguinte, de modo
+que cada ordem custa uma ordenação, qualquer que seja n.
+
+As tabelas são idênticas às do construtor em memória, e cada uma sai já
+com o índice por hash dos contextos usado na geração (ver
+TabelaNgramas.gerar_ids), calculado aqui sobre a matriz de contextos.
+
+Uso: python vetorizado.py [corpus] [--replicar K] [--verificar]
+"""
+
+import argparse
+import sys
+import time
+from array import array
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from modelo import (PRIMO_HASH, ModeloMarkov, TabelaNgramas, calcular_estatisticas,
+                    hash_contexto, impressao_fontes, ler_arquivos, listar_corpora,
+                    preprocessar_texto, tokenizar)
+
+
+def codificar(tokens):
+    """
+    Ids das palavras na ordem da primeira aparição, como em construir_modelo.
+
+    Returns:
+        tuple: (vocabulário, ids do corpus em np.ndarray uint32)
+    """
+    vocabulario = list(dict.fromkeys(tokens))
+    indice = {palavra: i for i, palavra in enumerate(vocabulario)}
+    ids = np.fromiter(map(indice.__getitem__, tokens), dtype=np.uint32, count=len(tokens))
+    return vocabulario, ids
+
+
+def _ordenar(chaves, posicoes, quase_ordenadas=False):
+    """
+    Ordena as chaves levando junto a posição de cada uma no corpus.
+
+    Quando cabe em 63 bits, a posição vai nos bits baixos da própria chave
+    e basta um np.sort, bem mais rápido que np.argsort. Chaves já
+    ordenadas por grupos (a partir da segunda ordem) usam a ordenação
+    estável, que aproveita os trechos em ordem.
+    """
+    tipo = 'stable' if quase_ordenadas else 'quicksort'
+    bits = max(len(posicoes) - 1, 1).bit_length()
+    if int(chaves.max()) < 1 << (63 - bits):
+        ordenadas = np.sort((chaves << bits) | posicoes, kind=tipo)
+        return ordenadas >> bits, ordenadas & ((1 << bits) - 1)
+    ordenacao = np.argsort(chaves, kind=tipo)
+    return chaves[ordenacao], posicoes[ordenacao]
+
+
+def hash_contextos(contextos):
+    """Hash de 64 bits de cada linha de ids (array de forma (linhas, k)), igual a modelo.hash_contexto."""
+    hashes = np.zeros(len(contextos), dtype=np.uint64)
+    for coluna in contextos.T:
+        hashes = hashes * np.uint64(PRIMO_HASH) + coluna.astype(np.uint64) + np.uint64(1)
+    return hashes
+
+
+def indice_hash(contextos, linhas, fim=()):
+    """
+    Índice por hash de uma tabela (ver TabelaNgramas): hash -> linha.
+
+    Hashes repetidos entre linhas, ou iguais ao de `fim` (o último
+    contexto do corpus, que não tem sucessores e por isso não tem linha),
+    apontam para -1: nesses casos a linha é confirmada em `linhas`.
+
+    Args:
+        contextos (np.ndarray): Ids do contexto de cada linha, forma (linhas, n-1)
+        linhas (dict): Contexto (tupla de ids) -> linha
+        fim (tuple): Último contexto do corpus
+    """
+    hashes, primeiras, repeticoes = np.unique(hash_contextos(contextos), return_index=True,
+                                              return_counts=True)
+    por_hash = dict(zip(hashes.tolist(), np.where(repeticoes > 1, -1, primeiras).tolist()))
+    if fim and fim not in linhas and hash_contexto(fim) in por_hash:
+        por_hash[hash_contexto(fim)] = -1
+    return por_hash
+
+
+def _tabela(ordem, janelas, distintos, primeiras, contagens, base, fim):
+    """Monta a TabelaNgramas a partir dos n-gramas distintos (chaves em ordem lexicográfica)."""
+    contextos = distintos // base
+    sucessores = distintos % base
+
+    # Janelas que passam do fim do corpus terminam com o id sentinela
+    validos = sucessores < base - 1
+    contextos, sucessores = contextos[validos], sucessores[validos]
+    primeiras, contagens = primeiras[validos], contagens[validos]
+
+    # Dentro de cada contexto: maior contagem primeiro, empates pelo menor id
+    ordenacao = np.lexsort((sucessores, -contagens, contextos))
+    contextos = contextos[ordenacao]
+    cabecas = np.flatnonzero(np.diff(contextos, prepend=-1))
+    inicio = np.append(cabecas, len(contextos))
+
+    # Uma lista por coluna: o zip monta as tuplas sem listas intermediárias
+    contextos = janelas[primeiras[ordenacao][cabecas], :ordem - 1]
+    linhas = dict(zip(zip(*contextos.T.tolist()), range(len(cabecas))))
+
+    return TabelaNgramas(
+        ordem, linhas,
+        array('I', inicio.astype(np.uint32).tobytes()),
+        array('I', sucessores[ordenacao].astype(np.uint32).tobytes()),
+        array('I', contagens[ordenacao].astype(np.uint32).tobytes()),
+        indice_hash(contextos, linhas, fim),
+    )
+
+
+def construir_tabelas(ids, ordens, tamanho_vocabulario):
+    """
+    Conta os n-gramas das ordens pedidas.
+
+    Args:
+        ids (np.ndarray): Corpus como ids
+        ordens (iterable): Ordens n das tabelas
+        tamanho_vocabulario (int): Maior id + 1
+
+    Returns:
+        dict: ordem n -> TabelaNgramas
+    """
+    ordens = sorted(ordens)
+    maior = ordens[-1] if ordens else 0
+    tabelas = {}
+    if len(ids) >= 2 and maior >= 2:
+        # O corpus é estendido com um id sentinela (o maior de todos), para
+        # que as janelas de todas as ordens comecem nas mesmas posições;
+        # as que passam do fim são descartadas ao montar as tabelas
+        base = tamanho_vocabulario + 1
+        estendido = np.concatenate((np.asarray(ids, dtype=np.int64),
+                                    np.full(maior - 1, tamanho_vocabulario, dtype=np.int64)))
+        janelas = sliding_window_view(estendido, maior)
+
+        # Bigramas: os ids já são postos dos 1-gramas em ordem lexicográfica
+        posicoes = np.arange(len(ids) - 1)
+        chaves = janelas[:-1, 0] * base + janelas[:-1, 1]
+        for ordem in range(2, maior + 1):
+            chaves, posicoes = _ordenar(chaves, posicoes, quase_ordenadas=ordem > 2)
+            novas = np.empty(len(chaves), dtype=bool)
+            novas[0] = True
+            np.not_equal(chaves[1:], chaves[:-1], out=novas[1:])
+
+            if ordem in ordens:
+                cabecas = np.flatnonzero(novas)
+                contagens = np.diff(np.append(cabecas, len(chaves)))
+                tabelas[ordem] = _tabela(ordem, janelas, chaves[cabecas], posicoes[cabecas],
+                                         contagens, base, tuple(ids[len(ids) - ordem + 1:].tolist()))
+
+            # Chaves da ordem seguinte, já agrupadas pelo prefixo: o posto
+            # do n-grama entre os distintos (a soma acumulada das trocas de
+            # chave) e o id seguinte
+            if ordem < maior:
+                chaves = np.cumsum(novas) * base + janelas[posicoes, ordem]
+
+    for ordem in ordens:
+        if ordem not in tabelas:  # Corpus mais curto que a ordem
+            tabelas[ordem] = TabelaNgramas.construir(array('I'), ordem)
+    return tabelas
+
+
+def construir_modelo_vetorizado(nome, tokens, ordens=range(2, 7), fontes=()):
+    """Como construir_modelo, com a codificação e as contagens vetorizadas."""
+    vocabulario, ids = codificar(tokens)
+    tabelas = construir_tabelas(ids, ordens, len(vocabulario))
+    frequencias = np.bincount(ids, minlength=len(vocabulario)).tolist()
+    estatisticas = calcular_estatisticas(ids, vocabulario, tabelas, frequencias=frequencias)
+    return ModeloMarkov(nome, vocabulario, array('I', ids.tobytes()), tabelas, fontes, estatisticas)
+
+
+def verificar(modelo, referencia):
+    """Número de divergências (vocabulário, tokens, estatísticas, tabelas) entre dois modelos."""
+    divergencias = 0
+    if modelo.vocabulario != referencia.vocabulario or modelo.tokens != referencia.tokens:
+        divergencias += 1
+    if modelo.estatisticas != referencia.estatisticas:
+        divergencias += 1
+    for ordem, esperado in referencia.tabelas.items():
+        obtido = modelo.tabelas.get(ordem)
+        if obtido is None or obtido.dados() != esperado.dados():
+            divergencias += 1
+    return divergencias
+
+
+def construir_por_dicionarios(nome, tokens, ordens, fontes):
+    """
+    construir_modelo sem NumPy, medindo as etapas.
+
+    Returns:
+        tuple: (modelo, segundos da codificação, segundos da contagem)
+    """
+    inicio = time.perf_counter()
+    indice = {}
+    ids = array('I', (indice.setdefault(token, len(indice)) for token in tokens))
+    codificacao = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    tabelas = {ordem: TabelaNgramas.construir(ids, ordem) for ordem in ordens}
+    contagem = time.perf_counter() - inicio
+    return ModeloMarkov(nome, list(indice), ids, tabelas, fontes), codificacao, contagem
+
+
+def construir_medindo(nome, tokens, ordens, fontes):
+    """construir_modelo_vetorizado, medindo as etapas (ver construir_por_dicionarios)."""
+    inicio = time.perf_counter()
+    vocabulario, ids = codificar(tokens)
+    codificacao = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    tabelas = construir_tabelas(ids, ordens, len(vocabulario))
+    contagem = time.perf_counter() - inicio
+    frequencias = np.bincount(ids, minlength=len(vocabulario)).tolist()
+    estatisticas = calcular_estatisticas(ids, vocabulario, tabelas, frequencias=frequencias)
+    modelo = ModeloMarkov(nome, vocabulario, array('I', ids.tobytes()), tabelas, fontes, estatisticas)
+    return modelo, codificacao, contagem
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara a contagem vetorizada com o construtor em memória.")
+    parser.add_argument("corpus", nargs="?", default="alice", help="nome do corpus (padrão: alice)")
+    parser.add_argument("--replicar", type=int, default=20,
+                        help="repete o corpus K vezes (para medir o desempenho em corpora grandes)")
+    parser.add_argument("--verificar", action="store_true",
+                        help="confere se os dois construtores geram o mesmo modelo")
+    args = parser.parse_args()
+
+    corpora = listar_corpora()
+    if args.corpus not in corpora:
+        sys.exit(f"Corpus '{args.corpus}' desconhecido.")
+    arquivos = corpora[args.corpus]
+    fontes = impressao_fontes(arquivos)
+    tokens = tokenizar(preprocessar_texto(ler_arquivos(arquivos))) * args.replicar
+    ordens = range(2, 7)
+    print(f"{args.corpus} x{args.replicar}: {len(tokens):,} palavras")
+    print(f"{'':<18} {'codificação':>12} {'contagem':>10} {'total':>8}")
+
+    resultados = {}
+    for rotulo, construir in (("Counter de tuplas", construir_por_dicionarios), ("NumPy", construir_medindo)):
+        inicio = time.perf_counter()
+        modelo, codificacao, contagem = construir(args.corpus, tokens, ordens, fontes)
+        total = time.perf_counter() - inicio
+        resultados[rotulo] = (modelo, contagem, total)
+        print(f"{rotulo:<18} {codificacao:>11.2f}s {contagem:>9.2f}s {total:>7.2f}s")
+
+    (referencia, contagem_dict, total_dict), (modelo, contagem_numpy, total_numpy) = resultados.values()
+    print(f"Ganho: x{contagem_dict / contagem_numpy:.1f} na contagem, x{total_dict / total_numpy:.1f} no total "
+          f"({len(tokens) / total_numpy:,.0f} palavras/s)")
+
+    if args.verificar:
+        divergencias = verificar(modelo, referencia)
+        print(f"Divergências em relação ao construtor em memória: {divergencias}")
+        sys.exit(1 if divergencias else 0)
+
+
+if __name__ == "__main__":
+    main()